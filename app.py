@@ -1,36 +1,60 @@
 import asyncio
+import hashlib
 import tempfile
 
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from typing import List, Optional
 import uuid
 import json
 import os
 
-from langchain_chroma import Chroma
 from pydantic import BaseModel
 
+from starlette.background import BackgroundTask
 from starlette.middleware.cors import CORSMiddleware
 from cachetools import LRUCache
 import logging
 import sys
+import threading
+import time
 
 import asyncio
 
-from document_loader import process_documents_and_create_db, load_vector_database, query_vector_database
-from main_gradio import formulate_answer
-from crawler.main_crawler import call_crawler
-from text_postprocessing.remove_header import remove_header_footer
-from text_postprocessing.tree_from_json import extract_markdowns, create_tree_from_json
+from document_loader import (
+    RETRIEVAL_MAX_RESULTS, RETRIEVAL_SCORE_GAP, DocumentNotFoundError, IndexUpdateError, VectorIndex,
+    list_bot_documents, process_documents_and_create_db, load_vector_database, load_lexical_index,
+    query_vector_database_with_scores, update_bot_documents,
+)
+from loading_cache import LoadingCache
+from main_gradio import condense_question, formulate_answer_with_usage, summarize_turns
+from retrieval.bm25_index import BM25Index
+from retrieval.manifest import MANIFEST_FILE, read_manifest
+from retrieval.numpy_index import QUANTIZATION_MODES
+from retrieval.shared_index import get_shared_index_client
+from retrieval.snapshot import SNAPSHOT_SUFFIX, SnapshotError, export_bot, import_snapshot
+from retrieval.storage import (
+    bot_storage_path, build_started_at, delete_bot_storage, is_valid_bot_id, mark_build_finished, mark_build_started,
+)
+from retrieval.storage_maintenance import STORAGE_MAINTENANCE_INTERVAL_SECONDS, run_maintenance_if_due
 from user_api_storage import api_key_storage
+from bot_access_stats import bot_access_stats
+from session_store import session_store
+from metrics import instrument_endpoint, observe_prompt_tokens, render_metrics, track_stage
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 app = FastAPI()
 
+# "full" serves every endpoint. "query" is for replicas that only answer queries:
+# /create_bot/ is refused, so the crawler stack (crawl4ai, Playwright, PyPDF2) and
+# the ingestion dependencies are never imported.
+SERVING_MODE = os.getenv('SERVING_MODE', 'full')
+if SERVING_MODE not in ('full', 'query'):
+    raise ValueError(f"SERVING_MODE must be 'full' or 'query', got {SERVING_MODE!r}")
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
     logger.error(f"Validation error: {exc}")
@@ -66,22 +90,204 @@ def get_size(obj):
 
 # Using cachetools.LRUCache for more memory-efficient caching
 # This cache will hold up to 100MB of vector databases.
-vector_db_cache = LRUCache(maxsize=100 * 1024 * 1024, getsizeof=get_size)
+# Requests missing the same bot together share one load_vector_database call.
+vector_db_cache = LoadingCache("vector_db", LRUCache(maxsize=100 * 1024 * 1024, getsizeof=get_size))
+
+# Under serve_workers.py, NumPy bots are read from a shared-memory copy managed by the
+# index coordinator, so all workers map the same pages instead of each loading its own.
+shared_index_client = get_shared_index_client()
+# Directory each cached bot was loaded from (None: its storage directory).
+shared_index_paths = {}
+shared_index_paths_lock = threading.Lock()
+# Manifest mtime of each bot when last seen. Publishing a new index version (documents
+# added or removed, possibly by another worker) replaces the manifest.
+index_manifest_stamps = {}
+
+def invalidate_bot_cache(bot_id: str) -> None:
+    with shared_index_paths_lock:
+        vector_db_cache.pop(bot_id, None)
+        lexical_index_cache.pop(bot_id, None)
+        shared_index_paths.pop(bot_id, None)
+        index_manifest_stamps.pop(bot_id, None)
+
+def drop_if_republished(bot_id: str, storage_path: str) -> None:
+    try:
+        stamp = os.stat(os.path.join(storage_path, MANIFEST_FILE)).st_mtime_ns
+    except OSError:
+        stamp = None
+    with shared_index_paths_lock:
+        if index_manifest_stamps.get(bot_id, stamp) != stamp:
+            vector_db_cache.pop(bot_id, None)
+            lexical_index_cache.pop(bot_id, None)
+        index_manifest_stamps[bot_id] = stamp
+
+def bot_index_path(bot_id: str) -> str:
+    """Directory to load a bot's indexes from, dropping cached bots that were updated
+    since they were loaded or that the coordinator evicted."""
+    storage_path = bot_storage_path(bot_id)
+    drop_if_republished(bot_id, storage_path)
+    if shared_index_client is None:
+        return storage_path
+    path, evicted, reset = shared_index_client.acquire(bot_id)
+    with shared_index_paths_lock:
+        if reset:
+            vector_db_cache.clear()
+            lexical_index_cache.clear()
+            shared_index_paths.clear()
+        for evicted_id in evicted:
+            vector_db_cache.pop(evicted_id, None)
+            lexical_index_cache.pop(evicted_id, None)
+            shared_index_paths.pop(evicted_id, None)
+        if bot_id in shared_index_paths and shared_index_paths[bot_id] != path:
+            # Reloaded after a rebuild, or moved between shared and local loading.
+            vector_db_cache.pop(bot_id, None)
+            lexical_index_cache.pop(bot_id, None)
+        shared_index_paths[bot_id] = path
+    return path or storage_path
+
+def cached_vector_database(bot_id: str) -> Optional[VectorIndex]:
+    if not is_valid_bot_id(bot_id):
+        return None
+    vector_db_path = bot_index_path(bot_id)
 
-def cached_vector_database(bot_id: str) -> Optional[Chroma]:
-    if bot_id in vector_db_cache:
-        logger.info(f"Cache hit for bot_id: {bot_id}.")
-        return vector_db_cache[bot_id]
-    
-    logger.info(f"Cache miss for bot_id: {bot_id}. Loading from disk.")
-    vector_db_path = os.path.join("vector_db_storage", bot_id)
-    
-    # The load_vector_database function will try different embeddings automatically
-    db = load_vector_database(vector_db_path)
-    
-    if db:
-        vector_db_cache[bot_id] = db
-    return db
+    def load():
+        logger.info(f"Cache miss for bot_id: {bot_id}. Loading from disk.")
+        # The load_vector_database function will try different embeddings automatically
+        with track_stage("load_vector_database"):
+            return load_vector_database(vector_db_path)
+
+    return vector_db_cache.get_or_load(bot_id, load)
+
+# BM25 indexes are memory-mapped, so entries are small and many bots can stay open.
+lexical_index_cache = LoadingCache("lexical_index", LRUCache(maxsize=10000))
+
+def cached_lexical_index(bot_id: str) -> Optional[BM25Index]:
+    # cached_vector_database, called first for every query, resolved the bot's directory.
+    return lexical_index_cache.get_or_load(
+        bot_id, lambda: load_lexical_index(shared_index_paths.get(bot_id) or bot_storage_path(bot_id))
+    )
+
+# Startup warmup: the most used bots (by persisted access stats) are loaded in the
+# background until WARMUP_TOP_N bots or WARMUP_MEMORY_BUDGET_MB of index files.
+WARMUP_TOP_N = int(os.getenv('WARMUP_TOP_N', '50'))
+WARMUP_MEMORY_BUDGET_MB = int(os.getenv('WARMUP_MEMORY_BUDGET_MB', '512'))
+ACCESS_STATS_FLUSH_SECONDS = int(os.getenv('ACCESS_STATS_FLUSH_SECONDS', '30'))
+
+warmup_state = {"ready": False, "target": 0, "loaded": 0, "loaded_bytes": 0}
+
+def estimate_bot_memory(vector_db_path: str) -> int:
+    """On-disk size of a bot's index files, used as its memory estimate."""
+    total = 0
+    for root, _, files in os.walk(vector_db_path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def warm_vector_db_cache():
+    budget = WARMUP_MEMORY_BUDGET_MB * 1024 * 1024
+    try:
+        bot_ids = bot_access_stats.top_bots(WARMUP_TOP_N)
+        warmup_state["target"] = len(bot_ids)
+        logger.info(f"Warming cache with up to {len(bot_ids)} bots within {WARMUP_MEMORY_BUDGET_MB}MB")
+        for bot_id in bot_ids:
+            if not is_valid_bot_id(bot_id):
+                continue
+            vector_db_path = bot_storage_path(bot_id)
+            if not os.path.isdir(vector_db_path):
+                continue
+            size = estimate_bot_memory(vector_db_path)
+            if warmup_state["loaded_bytes"] + size > budget:
+                logger.info(f"Warmup memory budget reached after {warmup_state['loaded']} bots")
+                break
+            if cached_vector_database(bot_id):
+                cached_lexical_index(bot_id)
+                warmup_state["loaded"] += 1
+                warmup_state["loaded_bytes"] += size
+    except Exception as e:
+        logger.error(f"Error during cache warmup: {e}")
+    finally:
+        warmup_state["ready"] = True
+        logger.info(f"Cache warmup finished: {warmup_state['loaded']} bots loaded")
+
+def flush_access_stats_periodically():
+    while True:
+        time.sleep(ACCESS_STATS_FLUSH_SECONDS)
+        bot_access_stats.flush()
+
+def maintain_storage_periodically():
+    """Storage GC, quotas and compaction; the lock in run_maintenance_if_due keeps
+    the workers of a host to one pass per interval."""
+    while True:
+        time.sleep(min(STORAGE_MAINTENANCE_INTERVAL_SECONDS, 600))
+        try:
+            run_maintenance_if_due()
+        except Exception as e:
+            logger.error(f"Error during storage maintenance: {e}")
+
+@app.on_event("startup")
+async def start_background_tasks():
+    threading.Thread(target=warm_vector_db_cache, name="cache-warmup", daemon=True).start()
+    threading.Thread(target=flush_access_stats_periodically, name="access-stats-flush", daemon=True).start()
+    if SERVING_MODE == 'full' and STORAGE_MAINTENANCE_INTERVAL_SECONDS > 0:
+        threading.Thread(target=maintain_storage_periodically, name="storage-maintenance", daemon=True).start()
+
+@app.on_event("shutdown")
+async def flush_access_stats_on_shutdown():
+    bot_access_stats.flush()
+
+@app.on_event("shutdown")
+async def close_browsers_on_shutdown():
+    # Only loaded once a website bot was built (see create_vector_db_from_config).
+    browser_pool = sys.modules.get("crawler.browser_pool")
+    if browser_pool is not None:
+        await browser_pool.close_browser_pool()
+
+# Uploads are copied to disk in UPLOAD_CHUNK_BYTES pieces, hashing as they go, so a
+# large PDF never sits in memory as a whole.
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+MAX_UPLOAD_FILE_MB = int(os.getenv('MAX_UPLOAD_FILE_MB', '50'))
+MAX_UPLOAD_TOTAL_MB = int(os.getenv('MAX_UPLOAD_TOTAL_MB', '200'))
+SNAPSHOT_MAX_MB = int(os.getenv('SNAPSHOT_MAX_MB', '2048'))
+
+async def save_upload_to_disk(file: UploadFile, byte_budget: int, max_file_mb: int = MAX_UPLOAD_FILE_MB) -> tuple:
+    """Stream an upload into a temporary file.
+
+    Returns (path, sha256, size). Raises 413 once the file exceeds max_file_mb
+    or the request's remaining byte_budget; the partial file is removed.
+    """
+    limit = min(max_file_mb * 1024 * 1024, byte_budget)
+    # The per-request total only applies to document uploads, which use the default file limit.
+    per_request = f" and {MAX_UPLOAD_TOTAL_MB}MB per request" if max_file_mb == MAX_UPLOAD_FILE_MB else ""
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Upload too large: at most {max_file_mb}MB per file{per_request}"
+    )
+    # The multipart parser already knows the size of spooled uploads; reject those without copying.
+    if getattr(file, "size", None) is not None and file.size > limit:
+        raise too_large
+
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.basename(file.filename or "")) as temp_upload:
+        try:
+            while True:
+                block = await file.read(UPLOAD_CHUNK_BYTES)
+                if not block:
+                    break
+                size += len(block)
+                if size > limit:
+                    raise too_large
+                digest.update(block)
+                temp_upload.write(block)
+        except BaseException:
+            temp_upload.close()
+            os.remove(temp_upload.name)
+            raise
+    return temp_upload.name, digest.hexdigest(), size
+
+# Rewrite follow-up questions of a session into standalone questions before retrieval
+# (one small LLM call per turn); off, the question is retrieved as asked.
+SESSION_CONDENSE_QUESTIONS = os.getenv('SESSION_CONDENSE_QUESTIONS', '1') == '1'
 
 class CreateBotRequest(BaseModel):
     website_url: Optional[str] = None
@@ -90,7 +296,8 @@ class CreateBotRequest(BaseModel):
 class QueryBotRequest(BaseModel):
     bot_id: str
     query: str
-    context: str
+    context: str = ""  # Full chat history, only used without session_id
+    session_id: Optional[str] = None  # Server-side history: recent turns, rolling summary
     user_id: Optional[str] = None  # User ID to look up stored API key
     model: Optional[dict] = None  # {provider: str, model_name: str, api_key: str}
 
@@ -104,91 +311,143 @@ class DeleteAPIKeyRequest(BaseModel):
     user_id: str
     provider: str
 
-async def create_vector_db_from_config(
-    website_url: Optional[str], 
-    files: List[UploadFile], 
-    bot_id: str,
-    model_provider: str,
-    api_key: str
-) -> Optional[Chroma]:
-    files_to_process = list(files or [])
-    temp_files_to_clean = []
-
-    if website_url:
-        logger.info(f"Processing Website URL: {website_url}")
-        try:
-            if not website_url.startswith(('http://', 'https://')):
-                website_url = 'https://' + website_url
-
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix=".json") as crawl_json_temp:
-                crawl_json_path = crawl_json_temp.name
-            
+async def crawl_website_to_markdown_file(website_url: str) -> Optional[str]:
+    """Crawl a website into a temporary markdown file (removed by the caller); None on failure."""
+    # Crawling dependencies are loaded on the first website bot only.
+    from crawler.main_crawler import call_crawler
+    from text_postprocessing.remove_header import remove_header_footer
+    from text_postprocessing.tree_from_json import extract_markdowns, create_tree_from_json
+
+    logger.info(f"Processing Website URL: {website_url}")
+    markdown_path = None
+    try:
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix=".json") as crawl_json_temp:
+            crawl_json_path = crawl_json_temp.name
+        
+        with track_stage("call_crawler"):
             await call_crawler(website_url, crawl_json_path)
-            
+        
+        with track_stage("remove_header_footer"):
             new_file_content = remove_header_footer(crawl_json_path)
 
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix=".json") as tree_output_temp:
-                tree_output_path = tree_output_temp.name
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix=".json") as tree_output_temp:
+            tree_output_path = tree_output_temp.name
 
+        with track_stage("create_tree_from_json"):
             create_tree_from_json(crawl_json_path, tree_output_path)
 
-            with open(tree_output_path, "r", encoding="utf-8") as file:
-                data = json.load(file)
-            markdown_text = extract_markdowns(data)
+        with open(tree_output_path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        markdown_text = extract_markdowns(data)
 
-            if not markdown_text:
-                logger.warning("No markdown content extracted from website")
-                markdown_text = ["No content could be extracted from the website."]
+        if not markdown_text:
+            logger.warning("No markdown content extracted from website")
+            markdown_text = ["No content could be extracted from the website."]
 
-            with tempfile.NamedTemporaryFile(mode='w+t', suffix=".txt", delete=False, encoding='utf-8') as temp_markdown_file:
-                temp_markdown_file.write("\n\n".join(markdown_text))
-                temp_markdown_file.flush()
-                files_to_process.append(temp_markdown_file.name)
-                temp_files_to_clean.append(temp_markdown_file.name)
+        with tempfile.NamedTemporaryFile(mode='w+t', suffix=".txt", delete=False, encoding='utf-8') as temp_markdown_file:
+            markdown_path = temp_markdown_file.name
+            temp_markdown_file.write("\n\n".join(markdown_text))
+            temp_markdown_file.flush()
 
-            os.remove(crawl_json_path)
-            os.remove(tree_output_path)
+        os.remove(crawl_json_path)
+        os.remove(tree_output_path)
+        return markdown_path
 
-        except Exception as e:
-            logger.error(f"Error during website processing: {e}")
-            for temp_file_path in temp_files_to_clean:
-                if os.path.exists(temp_file_path):
-                    os.remove(temp_file_path)
+    except Exception as e:
+        logger.error(f"Error during website processing: {e}")
+        if markdown_path and os.path.exists(markdown_path):
+            os.remove(markdown_path)
+        return None
+
+async def save_uploads(files: List[UploadFile], temp_files_to_clean: List[str]) -> tuple:
+    """Stream uploads to temporary files (appended to temp_files_to_clean).
+
+    Returns (paths, file_hashes, document_names); on a 413 every temporary file is removed.
+    """
+    paths, file_hashes, document_names = [], {}, {}
+    byte_budget = MAX_UPLOAD_TOTAL_MB * 1024 * 1024
+    try:
+        for file in files:
+            path, sha256, size = await save_upload_to_disk(file, byte_budget)
+            byte_budget -= size
+            paths.append(path)
+            temp_files_to_clean.append(path)
+            file_hashes[path] = sha256
+            document_names[path] = os.path.basename(file.filename or "") or os.path.basename(path)
+    except HTTPException:
+        remove_temp_files(temp_files_to_clean)
+        raise
+    return paths, file_hashes, document_names
+
+def remove_temp_files(paths: List[str]) -> None:
+    for temp_file_path in paths:
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+            logger.info(f"Temporary file cleaned up: {temp_file_path}")
+
+def normalize_website_url(website_url: str) -> str:
+    if not website_url.startswith(('http://', 'https://')):
+        website_url = 'https://' + website_url
+    return website_url
+
+async def create_vector_db_from_config(
+    website_url: Optional[str], 
+    files: List[UploadFile], 
+    bot_id: str,
+    model_provider: str,
+    api_key: str,
+    quantization: Optional[str] = None,
+    rerank: bool = True,
+    user_id: Optional[str] = None
+) -> Optional[VectorIndex]:
+    files_to_process = []
+    temp_files_to_clean = []
+    document_names = {}
+
+    if website_url:
+        website_url = normalize_website_url(website_url)
+        markdown_path = await crawl_website_to_markdown_file(website_url)
+        if markdown_path is None:
             return None
+        files_to_process.append(markdown_path)
+        temp_files_to_clean.append(markdown_path)
+        # The crawled site is one document of the bot, named by its URL.
+        document_names[markdown_path] = website_url
 
-    if files_to_process:
-        vector_db_path = os.path.join("vector_db_storage", bot_id)
+    if files_to_process or files:
+        vector_db_path = bot_storage_path(bot_id)
         
-        processed_files = []
-        for file in files_to_process:
-            if isinstance(file, str):
-                processed_files.append(file)
-            elif isinstance(file, UploadFile):
-                with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename) as temp_upload:
-                    temp_upload.write(await file.read())
-                    processed_files.append(temp_upload.name)
-                    temp_files_to_clean.append(temp_upload.name)
+        upload_paths, file_hashes, upload_names = await save_uploads(list(files or []), temp_files_to_clean)
+        files_to_process.extend(upload_paths)
+        document_names.update(upload_names)
         
+        # The marker lets storage maintenance tell a build in progress from one that died midway.
+        mark_build_started(vector_db_path)
         loop = asyncio.get_running_loop()
-        vector_db = await loop.run_in_executor(
-            None,
-            lambda: process_documents_and_create_db(
-                processed_files,
-                vector_db_path,
-                model_provider,
-                api_key
+        vector_db = None
+        try:
+            vector_db = await loop.run_in_executor(
+                None,
+                lambda: process_documents_and_create_db(
+                    files_to_process,
+                    vector_db_path,
+                    model_provider,
+                    api_key,
+                    quantization=quantization,
+                    rerank=rerank,
+                    file_hashes=file_hashes,
+                    document_names=document_names
+                )
             )
-        )
-
-        if vector_db:
-            logger.info(f"Vector database saved to disk for bot_id: {bot_id} at: {vector_db_path}")
-        else:
-            logger.warning("Vector database creation failed, not saving to disk.")
+        finally:
+            if vector_db:
+                mark_build_finished(vector_db_path, user_id)
+                logger.info(f"Vector database saved to disk for bot_id: {bot_id} at: {vector_db_path}")
+            else:
+                delete_bot_storage(vector_db_path)
+                logger.warning("Vector database creation failed, partial build removed.")
 
-        for temp_file_path in temp_files_to_clean:
-            if os.path.exists(temp_file_path):
-                os.remove(temp_file_path)
-                logger.info(f"Temporary file cleaned up: {temp_file_path}")
+        remove_temp_files(temp_files_to_clean)
 
         return vector_db
     else:
@@ -196,15 +455,21 @@ async def create_vector_db_from_config(
         return None
 
 @app.post("/create_bot/")
+@instrument_endpoint("create_bot")
 async def create_bot_endpoint(
     website_url: Optional[str] = Form(None),
     files: List[UploadFile] = File(default=[]),
     model_provider: Optional[str] = Form(None),
     api_key: Optional[str] = Form(None),
-    user_id: Optional[str] = Form(None)
+    user_id: Optional[str] = Form(None),
+    quantization: Optional[str] = Form(None),  # float32, float16 or int8 embedding storage
+    rerank: bool = Form(True)  # keep float32 vectors to rescore quantised search results
 ):
     logger.info(f"Received create_bot request: website_url={website_url}, files_count={len(files)}, user_id={user_id}")
     logger.info("Note: Embeddings will use environment OpenAI API key, user API keys are for QnA only")
+
+    if SERVING_MODE == 'query':
+        raise HTTPException(status_code=503, detail="This replica only serves queries (SERVING_MODE=query)")
     
     # Validate that at least one of website_url or files is provided
     if not website_url and not files:
@@ -213,9 +478,16 @@ async def create_bot_endpoint(
             detail="Either website_url or files must be provided"
         )
     
+    if quantization and quantization not in QUANTIZATION_MODES:
+        raise HTTPException(
+            status_code=422,
+            detail=f"quantization must be one of: {', '.join(QUANTIZATION_MODES)}"
+        )
+
     bot_id = str(uuid.uuid4())
     vector_db = await create_vector_db_from_config(
-        website_url, files, bot_id, None, None  # No need to pass user API keys for embeddings
+        website_url, files, bot_id, None, None,  # No need to pass user API keys for embeddings
+        quantization=quantization, rerank=rerank, user_id=user_id
     )
 
     if vector_db:
@@ -223,7 +495,127 @@ async def create_bot_endpoint(
     else:
         raise HTTPException(status_code=500, detail="Bot creation failed. Check server logs for errors.")
 
+@app.get("/bots/{bot_id}/snapshot")
+@instrument_endpoint("export_snapshot")
+async def export_snapshot_endpoint(bot_id: str):
+    """Download a bot as a single-file snapshot, to import it on another node or keep as a backup"""
+    if not is_valid_bot_id(bot_id):
+        raise HTTPException(status_code=404, detail=f"Bot with id '{bot_id}' not found.")
+    with tempfile.NamedTemporaryFile(delete=False, suffix=SNAPSHOT_SUFFIX) as snapshot_file:
+        snapshot_path = snapshot_file.name
+    loop = asyncio.get_running_loop()
+    try:
+        with track_stage("export_snapshot"):
+            await loop.run_in_executor(None, export_bot, bot_id, snapshot_path)
+    except FileNotFoundError:
+        os.remove(snapshot_path)
+        raise HTTPException(status_code=404, detail=f"Bot with id '{bot_id}' not found.")
+    except Exception as e:
+        os.remove(snapshot_path)
+        logger.error(f"Error exporting bot {bot_id}: {e}")
+        raise HTTPException(status_code=500, detail="Snapshot export failed. Check server logs for errors.")
+    return FileResponse(
+        snapshot_path, media_type="application/octet-stream", filename=f"{bot_id}{SNAPSHOT_SUFFIX}",
+        background=BackgroundTask(os.remove, snapshot_path)
+    )
+
+@app.post("/bots/import_snapshot")
+@instrument_endpoint("import_snapshot")
+async def import_snapshot_endpoint(file: UploadFile = File(...), user_id: Optional[str] = Form(None)):
+    """Create a bot from a snapshot; the bot gets a new id, returned like /create_bot/ does"""
+    if SERVING_MODE == 'query':
+        raise HTTPException(status_code=503, detail="This replica only serves queries (SERVING_MODE=query)")
+    snapshot_path, _, _ = await save_upload_to_disk(file, SNAPSHOT_MAX_MB * 1024 * 1024, max_file_mb=SNAPSHOT_MAX_MB)
+    loop = asyncio.get_running_loop()
+    try:
+        with track_stage("import_snapshot"):
+            bot_id = await loop.run_in_executor(None, lambda: import_snapshot(snapshot_path, user_id=user_id))
+    except SnapshotError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid snapshot: {e}")
+    finally:
+        os.remove(snapshot_path)
+    return {"bot_id": bot_id, "message": "Bot imported successfully!"}
+
+def existing_bot_path(bot_id: str) -> str:
+    """Storage directory of a fully built bot; 404 otherwise."""
+    path = bot_storage_path(bot_id) if is_valid_bot_id(bot_id) else None
+    if path is None or read_manifest(path) is None or build_started_at(path) is not None:
+        raise HTTPException(status_code=404, detail=f"Bot with id '{bot_id}' not found.")
+    return path
+
+async def apply_bot_update(bot_id: str, path: str, **changes) -> dict:
+    """Run update_bot_documents off the event loop and drop the bot from this worker's
+    caches; other workers see the new manifest on their next query for the bot."""
+    loop = asyncio.get_running_loop()
+    try:
+        with track_stage("update_bot_documents"):
+            summary = await loop.run_in_executor(None, lambda: update_bot_documents(path, **changes))
+    except DocumentNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IndexUpdateError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating bot {bot_id}: {e}")
+        raise HTTPException(status_code=500, detail="Bot update failed. Check server logs for errors.")
+    invalidate_bot_cache(bot_id)
+    return {"bot_id": bot_id, **summary}
+
+@app.get("/bots/{bot_id}/documents")
+@instrument_endpoint("list_documents")
+async def list_documents_endpoint(bot_id: str):
+    """Documents of a bot with their chunk counts and the ids used to remove them"""
+    path = existing_bot_path(bot_id)
+    loop = asyncio.get_running_loop()
+    try:
+        documents = await loop.run_in_executor(None, list_bot_documents, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Bot with id '{bot_id}' has no document list.")
+    return {"bot_id": bot_id, "documents": documents}
+
+@app.post("/bots/{bot_id}/documents")
+@instrument_endpoint("add_documents")
+async def add_documents_endpoint(
+    bot_id: str,
+    website_url: Optional[str] = Form(None),
+    files: List[UploadFile] = File(default=[])
+):
+    """Add files (or a crawled website) to an existing bot; only their chunks are embedded"""
+    if SERVING_MODE == 'query':
+        raise HTTPException(status_code=503, detail="This replica only serves queries (SERVING_MODE=query)")
+    if not website_url and not files:
+        raise HTTPException(status_code=422, detail="Either website_url or files must be provided")
+    path = existing_bot_path(bot_id)
+
+    temp_files_to_clean = []
+    files_to_process, document_names = [], {}
+    try:
+        if website_url:
+            website_url = normalize_website_url(website_url)
+            markdown_path = await crawl_website_to_markdown_file(website_url)
+            if markdown_path is None:
+                raise HTTPException(status_code=500, detail="Website crawl failed. Check server logs for errors.")
+            temp_files_to_clean.append(markdown_path)
+            files_to_process.append(markdown_path)
+            document_names[markdown_path] = website_url
+        upload_paths, file_hashes, upload_names = await save_uploads(files, temp_files_to_clean)
+        files_to_process.extend(upload_paths)
+        document_names.update(upload_names)
+        return await apply_bot_update(bot_id, path, files=files_to_process, file_hashes=file_hashes,
+                                      document_names=document_names)
+    finally:
+        remove_temp_files(temp_files_to_clean)
+
+@app.delete("/bots/{bot_id}/documents/{document_id}")
+@instrument_endpoint("remove_document")
+async def remove_document_endpoint(bot_id: str, document_id: str):
+    """Remove one document (see GET /bots/{bot_id}/documents) from a bot"""
+    if SERVING_MODE == 'query':
+        raise HTTPException(status_code=503, detail="This replica only serves queries (SERVING_MODE=query)")
+    path = existing_bot_path(bot_id)
+    return await apply_bot_update(bot_id, path, remove_document_ids=[document_id])
+
 @app.post("/query_bot/")
+@instrument_endpoint("query_bot")
 async def query_bot_endpoint(request: QueryBotRequest):
     bot_id = request.bot_id
     query = request.query
@@ -231,33 +623,92 @@ async def query_bot_endpoint(request: QueryBotRequest):
     user_id = request.user_id
     model_info = request.model
 
-    vector_db = cached_vector_database(bot_id)
+    # Loads run on the thread pool: a cold bot must not block the event loop for other requests.
+    loop = asyncio.get_running_loop()
+    vector_db = await loop.run_in_executor(None, cached_vector_database, bot_id)
     if not vector_db:
         raise HTTPException(status_code=404, detail=f"Bot with id '{bot_id}' not found or could not be loaded.")
+    bot_access_stats.record_access(bot_id)
+
+    # Try to get user's stored API key for QnA
+    final_model_info = model_info
+    if user_id and not model_info:
+        # Look up user's primary model
+        user_models = api_key_storage.get_user_models(user_id)
+        if user_models:
+            # For now, try to find an OpenAI model
+            openai_model = user_models.get('openai')
+            if openai_model:
+                final_model_info = {
+                    'provider': 'openai',
+                    'model_name': openai_model.get('model_name', 'gpt-4o-mini'),
+                    'api_key': openai_model['api_key']
+                }
+                logger.info(f"Using stored API key for QnA for user {user_id}")
+
+    # With a session the history is kept server-side and retrieval uses a standalone
+    # rewrite of the question, so neither grows with the conversation.
+    session = None
+    summary = ""
+    if request.session_id:
+        # SQLite shared with the node's other workers, which may hold its write lock: off the event loop.
+        session = await loop.run_in_executor(None, session_store.get, request.session_id, bot_id)
+        summary, context = session.history()
+        retrieval_query = query
+        if SESSION_CONDENSE_QUESTIONS:
+            # A full LLM round-trip: run it on the thread pool, as the answer below.
+            with track_stage("condense_question"):
+                retrieval_query = await loop.run_in_executor(
+                    None, condense_question, query, context, final_model_info, summary)
+    else:
+        retrieval_query = context + "\n" + query
 
-    response = query_vector_database(vector_db, context + "\n" + query)
+    lexical_index = await loop.run_in_executor(None, cached_lexical_index, bot_id)
+    # Query embedding runs on the thread pool too: concurrent queries of this worker then
+    # reach the embedding model together and are batched (local_embeddings.QueryBatcher).
+    with track_stage("retrieval"):
+        scored = await loop.run_in_executor(
+            None,
+            lambda: query_vector_database_with_scores(
+                vector_db, retrieval_query, num_results=RETRIEVAL_MAX_RESULTS,
+                lexical_index=lexical_index, score_gap=RETRIEVAL_SCORE_GAP
+            )
+        )
+    response = [doc for doc, _ in scored]
 
     if response:
-        # Try to get user's stored API key for QnA
-        final_model_info = model_info
-        if user_id and not model_info:
-            # Look up user's primary model
-            user_models = api_key_storage.get_user_models(user_id)
-            if user_models:
-                # For now, try to find an OpenAI model
-                openai_model = user_models.get('openai')
-                if openai_model:
-                    final_model_info = {
-                        'provider': 'openai',
-                        'model_name': openai_model.get('model_name', 'gpt-4o-mini'),
-                        'api_key': openai_model['api_key']
-                    }
-                    logger.info(f"Using stored API key for QnA for user {user_id}")
-        
-        answer = formulate_answer(query, response, context, final_model_info)
-        return {"answer": answer}
+        with track_stage("formulate_answer"):
+            answer, usage = await loop.run_in_executor(
+                None, formulate_answer_with_usage, query, response, context, final_model_info, summary)
+        observe_prompt_tokens(usage["model"], usage["prompt_tokens"])
+        result = {
+            "answer": answer,
+            "prompt_tokens": usage["prompt_tokens"],
+            "chunks_used": usage["chunks_used"],
+            "scores": [round(score, 4) for _, score in scored[:usage["chunks_used"]]],
+        }
     else:
-        return {"answer": "No relevant information found in the bot's documents for your query."}
+        answer = "No relevant information found in the bot's documents for your query."
+        result = {"answer": answer}
+
+    if session:
+        await loop.run_in_executor(
+            None,
+            lambda: session_store.add_turn(
+                session, query, answer,
+                summarize=lambda summary, turns: summarize_turns(summary, turns, final_model_info)
+            )
+        )
+        result["session_id"] = session.session_id
+    return result
+
+@app.delete("/session/{session_id}")
+async def delete_session_endpoint(session_id: str):
+    """Forget a chat session's history."""
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(None, session_store.delete, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"message": "Session deleted"}
 
 @app.post("/store_api_key/")
 async def store_api_key_endpoint(request: StoreAPIKeyRequest):
@@ -291,7 +742,20 @@ async def delete_api_key_endpoint(request: DeleteAPIKeyRequest):
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Docker health checks"""
-    return {"status": "healthy", "message": "Service is running"}
+    return {"status": "healthy", "message": "Service is running", "serving_mode": SERVING_MODE}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics: per-stage latency/throughput, cache hit rates, in-flight gauges"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness endpoint: ready once the startup cache warmup has finished"""
+    if not warmup_state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming", **warmup_state})
+    return {"status": "ready", **warmup_state}
 
 if __name__ == "__main__":
     import uvicorn
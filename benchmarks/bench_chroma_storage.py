@@ -0,0 +1,111 @@
+"""Per-bot memory and cold-load time: per-directory Chroma stores vs one shared client.
+
+Usage:
+    python -m benchmarks.bench_chroma_storage --bots 200 --chunks 300
+
+Synthetic bots are written in both layouts, then each layout is opened in a fresh
+subprocess that cold-loads every bot (open + one query) and reports the mean load
+time and resident-memory growth per bot.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+DIMENSION = 384
+
+
+def rss_bytes() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _settings(**extra):
+    from chromadb.config import Settings
+    return Settings(anonymized_telemetry=False, **extra)
+
+
+def generate(root: str, bots: int, chunks: int, seed: int) -> None:
+    import chromadb
+
+    rng = np.random.default_rng(seed)
+    shared = chromadb.PersistentClient(path=os.path.join(root, "shared"), settings=_settings())
+    for bot in range(bots):
+        vectors = rng.normal(size=(chunks, DIMENSION)).astype(np.float32).tolist()
+        ids = [str(i) for i in range(chunks)]
+        documents = [f"bot {bot} chunk {i}" for i in range(chunks)]
+        per_directory = chromadb.PersistentClient(path=os.path.join(root, "per_directory", str(bot)), settings=_settings())
+        per_directory.create_collection("langchain").add(ids=ids, embeddings=vectors, documents=documents)
+        shared.create_collection(f"bot-{bot}").add(ids=ids, embeddings=vectors, documents=documents)
+
+
+def measure(root: str, mode: str, bots: int) -> dict:
+    import chromadb
+
+    query = np.random.default_rng(1).normal(size=DIMENSION).astype(np.float32).tolist()
+    rss_before = rss_bytes()
+    handles = []
+    start = time.perf_counter()
+    if mode == "shared":
+        client = chromadb.PersistentClient(
+            path=os.path.join(root, "shared"),
+            settings=_settings(chroma_segment_cache_policy="LRU", chroma_memory_limit_bytes=512 * 1024 * 1024),
+        )
+        for bot in range(bots):
+            collection = client.get_collection(f"bot-{bot}")
+            collection.query(query_embeddings=[query], n_results=4)
+            handles.append(collection)
+    else:
+        for bot in range(bots):
+            client = chromadb.PersistentClient(path=os.path.join(root, "per_directory", str(bot)), settings=_settings())
+            collection = client.get_collection("langchain")
+            collection.query(query_embeddings=[query], n_results=4)
+            handles.append((client, collection))
+    elapsed = time.perf_counter() - start
+    return {
+        "mode": mode,
+        "bots": bots,
+        "cold_load_ms_per_bot": round(elapsed / bots * 1000, 3),
+        "rss_bytes_per_bot": (rss_bytes() - rss_before) // bots,
+        "open_fds": len(os.listdir("/proc/self/fd")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bots", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--measure", choices=["per_directory", "shared"], help=argparse.SUPPRESS)
+    parser.add_argument("--root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.root, args.measure, args.bots)))
+        return
+
+    with tempfile.TemporaryDirectory() as root:
+        generate(root, args.bots, args.chunks, args.seed)
+        results = []
+        for mode in ("per_directory", "shared"):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_chroma_storage", "--measure", mode, "--root", root, "--bots", str(args.bots)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+    for row in results:
+        print("  ".join(f"{key}={value}" for key, value in row.items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"chunks_per_bot": args.chunks, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Crawl a local synthetic website with crawler.main_crawler.call_crawler.
+
+Usage:
+    python -m benchmarks.bench_crawler --pages 200 --fanout 5 --depth 4 --output bench_crawler.json
+
+Reports pages per second, peak memory of this process and of the browser
+processes, and how often the same URL was fetched more than once (query-string
+and trailing-slash variants, PDFs fetched by both the browser and PyPDF2).
+With --jobs N, N crawls of the site run concurrently in one event loop and share
+the browser pool, as parallel bot builds do in the app. The page cache starts
+empty in a temporary directory; with --warm-cache the site is crawled once before
+the measured crawl, which then times the rebuild of an unchanged site. --sitemap
+serves robots.txt and a sitemap index; with --max-pages or --time-budget,
+mean_page_depth shows whether the budgeted crawl kept the pages closest to the
+home page. No network access is needed.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from benchmarks.mock_site import MockSite
+from crawler.browser_pool import close_browser_pool
+from crawler.page_cache import page_cache
+from crawler.main_crawler import call_crawler
+
+
+def peak_rss_bytes(who: int) -> int:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(who).ru_maxrss * 1024
+
+
+async def crawl_jobs(start_url: str, output_files: list, **budgets):
+    try:
+        await asyncio.gather(*(call_crawler(start_url, output_file, **budgets) for output_file in output_files))
+    finally:
+        await close_browser_pool()
+
+
+def run(site: MockSite, jobs: int = 1, warm_cache: bool = False, **budgets) -> dict:
+    base_url = site.start()
+    output_files = [tempfile.NamedTemporaryFile(suffix=".json", delete=False).name for _ in range(jobs)]
+    pages = {}
+    reports = []
+    page_cache.directory = tempfile.mkdtemp(prefix="bench-page-cache-")
+    try:
+        if warm_cache:
+            asyncio.run(crawl_jobs(base_url + "/", output_files[:1], **budgets))
+            site.reset_stats()
+        start = time.perf_counter()
+        asyncio.run(crawl_jobs(base_url + "/", output_files, **budgets))
+        elapsed = time.perf_counter() - start
+        for output_file in output_files:
+            with open(output_file, "r", encoding="utf-8") as f:
+                crawl = json.load(f)
+            pages.update({f"{output_file}:{url}": url for url in crawl["pages"]})
+            reports.append(crawl["report"])
+    finally:
+        site.stop()
+        shutil.rmtree(page_cache.directory, ignore_errors=True)
+        for output_file in output_files:
+            os.remove(output_file)
+    depths = [depth for depth in map(site.page_depth, pages.values()) if depth is not None]
+
+    return {
+        "site_pages": len(site.page_ids),
+        "site_pdfs": len(site.pdf_paths),
+        "slow_pages": len(site.slow_paths),
+        "jobs": jobs,
+        "pages_crawled": len(pages),
+        "elapsed_seconds": round(elapsed, 3),
+        "pages_per_second": round(len(pages) / elapsed, 2) if elapsed else None,
+        "pages_fetched": sum(report["fetched"] for report in reports),
+        "page_cache_hit_ratio": reports[0]["cache_hit_ratio"] if jobs == 1 else None,
+        "stop_reasons": sorted({report["stop_reason"] for report in reports}),
+        # Under a page budget, a best-first crawl keeps the shallow (high-priority) pages.
+        "mean_page_depth": round(sum(depths) / len(depths), 2) if depths else None,
+        **site.request_stats(),
+        "peak_rss_bytes_self": peak_rss_bytes(resource.RUSAGE_SELF),
+        # Largest browser (or other child) process, available once it has exited.
+        "peak_rss_bytes_children": peak_rss_bytes(resource.RUSAGE_CHILDREN),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl a local synthetic website with call_crawler.")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--fanout", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--cross-links", type=int, default=2)
+    parser.add_argument("--duplicate-rate", type=float, default=0.2, help="Share of pages linking a URL variant of another page")
+    parser.add_argument("--pdf-rate", type=float, default=0.05)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-delay", type=float, default=1.0, help="Seconds slow pages wait before responding")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--jobs", type=int, default=1, help="Concurrent crawls sharing the browser pool")
+    parser.add_argument("--warm-cache", action="store_true", help="Crawl once before measuring, to time a cached rebuild")
+    parser.add_argument("--sitemap", action="store_true", help="Serve robots.txt and a sitemap index listing every page")
+    parser.add_argument("--max-pages", type=int, default=0, help="Page budget of each crawl (0: none)")
+    parser.add_argument("--time-budget", type=int, default=0, help="Time budget of each crawl in seconds (0: none)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    site = MockSite(
+        pages=args.pages, fanout=args.fanout, depth=args.depth, cross_links=args.cross_links,
+        duplicate_rate=args.duplicate_rate, pdf_rate=args.pdf_rate, slow_rate=args.slow_rate,
+        slow_delay=args.slow_delay, seed=args.seed, sitemap=args.sitemap,
+    )
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    result = {"config": config, **run(site, jobs=args.jobs, warm_cache=args.warm_cache,
+                                      max_pages=args.max_pages, time_budget_seconds=args.time_budget)}
+
+    for key, value in result.items():
+        if key != "config":
+            print(f"{key:<26} {value}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Offline micro-benchmarks for the document_loader pipeline.
+
+Usage:
+    python -m benchmarks.bench_document_loader --output bench_document_loader.json
+    python -m benchmarks.bench_document_loader --compare previous.json --output current.json
+
+A deterministic synthetic corpus (crawled-site markdown and PDFs of several sizes)
+is generated into a temporary directory and every stage runs with a deterministic
+hashing embedding model, so no network or model download is needed and runs on
+different commits are comparable. Each stage is timed over --repeat runs, then run
+once more under tracemalloc for its peak Python memory.
+"""
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional
+
+from benchmarks.synthetic_corpus import generate_corpus
+from document_loader import augment_chunk_metadata, chunk_documents, deduplicate_chunks, filter_chunks, load_document
+from parallel_loader import PDF_BACKENDS, load_documents_parallel, resolve_pdf_backend
+from retrieval.bm25_index import build_bm25_index
+from retrieval.chunk_store import write_chunk_store
+from retrieval.hashing_embeddings import HashingEmbeddings
+from retrieval.numpy_index import build_numpy_index
+
+CHUNK_STRATEGIES = ["recursive", "markdown", "semantic"]
+
+
+def measure(stage: str, run: Callable, repeat: int, setup: Optional[Callable] = None,
+            items: Optional[Callable] = None, params: Optional[dict] = None) -> dict:
+    """Time run(*setup()) repeat times, then once more under tracemalloc.
+
+    setup builds fresh inputs outside the timed region; items(result) gives the
+    throughput denominator.
+    """
+    setup = setup or (lambda: ())
+    durations = []
+    result = None
+    for _ in range(repeat):
+        args = setup()
+        start = time.perf_counter()
+        result = run(*args)
+        durations.append(time.perf_counter() - start)
+
+    args = setup()
+    tracemalloc.start()
+    run(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(durations)
+    count = items(result) if items else None
+    row = {
+        "stage": stage,
+        "params": params or {},
+        "seconds_median": round(median, 6),
+        "seconds_min": round(min(durations), 6),
+        "items": count,
+        "items_per_second": round(count / median, 2) if count and median else None,
+        "peak_memory_bytes": peak,
+    }
+    print(f"{stage:<40} {median * 1000:>10.2f} ms  {row['items_per_second'] or '':>12} items/s  {peak / 1e6:>8.2f} MB peak")
+    return row
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(corpus: dict, repeat: int) -> List[dict]:
+    embeddings = HashingEmbeddings()
+    results = []
+
+    documents = []
+    for kind, paths in corpus.items():
+        for path in paths:
+            results.append(measure(
+                f"load_document[{kind}:{os.path.basename(path)}]",
+                lambda path=path: load_document(path), repeat,
+                items=len, params={"bytes": os.path.getsize(path)},
+            ))
+            documents.extend(load_document(path))
+
+    chunks_by_strategy = {}
+    for strategy in CHUNK_STRATEGIES:
+        results.append(measure(
+            f"chunk_documents[{strategy}]",
+            lambda docs, strategy=strategy: chunk_documents(docs, strategy=strategy, embeddings=embeddings), repeat,
+            setup=lambda: (copy.deepcopy(documents),), items=len, params={"documents": len(documents)},
+        ))
+        chunks_by_strategy[strategy] = chunk_documents(copy.deepcopy(documents), strategy=strategy, embeddings=embeddings)
+
+    chunks = chunks_by_strategy["recursive"]
+    results.append(measure("filter_chunks", filter_chunks, repeat, setup=lambda: (list(chunks),), items=lambda _: len(chunks)))
+    filtered = filter_chunks(list(chunks))
+    results.append(measure("deduplicate_chunks", deduplicate_chunks, repeat, setup=lambda: (list(filtered),), items=lambda _: len(filtered)))
+    unique = deduplicate_chunks(list(filtered))
+    results.append(measure("augment_chunk_metadata", augment_chunk_metadata, repeat, setup=lambda: (copy.deepcopy(unique),), items=len))
+    final_chunks = augment_chunk_metadata(copy.deepcopy(unique))
+    texts = [chunk.page_content for chunk in final_chunks]
+
+    results.append(measure("embedding[fake:hashing-384]", embeddings.embed_documents, repeat, setup=lambda: (texts,), items=len))
+    vectors = embeddings.embed_documents(texts)
+
+    def build_numpy(directory):
+        write_chunk_store(final_chunks, directory)
+        build_numpy_index(vectors, directory, embeddings.model_id)
+        return final_chunks
+
+    def build_bm25(directory):
+        build_bm25_index(final_chunks, os.path.join(directory, "bm25"))
+        return final_chunks
+
+    for name, build in [("index_build[numpy]", build_numpy), ("index_build[bm25]", build_bm25)]:
+        with tempfile.TemporaryDirectory() as root:
+            counter = iter(range(repeat + 1))
+            results.append(measure(name, build, repeat, setup=lambda: (os.path.join(root, str(next(counter))),), items=len))
+
+    try:
+        from langchain_chroma import Chroma
+    except ImportError:
+        print("langchain_chroma not installed, skipping index_build[chroma]")
+    else:
+        def build_chroma(directory):
+            Chroma.from_documents(documents=final_chunks, embedding=embeddings, persist_directory=directory)
+            return final_chunks
+
+        with tempfile.TemporaryDirectory() as root:
+            counter = iter(range(repeat + 1))
+            results.append(measure("index_build[chroma]", build_chroma, repeat, setup=lambda: (os.path.join(root, str(next(counter))),), items=len))
+
+    return results
+
+
+def run_upload_benchmarks(corpus: dict, repeat: int, workers: int) -> List[dict]:
+    """Loading every corpus file as one multi-file upload: sequential load_document versus
+    the loader process pool, per available PDF backend."""
+    paths = [path for kind_paths in corpus.values() for path in kind_paths]
+
+    def count_documents(result: dict) -> int:
+        return sum(len(documents) for documents in result.values())
+
+    results = [measure(
+        "upload_load[sequential]", lambda: {path: load_document(path) for path in paths}, repeat,
+        items=count_documents, params={"files": len(paths)},
+    )]
+    sequential = results[0]["seconds_median"]
+
+    backends = sorted({resolve_pdf_backend(backend) for backend in PDF_BACKENDS})
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        load_documents_parallel(paths[:1], executor=pool)  # start the workers outside the timed runs
+        for backend in backends:
+            row = measure(
+                f"upload_load[parallel:{backend}]",
+                lambda backend=backend: load_documents_parallel(paths, backend=backend, executor=pool), repeat,
+                items=count_documents, params={"files": len(paths), "workers": workers},
+            )
+            row["speedup_vs_sequential"] = round(sequential / row["seconds_median"], 2) if row["seconds_median"] else None
+            print(f"{'':<40} {row['speedup_vs_sequential']}x faster than sequential")
+            results.append(row)
+    return results
+
+
+def compare(previous_path: str, results: List[dict]) -> None:
+    with open(previous_path, "r") as f:
+        previous = {row["stage"]: row for row in json.load(f)["results"]}
+    print(f"\nComparison with {previous_path} (median time, >1.00x means slower now):")
+    for row in results:
+        before = previous.get(row["stage"])
+        if before and before["seconds_median"]:
+            ratio = row["seconds_median"] / before["seconds_median"]
+            print(f"{row['stage']:<40} {ratio:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks for the document_loader pipeline.")
+    parser.add_argument("--markdown-pages", type=int, default=100, help="Pages in the synthetic crawled site")
+    parser.add_argument("--pdf-pages", default="5,50,200", help="Comma-separated page counts, one PDF each")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--loader-workers", type=int, default=os.cpu_count() or 1, help="Processes for the parallel upload benchmark")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    args = parser.parse_args()
+
+    pdf_pages = [int(n) for n in args.pdf_pages.split(",") if n]
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        corpus = generate_corpus(corpus_dir, markdown_pages=args.markdown_pages, pdf_pages=pdf_pages, seed=args.seed)
+        results = run_benchmarks(corpus, args.repeat)
+        results += run_upload_benchmarks(corpus, args.repeat, args.loader_workers)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "corpus": {"markdown_pages": args.markdown_pages, "pdf_pages": pdf_pages, "seed": args.seed},
+        "repeat": args.repeat,
+        "results": results,
+    }
+    if args.compare:
+        compare(args.compare, results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
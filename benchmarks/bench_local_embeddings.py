@@ -0,0 +1,128 @@
+"""Throughput, query latency and vector agreement of the local embedding backends.
+
+Usage:
+    python -m benchmarks.bench_local_embeddings --chunks 2000 --queries 200 --threads 1,4
+    LOCAL_EMBEDDING_MODEL_DIR=/models/all-MiniLM-L6-v2 python -m benchmarks.bench_local_embeddings --backends onnx,onnx-int8
+
+Embeds synthetic chunks and queries with each backend of
+retrieval.local_embeddings (the ONNX ones once per --threads value) and reports
+chunks per second, single-query p50/p95 latency, queries per second with
+--concurrency callers (batched by QueryBatcher), and how close the vectors are to
+the first backend's: mean and minimum cosine similarity of the chunk vectors and
+recall@10 of the chunks retrieved per query. Backends that cannot be loaded
+(missing runtime or model files) are reported and skipped.
+"""
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic_corpus import make_vocabulary, paragraph, sentence
+from retrieval.local_embeddings import LOCAL_EMBEDDING_MODEL, OnnxSentenceEmbeddings, available_cpus, get_local_embeddings
+
+TOP_K = 10
+
+
+def load_backend(backend: str, threads: int):
+    if backend == "torch":
+        return get_local_embeddings(LOCAL_EMBEDDING_MODEL, backend="torch")
+    return OnnxSentenceEmbeddings(LOCAL_EMBEDDING_MODEL, quantized=backend == "onnx-int8", threads=threads)
+
+
+def percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 2)
+
+
+def measure(embeddings, chunks: List[str], queries: List[str], concurrency: int) -> dict:
+    embeddings.embed_documents(chunks[:8])  # warm-up
+    start = time.perf_counter()
+    chunk_vectors = np.asarray(embeddings.embed_documents(chunks), dtype=np.float32)
+    chunk_seconds = time.perf_counter() - start
+
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        list(pool.map(embeddings.embed_query, queries))
+        concurrent_seconds = time.perf_counter() - start
+
+    return {
+        "chunks_per_second": round(len(chunks) / chunk_seconds, 1),
+        "query_p50_ms": percentile(latencies, 50),
+        "query_p95_ms": percentile(latencies, 95),
+        "concurrent_queries_per_second": round(len(queries) / concurrent_seconds, 1),
+        "_chunk_vectors": chunk_vectors,
+        "_query_vectors": np.asarray(query_vectors, dtype=np.float32),
+    }
+
+
+def agreement(result: dict, baseline: dict) -> dict:
+    chunks, base_chunks = result["_chunk_vectors"], baseline["_chunk_vectors"]
+    cosine = np.sum(chunks * base_chunks, axis=1) / (
+        np.linalg.norm(chunks, axis=1) * np.linalg.norm(base_chunks, axis=1))
+    top = np.argsort(-(result["_query_vectors"] @ chunks.T), axis=1)[:, :TOP_K]
+    base_top = np.argsort(-(baseline["_query_vectors"] @ base_chunks.T), axis=1)[:, :TOP_K]
+    recall = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(top, base_top)])
+    return {
+        "mean_cosine_to_baseline": round(float(cosine.mean()), 5),
+        "min_cosine_to_baseline": round(float(cosine.min()), 5),
+        f"recall@{TOP_K}_vs_baseline": round(float(recall), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the local embedding backends.")
+    parser.add_argument("--backends", default="torch,onnx,onnx-int8", help="Comma-separated; the first is the baseline")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threads", default="0", help="Comma-separated ONNX thread counts (0: all available CPUs)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Threads issuing queries at once")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(5000, rng)
+    chunks = [paragraph(vocabulary, rng) for _ in range(args.chunks)]
+    queries = [sentence(vocabulary, rng) for _ in range(args.queries)]
+
+    results = []
+    baseline: Optional[dict] = None
+    for backend in args.backends.split(","):
+        for threads in ([0] if backend == "torch" else [int(t) for t in args.threads.split(",")]):
+            row = {"backend": backend, "threads": threads or available_cpus()}
+            try:
+                start = time.perf_counter()
+                embeddings = load_backend(backend, threads)
+                row["load_seconds"] = round(time.perf_counter() - start, 2)
+            except Exception as e:
+                row["error"] = f"{type(e).__name__}: {e}"
+                print(json.dumps(row))
+                results.append(row)
+                break
+            row.update(measure(embeddings, chunks, queries, args.concurrency))
+            if baseline is None:
+                baseline = row
+            row.update(agreement(row, baseline))
+            results.append(row)
+            print(json.dumps({key: value for key, value in row.items() if not key.startswith("_")}))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "config": vars(args),
+                "results": [{key: value for key, value in row.items() if not key.startswith("_")} for row in results],
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Embedding throughput of provider_client against the local fake provider.
+
+Usage:
+    python -m benchmarks.bench_provider_client --chunks 5000 --rate-limit-rate 0.1 --embedding-latency 0.2
+
+Embeds synthetic chunks with OpenAIEmbeddingClient, once with one batch at a
+time and once with --concurrency batches in flight, while the fake server
+answers --rate-limit-rate of the requests with 429. Reports chunks per second,
+requests, 429s and retries, and checks every vector against the server's
+embedding of the same text (retried batches must not shuffle or drop results).
+No network access is needed.
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from benchmarks.synthetic_corpus import make_vocabulary, paragraph
+from provider_client import OpenAIEmbeddingClient, ProviderClient
+
+
+def run(texts: list, concurrency: int, batch_tokens: int, rate_limit_rate: float, retry_after: float,
+        embedding_latency: float, tokens_per_minute: int) -> dict:
+    server = FakeLLMServer(embedding_dimension=256, rate_limit_rate=rate_limit_rate, retry_after=retry_after,
+                           embedding_latency=embedding_latency)
+    base_url = server.start()
+    try:
+        client = ProviderClient(base_url=base_url, api_key="bench", tokens_per_minute=tokens_per_minute,
+                                max_retries=20)
+        embeddings = OpenAIEmbeddingClient(api_key="bench", client=client, concurrency=concurrency,
+                                           batch_tokens=batch_tokens)
+        start = time.perf_counter()
+        vectors = embeddings.embed_documents(texts)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+
+    expected = server.embeddings.embed_documents([text.replace("\n", " ") for text in texts])
+    return {
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "chunks_per_second": round(len(texts) / elapsed, 1) if elapsed else None,
+        "requests": server.request_count,
+        "rate_limited": server.rate_limited_count,
+        "retries": client.retries,
+        "vectors_match": len(vectors) == len(texts) and bool(np.allclose(vectors, expected, atol=1e-6)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput of provider_client against the fake provider.")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-tokens", type=int, default=20000, help="Token budget of one embeddings request")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.1, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--embedding-latency", type=float, default=0.2, help="Seconds the server takes per request")
+    parser.add_argument("--tokens-per-minute", type=int, default=0, help="Client-side token limit (0: none)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(5000, rng)
+    texts = [paragraph(vocabulary, rng) for _ in range(args.chunks)]
+
+    results = []
+    for concurrency in (1, args.concurrency):
+        results.append(run(texts, concurrency, args.batch_tokens, args.rate_limit_rate, args.retry_after,
+                           args.embedding_latency, args.tokens_per_minute))
+        print(json.dumps(results[-1]))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Recall@k and latency of quantised NumPy indexes against the float32 baseline.
+
+Usage:
+    python -m benchmarks.bench_quantization --count 50000 --dim 384
+    python -m benchmarks.bench_quantization --embeddings vector_db_storage/<bot_id>/embeddings.npy
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+
+from retrieval.chunk_store import write_chunk_store
+from retrieval.numpy_index import EMBEDDINGS_FILE, QUANTIZED_FILE, SCALES_FILE, NumpyVectorIndex, build_numpy_index, normalize_rows
+
+
+def synthetic_embeddings(count: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Clustered vectors, closer to real sentence embeddings than isotropic noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    assignment = rng.integers(0, clusters, size=count)
+    return normalize_rows(centers[assignment] + 0.6 * rng.normal(size=(count, dim)).astype(np.float32))
+
+
+def hot_bytes(directory: str, quantization: str) -> int:
+    """Bytes that must stay resident to score a query (float32 re-rank rows are touched sparsely)."""
+    if quantization == "float32":
+        return os.path.getsize(os.path.join(directory, EMBEDDINGS_FILE))
+    total = os.path.getsize(os.path.join(directory, QUANTIZED_FILE))
+    if quantization == "int8":
+        total += os.path.getsize(os.path.join(directory, SCALES_FILE))
+    return total
+
+
+def run(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[dict]:
+    placeholder_chunks = [Document(page_content="") for _ in range(len(vectors))]
+    baseline = None
+    results = []
+    for quantization, rerank in [("float32", False), ("float16", False), ("float16", True), ("int8", False), ("int8", True)]:
+        with tempfile.TemporaryDirectory() as directory:
+            write_chunk_store(placeholder_chunks, directory)
+            build_numpy_index(vectors, directory, "benchmark:synthetic", quantization=quantization, rerank=rerank)
+            index = NumpyVectorIndex(directory, embedding_function=None)
+
+            latencies = []
+            retrieved = []
+            for query in queries:
+                start = time.perf_counter()
+                hits = index.search_by_vector(query, k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                retrieved.append({i for i, _ in hits})
+
+            if baseline is None:
+                baseline = retrieved
+            recall = float(np.mean([len(got & want) / k for got, want in zip(retrieved, baseline)]))
+            results.append({
+                "quantization": quantization,
+                "rerank": rerank,
+                "hot_bytes": hot_bytes(directory, quantization),
+                f"recall@{k}": round(recall, 4),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--embeddings", help="Existing embeddings.npy to benchmark instead of synthetic vectors")
+    parser.add_argument("--count", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed + 1)
+    if args.embeddings:
+        vectors = normalize_rows(np.load(args.embeddings).astype(np.float32))
+    else:
+        vectors = synthetic_embeddings(args.count, args.dim, args.clusters, args.seed)
+    picked = vectors[rng.integers(0, len(vectors), size=args.queries)]
+    queries = normalize_rows(picked + 0.3 * rng.normal(size=picked.shape).astype(np.float32))
+
+    results = run(vectors, queries, args.k)
+    for row in results:
+        print("  ".join(f"{key}={value}" for key, value in row.items()))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"count": len(vectors), "dimension": int(vectors.shape[1]), "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
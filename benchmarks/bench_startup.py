@@ -0,0 +1,118 @@
+"""Cold-start import cost of the FastAPI app per serving mode.
+
+Usage:
+    python -m benchmarks.bench_startup --repeat 5 --output bench_startup.json [--compare previous.json]
+
+Each run imports app in a fresh interpreter with -X importtime and reports the
+wall time of the import, the slowest top-level packages (cumulative import
+time) and which heavy ingestion dependencies ended up loaded. None of the
+crawler stack, PDF parsing or the chunkers should appear: they are imported by
+the first ingestion request, which query-mode replicas never serve.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that only document ingestion (crawling, parsing, chunking, storage) needs.
+HEAVY_MODULES = [
+    "crawl4ai", "playwright", "PyPDF2", "pypdf", "psycopg2", "langchain_experimental",
+    "langchain_community", "langchain_chroma", "chromadb", "langchain_openai", "openai",
+    "sentence_transformers", "torch",
+]
+
+_PROBE = (
+    "import json, sys, time\n"
+    "start = time.perf_counter()\n"
+    "import app\n"
+    "elapsed = time.perf_counter() - start\n"
+    "print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))\n"
+) % (HEAVY_MODULES,)
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """Cumulative import seconds per top-level package from -X importtime output."""
+    packages: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nested imports are indented and already part of their parent's cumulative time.
+        if not name[1:].startswith(" ") and "." not in name:
+            packages[name.strip()] += int(cumulative) / 1e6
+    return packages
+
+
+def measure(mode: str, repeat: int) -> dict:
+    env = {**os.environ, "SERVING_MODE": mode, "PYTHONPATH": REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    durations, import_seconds, packages, loaded = [], [], defaultdict(list), []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _PROBE],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+        )
+        durations.append(time.perf_counter() - start)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing app failed in {mode} mode:\n{completed.stderr[-2000:]}")
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        import_seconds.append(probe["seconds"])
+        loaded = probe["loaded"]
+        for name, seconds in parse_importtime(completed.stderr).items():
+            packages[name].append(seconds)
+
+    slowest = sorted(((name, statistics.median(values)) for name, values in packages.items()),
+                     key=lambda item: item[1], reverse=True)[:10]
+    return {
+        "mode": mode,
+        "process_seconds_median": round(statistics.median(durations), 3),
+        "import_seconds_median": round(statistics.median(import_seconds), 3),
+        "import_seconds_min": round(min(import_seconds), 3),
+        "heavy_modules_loaded": loaded,
+        "slowest_packages": [{"package": name, "seconds": round(seconds, 3)} for name, seconds in slowest],
+    }
+
+
+def compare(previous_path: str, results: List[dict]) -> None:
+    with open(previous_path, "r") as f:
+        previous = {row["mode"]: row for row in json.load(f)["results"]}
+    print(f"\nComparison with {previous_path} (median import time, >1.00x means slower now):")
+    for row in results:
+        before = previous.get(row["mode"])
+        if before and before["import_seconds_median"]:
+            ratio = row["import_seconds_median"] / before["import_seconds_median"]
+            print(f"{row['mode']:<10} {ratio:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import cost of the FastAPI app per serving mode.")
+    parser.add_argument("--modes", default="query,full", help="Comma-separated SERVING_MODE values")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    args = parser.parse_args()
+
+    results = [measure(mode, args.repeat) for mode in args.modes.split(",") if mode]
+    for row in results:
+        print(f"{row['mode']}: import {row['import_seconds_median']}s (min {row['import_seconds_min']}s), "
+              f"process {row['process_seconds_median']}s")
+        print(f"  heavy modules loaded: {', '.join(row['heavy_modules_loaded']) or 'none'}")
+        for entry in row["slowest_packages"]:
+            print(f"  {entry['package']:<30} {entry['seconds']:>7.3f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": {"repeat": args.repeat, "python": sys.version.split()[0]}, "results": results}, f, indent=2)
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
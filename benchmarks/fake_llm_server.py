@@ -0,0 +1,163 @@
+"""Local OpenAI-compatible stub for load tests.
+
+Serves POST /v1/chat/completions with a configurable time-to-first-token and
+token rate, and POST /v1/embeddings with deterministic hashing embeddings. Point
+the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 and any
+OPENAI_API_KEY. With --rate-limit-rate, that share of requests is answered with
+429 and a Retry-After header, to exercise the retries of provider_client.
+
+Usage:
+    python -m benchmarks.fake_llm_server --port 8100 --latency 0.3 --tokens-per-second 80
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from retrieval.hashing_embeddings import HashingEmbeddings
+
+ANSWER_WORD = "lorem"
+
+
+class FakeLLMServer:
+    def __init__(self, latency: float = 0.3, tokens_per_second: float = 80.0, completion_tokens: int = 60,
+                 embedding_dimension: int = 1536, rate_limit_rate: float = 0.0, retry_after: float = 0.2,
+                 embedding_latency: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.completion_tokens = completion_tokens
+        self.embeddings = HashingEmbeddings(embedding_dimension)
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.embedding_latency = embedding_latency
+        self.request_count = 0
+        self.rate_limited_count = 0
+        self.embedding_inputs = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def completion_delay(self) -> float:
+        return self.latency + (self.completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0)
+
+    def chat_completion(self, payload: dict) -> dict:
+        time.sleep(self.completion_delay())
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in payload.get("messages", []))
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join([ANSWER_WORD] * self.completion_tokens)},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": prompt_tokens + self.completion_tokens,
+            },
+        }
+
+    def embeddings_response(self, payload: dict) -> dict:
+        inputs = payload.get("input", [])
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        # Token-id inputs (sent by OpenAIEmbeddings) are embedded by their id sequence.
+        texts = [text if isinstance(text, str) else " ".join(map(str, text)) for text in inputs]
+        time.sleep(self.embedding_latency)
+        vectors = self.embeddings.embed_documents(texts)
+        with self._lock:
+            self.embedding_inputs += len(texts)
+        return {
+            "object": "list",
+            "model": payload.get("model", "fake"),
+            "data": [{"object": "embedding", "index": i, "embedding": vector} for i, vector in enumerate(vectors)],
+            "usage": {"prompt_tokens": sum(len(t.split()) for t in texts), "total_tokens": sum(len(t.split()) for t in texts)},
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.request_count += 1
+                    rate_limited = server._random.random() < server.rate_limit_rate
+                    server.rate_limited_count += rate_limited
+
+                if rate_limited:
+                    content = b'{"error": {"message": "Rate limit reached", "type": "requests"}}'
+                    self.send_response(429)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(content)))
+                    self.send_header("Retry-After", str(server.retry_after))
+                    self.end_headers()
+                    self.wfile.write(content)
+                    return
+
+                if self.path.rstrip("/").endswith("/chat/completions"):
+                    body = server.chat_completion(payload)
+                elif self.path.rstrip("/").endswith("/embeddings"):
+                    body = server.embeddings_response(payload)
+                else:
+                    self.send_error(404)
+                    return
+
+                content = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in a background thread; returns the OpenAI base URL (ending in /v1)."""
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}/v1"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible stub for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After seconds sent with 429 responses")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.latency, args.tokens_per_second, args.completion_tokens,
+                           rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after)
+    print(f"Fake LLM provider listening at {server.start(args.host, args.port)}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""End-to-end load test for /query_bot/ and /create_bot/.
+
+Usage:
+    # Self-contained: starts the fake LLM provider and the app (fake embeddings) in a temp directory
+    python -m benchmarks.load_test --launch --scenario mixed --concurrency 16 --duration 60
+
+    # Against an app you started yourself, e.g. with
+    #   EMBEDDINGS_PROVIDER=fake OPENAI_API_KEY=sk-fake OPENAI_BASE_URL=http://127.0.0.1:8100/v1 uvicorn app:app
+    #   python -m benchmarks.fake_llm_server --port 8100
+    python -m benchmarks.load_test --base-url http://localhost:8000 --scenario query --concurrency 32
+
+Reports p50/p95/p99 latency, throughput and error rate per endpoint.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_llm_server import FakeLLMServer
+from benchmarks.synthetic_corpus import make_vocabulary, markdown_page, sentence
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    # Nearest-rank percentile
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoadTest:
+    def __init__(self, base_url: str, seed: int = 0, document_pages: int = 20):
+        self.base_url = base_url.rstrip("/")
+        self.rng = random.Random(seed)
+        self.vocabulary = make_vocabulary(2000, self.rng)
+        self.document_pages = document_pages
+        self.samples: Dict[str, List[tuple]] = defaultdict(list)
+        self.bot_ids: List[str] = []
+
+    def synthetic_document(self) -> bytes:
+        pages = [markdown_page(self.vocabulary, self.rng, f"Page {i}") for i in range(self.document_pages)]
+        return "\n\n".join(pages).encode("utf-8")
+
+    async def create_bot(self, client: httpx.AsyncClient, record: bool = True) -> Optional[str]:
+        files = [("files", ("document.txt", self.synthetic_document(), "text/plain"))]
+        start = time.perf_counter()
+        try:
+            response = await client.post(f"{self.base_url}/create_bot/", files=files)
+            status = response.status_code
+            bot_id = response.json().get("bot_id") if status == 200 else None
+        except httpx.HTTPError as e:
+            status, bot_id = type(e).__name__, None
+        if record:
+            self.samples["create_bot"].append((time.perf_counter() - start, status))
+        if bot_id:
+            self.bot_ids.append(bot_id)
+        return bot_id
+
+    async def query_bot(self, client: httpx.AsyncClient):
+        payload = {"bot_id": self.rng.choice(self.bot_ids), "query": sentence(self.vocabulary, self.rng), "context": ""}
+        start = time.perf_counter()
+        try:
+            response = await client.post(f"{self.base_url}/query_bot/", json=payload)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        self.samples["query_bot"].append((time.perf_counter() - start, status))
+
+    async def worker(self, client: httpx.AsyncClient, scenario: str, create_ratio: float, deadline: float, remaining: List[int]):
+        while time.perf_counter() < deadline and remaining[0] != 0:
+            remaining[0] -= 1
+            if scenario == "create" or (scenario == "mixed" and self.rng.random() < create_ratio):
+                await self.create_bot(client)
+            else:
+                await self.query_bot(client)
+
+    async def run(self, scenario: str, concurrency: int, duration: float, requests: int, bots: int,
+                  create_ratio: float, bot_ids: List[str]) -> float:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(timeout=300, limits=limits) as client:
+            self.bot_ids.extend(bot_ids)
+            if scenario != "create" and not self.bot_ids:
+                print(f"Creating {bots} bots for the query workload...")
+                for _ in range(bots):
+                    await self.create_bot(client, record=False)
+                if not self.bot_ids:
+                    raise RuntimeError("Could not create any bot; check the app logs")
+
+            remaining = [requests or -1]
+            start = time.perf_counter()
+            await asyncio.gather(*[
+                self.worker(client, scenario, create_ratio, start + duration, remaining) for _ in range(concurrency)
+            ])
+            return time.perf_counter() - start
+
+    def report(self, elapsed: float) -> Dict[str, dict]:
+        summary = {}
+        for endpoint, samples in self.samples.items():
+            latencies = sorted(latency for latency, _ in samples)
+            statuses = Counter(str(status) for _, status in samples)
+            errors = sum(count for status, count in statuses.items() if status != "200")
+            summary[endpoint] = {
+                "requests": len(samples),
+                "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+                "error_rate": round(errors / len(samples), 4) if samples else None,
+                "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+                "status_codes": dict(statuses),
+            }
+        return summary
+
+
+def launch_app(port: int, llm_base_url: str, workdir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PYTHONPATH": REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        "EMBEDDINGS_PROVIDER": "fake",
+        "OPENAI_API_KEY": "sk-fake-load-test",
+        "OPENAI_BASE_URL": llm_base_url,
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port)],
+        cwd=workdir, env=env,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        if process.poll() is not None:
+            raise RuntimeError("App exited during startup")
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("App did not become healthy within 120s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test for /query_bot/ and /create_bot/.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--launch", action="store_true", help="Start the fake LLM provider and the app locally")
+    parser.add_argument("--port", type=int, default=8765, help="App port with --launch")
+    parser.add_argument("--scenario", choices=["query", "create", "mixed"], default="query")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0: duration only)")
+    parser.add_argument("--bots", type=int, default=5, help="Bots to create before a query workload")
+    parser.add_argument("--bot-id", action="append", default=[], help="Query existing bots instead of creating them")
+    parser.add_argument("--create-ratio", type=float, default=0.05, help="Share of create_bot requests in mixed mode")
+    parser.add_argument("--document-pages", type=int, default=20, help="Synthetic pages per uploaded document")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake provider time to first token (s)")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--llm-completion-tokens", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    llm_server, app_process, workdir = None, None, None
+    base_url = args.base_url
+    try:
+        if args.launch:
+            llm_server = FakeLLMServer(args.llm_latency, args.llm_tokens_per_second, args.llm_completion_tokens)
+            workdir = tempfile.TemporaryDirectory()
+            app_process = launch_app(args.port, llm_server.start(), workdir.name)
+            base_url = f"http://127.0.0.1:{args.port}"
+
+        load_test = LoadTest(base_url, seed=args.seed, document_pages=args.document_pages)
+        elapsed = asyncio.run(load_test.run(
+            args.scenario, args.concurrency, args.duration, args.requests, args.bots, args.create_ratio, args.bot_id
+        ))
+    finally:
+        if app_process:
+            app_process.terminate()
+            app_process.wait(timeout=30)
+        if llm_server:
+            llm_server.stop()
+        if workdir:
+            workdir.cleanup()
+
+    summary = load_test.report(elapsed)
+    for endpoint, stats in summary.items():
+        print(f"{endpoint}: " + "  ".join(f"{key}={value}" for key, value in stats.items()))
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key != "output"}
+        with open(args.output, "w") as f:
+            json.dump({"config": config, "elapsed_seconds": round(elapsed, 3), "endpoints": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
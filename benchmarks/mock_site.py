@@ -0,0 +1,183 @@
+"""Deterministic synthetic website served from a local HTTP server."""
+import random
+import threading
+import time
+from collections import Counter
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from benchmarks.synthetic_corpus import make_vocabulary, paragraph, pdf_bytes, sentence
+
+
+class MockSite:
+    """Page graph with a link tree of given fan-out and depth, cross links,
+    duplicate URL variants (query strings, fragments, trailing slashes), PDFs and
+    deliberately slow pages. With sitemap=True the site also serves a robots.txt
+    pointing at a sitemap index, whose sitemaps list every page with a priority
+    falling with its tree depth."""
+
+    def __init__(self, pages: int = 200, fanout: int = 5, depth: int = 4, cross_links: int = 2,
+                 duplicate_rate: float = 0.2, pdf_rate: float = 0.05, slow_rate: float = 0.05,
+                 slow_delay: float = 1.0, seed: int = 0, sitemap: bool = False):
+        self.rng = random.Random(seed)
+        self.vocabulary = make_vocabulary(2000, self.rng)
+        self.slow_delay = slow_delay
+        self.sitemap = sitemap
+
+        # Breadth-first tree: page i's children are the next unassigned pages, up to depth.
+        self.links: Dict[int, List[str]] = {0: []}
+        self.depths: Dict[int, int] = {0: 0}
+        frontier, next_page = [0], 1
+        for level in range(depth):
+            next_frontier = []
+            for parent in frontier:
+                for _ in range(fanout):
+                    if next_page >= pages:
+                        break
+                    self.links[parent].append(self.page_path(next_page))
+                    self.links[next_page] = []
+                    self.depths[next_page] = level + 1
+                    next_frontier.append(next_page)
+                    next_page += 1
+            frontier = next_frontier
+        self.page_ids = sorted(self.links)
+
+        self.pdf_paths = set()
+        self.slow_paths = set()
+        for page in self.page_ids:
+            for _ in range(cross_links):
+                self.links[page].append(self.page_path(self.rng.choice(self.page_ids)))
+            if self.rng.random() < duplicate_rate:
+                target = self.page_path(self.rng.choice(self.page_ids))
+                self.links[page].append(self.rng.choice([f"{target}?ref=nav", f"{target}#top", f"{target}/"]))
+            if self.rng.random() < pdf_rate:
+                pdf_path = f"/docs/{page}.pdf"
+                self.pdf_paths.add(pdf_path)
+                self.links[page].append(pdf_path)
+            if self.rng.random() < slow_rate:
+                self.slow_paths.add(self.page_path(page))
+
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @staticmethod
+    def page_path(page: int) -> str:
+        return "/" if page == 0 else f"/page/{page}"
+
+    @staticmethod
+    def canonical_path(path: str) -> str:
+        path = urlsplit(path).path
+        return path.rstrip("/") or "/"
+
+    def render_page(self, page: int) -> bytes:
+        rng = random.Random(page)
+        body = ["<nav><a href='/'>Home</a> | <a href='/page/1'>About</a></nav>", f"<h1>Page {page}</h1>"]
+        body.extend(f"<p>{escape(paragraph(self.vocabulary, rng))}</p>" for _ in range(rng.randint(2, 6)))
+        body.append("<ul>" + "".join(f"<li><a href='{escape(href)}'>{escape(href)}</a></li>" for href in self.links[page]) + "</ul>")
+        body.append("<footer>Copyright Mock University</footer>")
+        return f"<html><head><title>Page {page}</title></head><body>{''.join(body)}</body></html>".encode("utf-8")
+
+    def render_robots(self, base_url: str) -> bytes:
+        return f"User-agent: *\nDisallow: /private/\nSitemap: {base_url}/sitemap_index.xml\n".encode("utf-8")
+
+    def render_sitemap(self, path: str, base_url: str) -> Optional[bytes]:
+        chunks = [self.page_ids[i:i + 50] for i in range(0, len(self.page_ids), 50)]
+        if path == "/sitemap_index.xml":
+            items = "".join(f"<sitemap><loc>{base_url}/sitemaps/{i}.xml</loc></sitemap>" for i in range(len(chunks)))
+            return f'<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{items}</sitemapindex>'.encode("utf-8")
+        name = path[len("/sitemaps/"):-len(".xml")] if path.startswith("/sitemaps/") and path.endswith(".xml") else ""
+        if not name.isdigit() or int(name) >= len(chunks):
+            return None
+        items = "".join(
+            f"<url><loc>{base_url}{self.page_path(page)}</loc>"
+            f"<priority>{max(1.0 - 0.2 * self.depths[page], 0.1):.1f}</priority>"
+            f"<lastmod>2024-01-{1 + page % 28:02d}</lastmod></url>"
+            for page in chunks[int(name)]
+        )
+        return f'<?xml version="1.0"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{items}</urlset>'.encode("utf-8")
+
+    def render_pdf(self, path: str) -> bytes:
+        rng = random.Random(path)
+        lines = [f"Document {path}"] + [sentence(self.vocabulary, rng)[:110] for _ in range(40)]
+        return pdf_bytes([lines, lines[::-1]])
+
+    def page_for_path(self, canonical: str) -> Optional[int]:
+        if canonical == "/":
+            return 0
+        if canonical.startswith("/page/") and canonical[len("/page/"):].isdigit():
+            page = int(canonical[len("/page/"):])
+            return page if page in self.links else None
+        return None
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                canonical = site.canonical_path(self.path)
+                with site._lock:
+                    site.requests[canonical] += 1
+                if canonical in site.slow_paths:
+                    time.sleep(site.slow_delay)
+
+                base_url = f"http://{self.headers['Host']}"
+                if site.sitemap and canonical == "/robots.txt":
+                    content, content_type = site.render_robots(base_url), "text/plain"
+                elif site.sitemap and canonical.endswith(".xml"):
+                    content = site.render_sitemap(canonical, base_url)
+                    if content is None:
+                        self.send_error(404)
+                        return
+                    content_type = "application/xml"
+                elif canonical in site.pdf_paths:
+                    content, content_type = site.render_pdf(canonical), "application/pdf"
+                else:
+                    page = site.page_for_path(canonical)
+                    if page is None:
+                        self.send_error(404)
+                        return
+                    content, content_type = site.render_page(page), "text/html; charset=utf-8"
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in a background thread; returns the base URL."""
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{host}:{self._server.server_address[1]}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.requests.clear()
+
+    def page_depth(self, url: str) -> Optional[int]:
+        page = self.page_for_path(self.canonical_path(url))
+        return self.depths.get(page) if page is not None else None
+
+    def request_stats(self) -> dict:
+        with self._lock:
+            known = {path: count for path, count in self.requests.items()
+                     if path in self.pdf_paths or self.page_for_path(path) is not None}
+        total = sum(known.values())
+        return {
+            "requests": total,
+            "unique_urls_fetched": len(known),
+            "duplicate_fetches": total - len(known),
+        }
@@ -0,0 +1,112 @@
+"""Deterministic synthetic documents: crawled-site markdown and PDFs of chosen sizes."""
+import os
+import random
+from typing import Dict, List
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "te", "vi", "zo", "ar", "en", "is", "om", "ul", "qua", "tri"]
+NAV_BOILERPLATE = "Home | About | Admissions | Programs | Research | Contact | Login"
+FOOTER_BOILERPLATE = "Copyright 2025. All rights reserved. Privacy Policy | Terms of Use | Sitemap"
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))))
+    return sorted(words)
+
+
+def sentence(vocabulary: List[str], rng: random.Random) -> str:
+    words = [rng.choice(vocabulary) for _ in range(rng.randint(6, 20))]
+    return " ".join(words).capitalize() + "."
+
+
+def paragraph(vocabulary: List[str], rng: random.Random) -> str:
+    return " ".join(sentence(vocabulary, rng) for _ in range(rng.randint(2, 7)))
+
+
+def markdown_page(vocabulary: List[str], rng: random.Random, title: str) -> str:
+    """One crawled page as crawl4ai would render it, nav and footer included."""
+    parts = [NAV_BOILERPLATE, f"# {title}"]
+    for section in range(rng.randint(1, 4)):
+        parts.append(f"## {title} section {section + 1}")
+        parts.extend(paragraph(vocabulary, rng) for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.3:
+            parts.append(f"### Details {section + 1}")
+            parts.extend(f"- {sentence(vocabulary, rng)}" for _ in range(rng.randint(2, 5)))
+    parts.append(FOOTER_BOILERPLATE)
+    return "\n\n".join(parts)
+
+
+def write_markdown_site(path: str, pages: int, rng: random.Random, vocabulary: List[str]) -> None:
+    """All pages of a site joined the way create_vector_db_from_config feeds them to the loader."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(markdown_page(vocabulary, rng, f"Page {i}") for i in range(pages)))
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_bytes(pages: List[List[str]]) -> bytes:
+    """A minimal uncompressed PDF with one Helvetica text line per list entry."""
+    objects: List[bytes] = []
+    page_ids = [3 + 2 * i for i in range(len(pages))]
+    font_id = 3 + 2 * len(pages)
+
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    for page_id, lines in zip(page_ids, pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        text = "BT /F1 9 Tf 11 TL 40 760 Td " + " ".join(f"({_pdf_escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = text.encode("latin-1", errors="replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(output)
+
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    with open(path, "wb") as f:
+        f.write(pdf_bytes(pages))
+
+
+def write_synthetic_pdf(path: str, page_count: int, rng: random.Random, vocabulary: List[str], lines_per_page: int = 60) -> None:
+    pages = []
+    for page in range(page_count):
+        lines = [f"Brochure page {page + 1}"]
+        while len(lines) < lines_per_page:
+            lines.append(sentence(vocabulary, rng)[:110])
+        pages.append(lines)
+    write_pdf(path, pages)
+
+
+def generate_corpus(directory: str, markdown_pages: int = 200, pdf_pages: List[int] = (5, 50, 300),
+                    vocabulary_size: int = 3000, seed: int = 0) -> Dict[str, List[str]]:
+    """Write the corpus into directory; returns {"markdown": [...paths], "pdf": [...paths]}."""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(vocabulary_size, rng)
+    os.makedirs(directory, exist_ok=True)
+
+    corpus = {"markdown": [], "pdf": []}
+    if markdown_pages:
+        path = os.path.join(directory, f"site_{markdown_pages}_pages.txt")
+        write_markdown_site(path, markdown_pages, rng, vocabulary)
+        corpus["markdown"].append(path)
+    for page_count in pdf_pages:
+        path = os.path.join(directory, f"brochure_{page_count}_pages.pdf")
+        write_synthetic_pdf(path, page_count, rng, vocabulary)
+        corpus["pdf"].append(path)
+    return corpus
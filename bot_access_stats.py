@@ -0,0 +1,109 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: single worker, no cross-process lock needed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Access counts decay with this half-life when ranking bots for warmup.
+HALF_LIFE_SECONDS = 7 * 24 * 3600
+
+
+class BotAccessStats:
+    """Per-bot access counts and last-access times, persisted to a JSON file.
+
+    Accesses are counted in memory and merged into the file by flush(), so the
+    query path never touches the disk. The merge runs under a file lock, which
+    lets several workers share one stats file.
+    """
+
+    def __init__(self, storage_file: str = os.path.join("vector_db_storage", "access_stats.json")):
+        self.storage_file = storage_file
+        self._pending: Dict[str, int] = {}
+        self._last_access: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record_access(self, bot_id: str):
+        """Count one query for a bot."""
+        with self._lock:
+            self._pending[bot_id] = self._pending.get(bot_id, 0) + 1
+            self._last_access[bot_id] = time.time()
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.storage_file, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"Error reading access stats: {e}")
+            return {}
+
+    def _update(self, mutate):
+        """Apply mutate(data) to the stats file under an exclusive file lock."""
+        os.makedirs(os.path.dirname(self.storage_file) or ".", exist_ok=True)
+        with open(self.storage_file + ".lock", 'w') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            data = self._read()
+            mutate(data)
+            tmp_file = self.storage_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_file, self.storage_file)
+
+    def flush(self):
+        """Merge pending counts into the stats file."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            last_access, self._last_access = self._last_access, {}
+        if not pending:
+            return
+
+        def merge(data):
+            for bot_id, count in pending.items():
+                entry = data.setdefault(bot_id, {'count': 0, 'last_access': 0})
+                entry['count'] += count
+                entry['last_access'] = max(entry['last_access'], last_access[bot_id])
+
+        try:
+            self._update(merge)
+        except Exception as e:
+            logger.error(f"Error flushing access stats: {e}")
+
+    def get_all(self) -> Dict[str, Dict]:
+        """Persisted stats for every bot: {bot_id: {'count', 'last_access'}}."""
+        return self._read()
+
+    def top_bots(self, limit: int) -> List[str]:
+        """Most used bots, with counts decayed by time since last access."""
+        now = time.time()
+        data = self._read()
+
+        def score(bot_id):
+            entry = data[bot_id]
+            age = max(0.0, now - entry['last_access'])
+            return entry['count'] * 0.5 ** (age / HALF_LIFE_SECONDS)
+
+        return sorted(data, key=score, reverse=True)[:limit]
+
+    def remove(self, bot_id: str):
+        """Forget a bot, e.g. after its storage was deleted."""
+        with self._lock:
+            self._pending.pop(bot_id, None)
+            self._last_access.pop(bot_id, None)
+        try:
+            self._update(lambda data: data.pop(bot_id, None))
+        except Exception as e:
+            logger.error(f"Error removing access stats for {bot_id}: {e}")
+
+# Global instance
+bot_access_stats = BotAccessStats()
@@ -0,0 +1,243 @@
+"""Process-wide pool of headless browsers shared by crawl jobs.
+
+Starting Chromium takes seconds and hundreds of MB, so browsers are kept between
+bot builds instead of being launched per crawl. The pool holds at most
+BROWSER_POOL_SIZE browsers, each leased to at most BROWSER_LEASES_PER_BROWSER
+crawl jobs at a time; further jobs wait for a lease, which bounds browser memory
+however many builds run in parallel.
+
+A browser that has served BROWSER_RECYCLE_PAGES pages, or that failed a health
+check or BROWSER_MAX_FAILURES pages in a row, is closed once its current leases
+end and restarted on the next lease, containing leaks in long-lived browsers. A
+monitor task probes idle browsers every BROWSER_HEALTH_CHECK_SECONDS and stops
+those unused for BROWSER_IDLE_SECONDS.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List, Optional
+
+from metrics import observe_stage, record_browser_event, set_browser_pool_state
+
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '2'))
+BROWSER_LEASES_PER_BROWSER = int(os.getenv('BROWSER_LEASES_PER_BROWSER', '2'))
+BROWSER_RECYCLE_PAGES = int(os.getenv('BROWSER_RECYCLE_PAGES', '1000'))
+BROWSER_MAX_FAILURES = int(os.getenv('BROWSER_MAX_FAILURES', '10'))
+BROWSER_HEALTH_CHECK_SECONDS = int(os.getenv('BROWSER_HEALTH_CHECK_SECONDS', '60'))
+BROWSER_IDLE_SECONDS = int(os.getenv('BROWSER_IDLE_SECONDS', '600'))
+HEALTH_CHECK_TIMEOUT_SECONDS = 15
+
+# Rendered without any network access, so a failing probe means the browser itself is broken.
+HEALTH_CHECK_URL = "raw:<html><body>ok</body></html>"
+
+
+async def start_crawl4ai_browser():
+    from crawl4ai import AsyncWebCrawler
+
+    # Use AsyncWebCrawler without explicit browser config for now
+    # The headless mode should be default in container environments
+    crawler = AsyncWebCrawler()
+    await crawler.start()
+    return crawler
+
+
+async def probe_crawl4ai_browser(crawler) -> bool:
+    from crawl4ai import CacheMode, CrawlerRunConfig
+
+    result = await crawler.arun(url=HEALTH_CHECK_URL, config=CrawlerRunConfig(cache_mode=CacheMode.BYPASS))
+    return bool(result.success)
+
+
+class PooledBrowser:
+    def __init__(self, index: int):
+        self.index = index
+        self.crawler = None
+        self.leases = 0
+        self.pages = 0
+        self.failures = 0
+        self.last_used = time.monotonic()
+        # Set when the browser should be restarted once its current leases end.
+        self.retire_reason: Optional[str] = None
+        self.starting: Optional[asyncio.Future] = None
+
+
+class BrowserLease:
+    """A browser leased to one crawl job; use it like an AsyncWebCrawler (arun)."""
+
+    def __init__(self, pool: "BrowserPool", browser: PooledBrowser):
+        self._pool = pool
+        self._browser = browser
+
+    async def arun(self, *args, **kwargs):
+        browser = self._browser
+        try:
+            result = await browser.crawler.arun(*args, **kwargs)
+        except Exception:
+            browser.failures += 1
+            if browser.failures >= self._pool.max_failures:
+                browser.retire_reason = browser.retire_reason or "failures"
+            raise
+        browser.failures = 0
+        browser.pages += 1
+        if browser.pages >= self._pool.recycle_pages:
+            browser.retire_reason = browser.retire_reason or "recycle"
+        return result
+
+
+class BrowserPool:
+    """Leases browsers to crawl jobs; bound to the event loop it was created in."""
+
+    def __init__(self, size: int = BROWSER_POOL_SIZE, leases_per_browser: int = BROWSER_LEASES_PER_BROWSER,
+                 recycle_pages: int = BROWSER_RECYCLE_PAGES, max_failures: int = BROWSER_MAX_FAILURES,
+                 start_browser: Callable[[], Awaitable] = start_crawl4ai_browser,
+                 probe_browser: Callable[[object], Awaitable[bool]] = probe_crawl4ai_browser):
+        self.leases_per_browser = leases_per_browser
+        self.recycle_pages = recycle_pages
+        self.max_failures = max_failures
+        self._start_browser = start_browser
+        self._probe_browser = probe_browser
+        self.browsers: List[PooledBrowser] = [PooledBrowser(i) for i in range(size)]
+        self.loop = asyncio.get_running_loop()
+        self._available = asyncio.Condition()
+        self._monitor: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def _pick(self) -> Optional[PooledBrowser]:
+        candidates = [b for b in self.browsers if b.retire_reason is None and b.leases < self.leases_per_browser]
+        if not candidates:
+            return None
+        # Share running browsers before starting another one.
+        return min(candidates, key=lambda b: (b.crawler is None and b.starting is None, b.leases))
+
+    def _publish_state(self) -> None:
+        set_browser_pool_state(
+            running=sum(1 for b in self.browsers if b.crawler is not None),
+            leases=sum(b.leases for b in self.browsers),
+        )
+
+    async def _ensure_started(self, browser: PooledBrowser) -> None:
+        if browser.crawler is not None:
+            return
+        if browser.starting is None:
+            browser.starting = self.loop.create_future()
+            try:
+                browser.crawler = await self._start_browser()
+                record_browser_event("start")
+                browser.pages = browser.failures = 0
+                browser.starting.set_result(None)
+            except Exception as e:
+                browser.starting.set_exception(e)
+                # Retrieved here so an unawaited failure is not reported as never retrieved.
+                browser.starting.exception()
+                raise
+            finally:
+                browser.starting = None
+                self._publish_state()
+        else:
+            await asyncio.shield(browser.starting)
+
+    async def _close_browser(self, browser: PooledBrowser, reason: str) -> None:
+        crawler, browser.crawler = browser.crawler, None
+        browser.retire_reason = None
+        if crawler is None:
+            return
+        record_browser_event(reason)
+        try:
+            await crawler.close()
+        except Exception as e:
+            print(f"Error closing browser {browser.index}: {e}")
+        self._publish_state()
+
+    @asynccontextmanager
+    async def lease(self):
+        """Lease a browser for a crawl job, waiting while all leases are taken."""
+        if self._monitor is None and BROWSER_HEALTH_CHECK_SECONDS > 0:
+            self._monitor = self.loop.create_task(self._monitor_health())
+        wait_start = time.perf_counter()
+        async with self._available:
+            browser = self._pick()
+            while browser is None:
+                await self._available.wait()
+                browser = self._pick()
+            browser.leases += 1
+        observe_stage("browser_lease_wait", time.perf_counter() - wait_start)
+        self._publish_state()
+        try:
+            await self._ensure_started(browser)
+            yield BrowserLease(self, browser)
+        finally:
+            browser.leases -= 1
+            browser.last_used = time.monotonic()
+            if browser.retire_reason is not None and browser.leases == 0:
+                await self._close_browser(browser, browser.retire_reason)
+            self._publish_state()
+            async with self._available:
+                self._available.notify_all()
+
+    async def check_health(self) -> None:
+        """Probe idle browsers, close broken ones and those idle for BROWSER_IDLE_SECONDS."""
+        for browser in self.browsers:
+            if browser.crawler is None or browser.leases or browser.starting is not None:
+                continue
+            if time.monotonic() - browser.last_used > BROWSER_IDLE_SECONDS:
+                await self._close_browser(browser, "idle_stop")
+                continue
+            # Hold a lease during the probe so no job gets the browser while it may be closed.
+            browser.leases += 1
+            try:
+                healthy = await asyncio.wait_for(self._probe_browser(browser.crawler), HEALTH_CHECK_TIMEOUT_SECONDS)
+            except Exception:
+                healthy = False
+            finally:
+                browser.leases -= 1
+            if not healthy:
+                print(f"Browser {browser.index} failed its health check, restarting it")
+                browser.retire_reason = "health_failure"
+            if browser.retire_reason is not None and browser.leases == 0:
+                await self._close_browser(browser, browser.retire_reason)
+            async with self._available:
+                self._available.notify_all()
+
+    async def _monitor_health(self) -> None:
+        while not self._closed:
+            await asyncio.sleep(BROWSER_HEALTH_CHECK_SECONDS)
+            try:
+                await self.check_health()
+            except Exception as e:
+                print(f"Browser health check failed: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "browsers": [
+                {"running": b.crawler is not None, "leases": b.leases, "pages": b.pages, "retiring": b.retire_reason}
+                for b in self.browsers
+            ],
+            "leases_per_browser": self.leases_per_browser,
+        }
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._monitor is not None:
+            self._monitor.cancel()
+        for browser in self.browsers:
+            await self._close_browser(browser, "shutdown")
+
+
+_browser_pool: Optional[BrowserPool] = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """The pool of the running event loop, created on first use."""
+    global _browser_pool
+    if _browser_pool is None or _browser_pool.loop is not asyncio.get_running_loop():
+        _browser_pool = BrowserPool()
+    return _browser_pool
+
+
+async def close_browser_pool() -> None:
+    """Close the pool's browsers (app shutdown, end of a script's event loop)."""
+    global _browser_pool
+    if _browser_pool is not None and _browser_pool.loop is asyncio.get_running_loop():
+        pool, _browser_pool = _browser_pool, None
+        await pool.close()
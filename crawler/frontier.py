@@ -0,0 +1,69 @@
+"""Priority frontier of URLs waiting to be crawled.
+
+A URL's score combines its sitemap <priority> (0.5 when absent, as in the
+sitemap protocol), how recently it changed per <lastmod> (a bonus halving every
+LASTMOD_HALF_LIFE_DAYS) and its path depth (shallow pages such as section
+landing pages first). Links found while crawling inherit the sitemap data of
+their URL when it is listed, so the frontier ordering does not depend on
+discovery order.
+"""
+import heapq
+import itertools
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from crawler.page_cache import canonical_url
+from crawler.sitemap import SitemapEntry
+
+DEFAULT_PRIORITY = 0.5
+LASTMOD_WEIGHT = 0.5
+LASTMOD_HALF_LIFE_DAYS = 180
+DEPTH_PENALTY = 0.1
+# The start URL is always crawled first.
+START_URL_SCORE = 10.0
+
+
+def path_depth(url: str) -> int:
+    return len([segment for segment in urlsplit(url).path.split("/") if segment])
+
+
+def url_score(url: str, entry: Optional[SitemapEntry] = None, now: Optional[datetime] = None) -> float:
+    priority = entry.priority if entry is not None and entry.priority is not None else DEFAULT_PRIORITY
+    score = priority - DEPTH_PENALTY * path_depth(url)
+    if entry is not None and entry.lastmod is not None:
+        age_days = max(((now or datetime.now(timezone.utc)) - entry.lastmod).total_seconds() / 86400, 0.0)
+        score += LASTMOD_WEIGHT * 0.5 ** (age_days / LASTMOD_HALF_LIFE_DAYS)
+    return round(score, 4)
+
+
+class CrawlFrontier:
+    """Highest score first; each canonical URL is queued at most once."""
+
+    def __init__(self, sitemap_entries=()):
+        self._heap = []
+        self._order = itertools.count()
+        self._seen = set()
+        self._now = datetime.now(timezone.utc)
+        self.sitemap: Dict[str, SitemapEntry] = {canonical_url(e.url): e for e in sitemap_entries}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def seen(self, url: str) -> bool:
+        return canonical_url(url) in self._seen
+
+    def push(self, url: str, depth: int, score: Optional[float] = None) -> bool:
+        key = canonical_url(url)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        if score is None:
+            score = url_score(url, self.sitemap.get(key), self._now)
+        heapq.heappush(self._heap, (-score, next(self._order), url, depth))
+        return True
+
+    def pop(self) -> tuple:
+        """(url, depth, score) of the best queued URL."""
+        negative_score, _, url, depth = heapq.heappop(self._heap)
+        return url, depth, -negative_score
@@ -1,14 +1,29 @@
 import asyncio
 import json
+import os
 import re
 from urllib.parse import urljoin, urlparse
 import requests
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+from crawl4ai import CrawlerRunConfig, CacheMode
 from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
 import PyPDF2
 from io import BytesIO
+import time
 import traceback
 
+from crawler.browser_pool import close_browser_pool, get_browser_pool
+from crawler.frontier import START_URL_SCORE, CrawlFrontier
+from crawler.page_cache import get_page_cache, response_validators
+from crawler.sitemap import discover_sitemap_entries, fetch_site_rules
+from metrics import record_cache_lookup
+
+# Crawl budgets; 0 disables the page or time budget.
+CRAWL_MAX_PAGES = int(os.getenv('CRAWL_MAX_PAGES', '1000'))
+CRAWL_TIME_BUDGET_SECONDS = int(os.getenv('CRAWL_TIME_BUDGET_SECONDS', '1800'))
+CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH', '4'))
+# Pages fetched at the same time within one crawl job.
+CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', '8'))
+
 
 def extract_pdf_text(url):
     try:
@@ -56,6 +71,7 @@ md_generator = DefaultMarkdownGenerator(
 run_config = CrawlerRunConfig(
     markdown_generator=md_generator,
     # pdf=True,
+    # Pages are cached by crawler/page_cache.py, which is shared across builds and has a TTL.
     cache_mode=CacheMode.BYPASS,
     # scan_full_page=True,
 )
@@ -64,27 +80,16 @@ def remove_images(markdown_text: str) -> str:
     """Remove markdown image syntax (e.g. ![alt](url)) from the text."""
     return re.sub(r'!\[.*?\]\(.*?\)', '', markdown_text)
 
-async def crawl_page(crawler, url, base_domain, depth, max_depth, visited, pages_data):
-    if url in visited:
-        return None
-    visited.add(url)
-    
-    try:
-        result = await crawler.arun(url=url, config=run_config)
-    except Exception as e:
-        print(f"Error fetching {url}: {e}")
-        return None
+def extract_page(url, result):
+    """What the crawl keeps of a fetched page: {"kind", "markdown", "links"} plus its
+    HTTP validators, or None if nothing could be extracted (e.g. a failed PDF)."""
+    page = {
+        "kind": "html",
+        "markdown": "",
+        "links": [link["href"] for link in result.links.get("internal", [])],
+        **response_validators(getattr(result, "response_headers", None)),
+    }
 
-    print(f"\nFetched content from: {url}")
-    
-    # Extract child URLs only if we haven't reached max_depth.
-    child_urls = set()
-    if depth < max_depth:
-        for link in result.links.get("internal", []):
-            full_url = urljoin(url, link["href"])
-            if urlparse(full_url).netloc == base_domain and full_url not in visited:
-                child_urls.add(full_url)
-    
     # Process the result based on URL type.
     # If the URL indicates a PDF file, we use the PDF bytes.
     if url.lower().endswith(".pdf"):
@@ -92,87 +97,196 @@ async def crawl_page(crawler, url, base_domain, depth, max_depth, visited, pages
             print("The URL contains pdf.")
             pdf_text = extract_pdf_text(url)
             print(pdf_text[:100])
-            # import pdb; pdb.set_trace()
-            pages_data[url] = {
-            "markdown": pdf_text,
-            "child_urls": list(child_urls)
-            }
-            
+            page.update(kind="pdf", markdown=pdf_text)
+            return page
         except Exception as e:
             print(f"Error processing pdf for {url}: {e}")
+            return None
     elif (url.lower().endswith((".doc", ".jpg", ".png", ".docx")) or any(substring in url.lower() for substring in ("img", ".jpg"))):
         # Skip non-text documents.
-        return
-    else:
-        # For text-based pages, try to extract markdown.
-        markdown_content = ""
-        try:
-            # Use the current markdown attribute which returns a MarkdownGenerationResult
-            if hasattr(result, 'markdown') and result.markdown:
-                # Check if it's the new MarkdownGenerationResult object
-                if hasattr(result.markdown, 'raw_markdown'):
-                    markdown_content = result.markdown.raw_markdown
-                elif isinstance(result.markdown, str):
-                    markdown_content = result.markdown
-                else:
-                    # Fallback to string representation
-                    markdown_content = str(result.markdown)
+        page.update(kind="skipped", links=[])
+        return page
+
+    # For text-based pages, try to extract markdown.
+    markdown_content = ""
+    try:
+        # Use the current markdown attribute which returns a MarkdownGenerationResult
+        if hasattr(result, 'markdown') and result.markdown:
+            # Check if it's the new MarkdownGenerationResult object
+            if hasattr(result.markdown, 'raw_markdown'):
+                markdown_content = result.markdown.raw_markdown
+            elif isinstance(result.markdown, str):
+                markdown_content = result.markdown
             else:
-                print(f"No markdown available for {url}.")
-        except Exception as e:
-            print(f"Error processing markdown for {url}: {e}")
-            # Try to get basic text content as fallback
-            try:
-                if hasattr(result, 'cleaned_html'):
-                    markdown_content = result.cleaned_html
-                elif hasattr(result, 'html'):
-                    markdown_content = result.html
-            except Exception as fallback_e:
-                print(f"Fallback content extraction also failed for {url}: {fallback_e}")
-        
-        # Remove image markdown syntax if content is available.
-        if markdown_content:
-            try:
-                cleaned_markdown = remove_images(markdown_content)
-            except Exception as e:
-                print(f"Error cleaning markdown for {url}: {e}")
-                cleaned_markdown = markdown_content
+                # Fallback to string representation
+                markdown_content = str(result.markdown)
         else:
-            cleaned_markdown = ""
-        
-        print("The URL contains text.")
-        print(cleaned_markdown)
-        pages_data[url] = {
-            "markdown": cleaned_markdown,
-            "child_urls": list(child_urls)
-        }
-    
-    # Recursively crawl each child URL if within max_depth.
-    if depth < max_depth:
-        tasks = [
-            crawl_page(crawler, child_url, base_domain, depth + 1, max_depth, visited, pages_data)
-            for child_url in child_urls
-        ]
-        # Use return_exceptions=True so that one failing page doesn't break the entire crawl.
-        await asyncio.gather(*tasks, return_exceptions=True)
-    
-    return url
+            print(f"No markdown available for {url}.")
+    except Exception as e:
+        print(f"Error processing markdown for {url}: {e}")
+        # Try to get basic text content as fallback
+        try:
+            if hasattr(result, 'cleaned_html'):
+                markdown_content = result.cleaned_html
+            elif hasattr(result, 'html'):
+                markdown_content = result.html
+        except Exception as fallback_e:
+            print(f"Fallback content extraction also failed for {url}: {fallback_e}")
+
+    # Remove image markdown syntax if content is available.
+    if markdown_content:
+        try:
+            cleaned_markdown = remove_images(markdown_content)
+        except Exception as e:
+            print(f"Error cleaning markdown for {url}: {e}")
+            cleaned_markdown = markdown_content
+    else:
+        cleaned_markdown = ""
 
-async def call_crawler(start_url: str = "https://nust.edu.pk", output_file: str = "crawl_results.json"):
+    print("The URL contains text.")
+    print(cleaned_markdown)
+    page["markdown"] = cleaned_markdown
+    return page
+
+async def load_page(crawler, url, stats):
+    """A page from the page cache (fresh, or stale but unchanged per its validators),
+    else fetched, rendered and cached. None if the page could not be loaded."""
+    cache = get_page_cache()
+    if cache is not None:
+        entry, state = cache.lookup(url)
+        if state == "stale" and await asyncio.to_thread(cache.revalidate, entry):
+            state = "revalidated"
+        record_cache_lookup("crawl_page", hit=state in ("fresh", "revalidated"))
+        if state in ("fresh", "revalidated"):
+            stats["cache_hits" if state == "fresh" else "cache_revalidated"] += 1
+            return entry
+        stats["cache_misses"] += 1
+
+    try:
+        result = await crawler.arun(url=url, config=run_config)
+    except Exception as e:
+        print(f"Error fetching {url}: {e}")
+        return None
+    stats["fetched"] += 1
+
+    print(f"\nFetched content from: {url}")
+    page = extract_page(url, result)
+    # Failed fetches (timeouts, 5xx) are retried next time rather than cached.
+    if page is not None and cache is not None and getattr(result, "success", True):
+        await asyncio.to_thread(cache.put, url, page)
+    return page
+
+def new_crawl_stats():
+    return {"fetched": 0, "cache_hits": 0, "cache_revalidated": 0, "cache_misses": 0,
+            "sitemap_urls": 0, "robots_disallowed": 0}
+
+def child_links(url, page, base_domain, frontier):
+    child_urls = set()
+    for href in page["links"]:
+        full_url = urljoin(url, href)
+        if urlparse(full_url).netloc == base_domain and not frontier.seen(full_url):
+            child_urls.add(full_url)
+    return child_urls
+
+async def crawl_site(crawler, start_url, pages_data, stats, max_pages=CRAWL_MAX_PAGES,
+                     time_budget_seconds=CRAWL_TIME_BUDGET_SECONDS, max_depth=CRAWL_MAX_DEPTH):
+    """Crawl best-first from start_url and the site's sitemaps into pages_data.
+
+    Stops when the frontier is empty, max_pages pages were crawled or
+    time_budget_seconds passed (0 disables either budget); pages crawled so far are
+    kept and in-flight fetches are cancelled. Returns "complete", "page_budget" or
+    "time_budget".
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + time_budget_seconds if time_budget_seconds > 0 else None
     base_domain = urlparse(start_url).netloc
-    visited = set()
+
+    rules = await asyncio.to_thread(fetch_site_rules, start_url)
+    entries = await asyncio.to_thread(discover_sitemap_entries, start_url, rules)
+    stats["sitemap_urls"] = len(entries)
+    frontier = CrawlFrontier(entries)
+    frontier.push(start_url, depth=0, score=START_URL_SCORE)
+    for entry in entries:
+        frontier.push(entry.url, depth=0)
+
+    pending = {}
+    stop_reason = "complete"
+    try:
+        while True:
+            if deadline is not None and loop.time() >= deadline:
+                stop_reason = "time_budget"
+                break
+            while frontier and len(pending) < CRAWL_CONCURRENCY and (not max_pages or len(pages_data) + len(pending) < max_pages):
+                url, depth, score = frontier.pop()
+                # The start URL was asked for explicitly; everything else follows robots.txt.
+                if url != start_url and not rules.allowed(url):
+                    stats["robots_disallowed"] += 1
+                    continue
+                pending[asyncio.ensure_future(load_page(crawler, url, stats))] = (url, depth, score)
+            if not pending:
+                if frontier:
+                    stop_reason = "page_budget"
+                break
+
+            timeout = None if deadline is None else max(deadline - loop.time(), 0)
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url, depth, score = pending.pop(task)
+                try:
+                    page = task.result()
+                except Exception as e:
+                    # One failing page doesn't break the entire crawl.
+                    print(f"Error crawling {url}: {e}")
+                    continue
+                if page is None or page["kind"] == "skipped":
+                    continue
+
+                # Extract child URLs only if we haven't reached max_depth.
+                child_urls = child_links(url, page, base_domain, frontier) if depth < max_depth else set()
+                pages_data[url] = {
+                    "markdown": page["markdown"],
+                    "child_urls": list(child_urls),
+                    "priority": score,
+                }
+                for child_url in child_urls:
+                    frontier.push(child_url, depth + 1)
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    stats["queued_remaining"] = len(frontier)
+    return stop_reason
+
+def crawl_report(stats, pages_data, elapsed, stop_reason):
+    lookups = stats["cache_hits"] + stats["cache_revalidated"] + stats["cache_misses"]
+    return {
+        "pages": len(pages_data),
+        **stats,
+        "cache_hit_ratio": round((stats["cache_hits"] + stats["cache_revalidated"]) / lookups, 4) if lookups else None,
+        "stop_reason": stop_reason,
+        "elapsed_seconds": round(elapsed, 3),
+    }
+
+async def call_crawler(start_url: str = "https://nust.edu.pk", output_file: str = "crawl_results.json",
+                       max_pages: int = CRAWL_MAX_PAGES, time_budget_seconds: int = CRAWL_TIME_BUDGET_SECONDS,
+                       max_depth: int = CRAWL_MAX_DEPTH):
     pages_data = {}  # This will map each URL to its details.
+    stats = new_crawl_stats()
+    start = time.perf_counter()
+
+    # Browsers are shared across crawl jobs; a lease waits if all of them are busy.
+    async with get_browser_pool().lease() as crawler:
+        stop_reason = await crawl_site(crawler, start_url, pages_data, stats, max_pages=max_pages,
+                                       time_budget_seconds=time_budget_seconds, max_depth=max_depth)
 
-    # Use AsyncWebCrawler without explicit browser config for now
-    # The headless mode should be default in container environments
-    async with AsyncWebCrawler() as crawler:
-        print("Browser should launch now...")
-        await crawl_page(crawler, start_url, base_domain, depth=0, max_depth=4, visited=visited, pages_data=pages_data)
+    report = crawl_report(stats, pages_data, time.perf_counter() - start, stop_reason)
+    print(f"Crawl report for {start_url}: {report}")
 
-    # Final output structure: a root URL and a dictionary of pages.
+    # Final output structure: a root URL, a dictionary of pages (best first) and the crawl report.
     final_output = {
         "root": start_url,
-        "pages": pages_data
+        "pages": dict(sorted(pages_data.items(), key=lambda item: -item[1]["priority"])),
+        "report": report
     }
 
     # Save the JSON to a file for later analysis.
@@ -182,5 +296,16 @@ async def call_crawler(start_url: str = "https://nust.edu.pk", output_file: str
     print(f"Crawl data saved to {output_file}")
     return output_file
 
+def run_crawler(start_url: str, output_file: str = "crawl_results.json"):
+    """Run call_crawler in its own event loop (scripts, Gradio) and close the browsers it started."""
+    async def crawl_and_close():
+        try:
+            return await call_crawler(start_url, output_file)
+        finally:
+            await close_browser_pool()
+
+    return asyncio.run(crawl_and_close())
+
 if __name__ == "__main__":
-    asyncio.run(call_crawler("https://lums.edu.pk/"))
+    import sys
+    run_crawler(sys.argv[1] if len(sys.argv) > 1 else "https://lums.edu.pk/")
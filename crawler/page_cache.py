@@ -0,0 +1,170 @@
+"""Disk cache of crawled pages, shared by all builds on the host.
+
+Each entry holds what the crawler keeps of a page (markdown, internal links, kind),
+its fetch time and the HTTP validators (ETag, Last-Modified) it was served with.
+Entries younger than PAGE_CACHE_TTL_SECONDS are used as is. Older ones with
+validators are revalidated with a conditional GET and reused on 304 Not Modified,
+so an unchanged page is neither downloaded in full nor rendered again.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+PAGE_CACHE_DIR = os.getenv('PAGE_CACHE_DIR', os.path.join("vector_db_storage", "_page_cache"))
+# 0 disables the cache: every page is fetched and rendered.
+PAGE_CACHE_TTL_SECONDS = int(os.getenv('PAGE_CACHE_TTL_SECONDS', str(24 * 3600)))
+PAGE_CACHE_MAX_MB = int(os.getenv('PAGE_CACHE_MAX_MB', '1024'))
+REVALIDATE_TIMEOUT_SECONDS = 10
+
+# Query parameters that never change the content of a page.
+TRACKING_PARAMETERS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonical_url(url: str) -> str:
+    """One spelling per page: lowercase scheme and host, no default port, fragment,
+    trailing slash or tracking parameters, remaining query parameters sorted."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/") or "/"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMETERS)
+    )
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def response_validators(headers) -> dict:
+    """ETag and Last-Modified from response headers, whatever their capitalisation."""
+    lowered = {str(key).lower(): value for key, value in (headers or {}).items()}
+    return {"etag": lowered.get("etag"), "last_modified": lowered.get("last-modified")}
+
+
+class PageCache:
+    """Pages as JSON files keyed by canonical URL, evicted least recently used first
+    once the directory exceeds max_bytes."""
+
+    def __init__(self, directory: str = PAGE_CACHE_DIR, ttl_seconds: int = PAGE_CACHE_TTL_SECONDS,
+                 max_bytes: int = PAGE_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._approx_bytes: Optional[int] = None
+
+    def _path(self, url: str) -> str:
+        name = hashlib.sha256(canonical_url(url).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name[:2], name + ".json")
+
+    def _read(self, url: str) -> Optional[dict]:
+        path = self._path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+            return entry
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Discarding unreadable page cache entry {path}: {e}")
+            return None
+
+    def lookup(self, url: str) -> tuple:
+        """(entry, state) with state "fresh", "stale" (past the TTL) or "miss"."""
+        entry = self._read(url)
+        if entry is None:
+            return None, "miss"
+        if time.time() - entry.get("fetched_at", 0) < self.ttl_seconds:
+            return entry, "fresh"
+        return entry, "stale"
+
+    def revalidate(self, entry: dict) -> bool:
+        """Conditional GET for a stale entry; on 304 the entry is renewed and True returned."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        if not headers:
+            return False
+        try:
+            with requests.get(entry["url"], headers=headers, timeout=REVALIDATE_TIMEOUT_SECONDS, stream=True) as response:
+                if response.status_code != 304:
+                    return False
+                entry.update({key: value for key, value in response_validators(response.headers).items() if value})
+        except requests.RequestException:
+            return False
+        self.put(entry["url"], {**entry, "fetched_at": time.time()})
+        return True
+
+    def put(self, url: str, entry: dict) -> None:
+        """Store a page; failures are logged, the cache is only an optimisation."""
+        path = self._path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        entry = {"fetched_at": time.time(), **entry, "url": url, "canonical_url": canonical_url(url)}
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write page cache entry {path}: {e}")
+            return
+        with self._lock:
+            if self._approx_bytes is None:
+                self._approx_bytes = self._total_bytes()
+            else:
+                self._approx_bytes += size
+            over_limit = self._approx_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def _total_bytes(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    total += os.path.getsize(os.path.join(root, name))
+        return total
+
+    def evict(self) -> None:
+        # Evicting down to 90% of the limit keeps puts from walking the directory every time.
+        with self._lock:
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".json"):
+                        stat = os.stat(os.path.join(root, name))
+                        entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+            self._approx_bytes = total
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """The shared page cache, or None when PAGE_CACHE_TTL_SECONDS is 0."""
+    if PAGE_CACHE_TTL_SECONDS <= 0:
+        return None
+    return page_cache
+
+
+page_cache = PageCache()
@@ -0,0 +1,146 @@
+"""robots.txt and sitemap discovery used to seed crawls.
+
+Sitemaps are taken from robots.txt "Sitemap:" lines, falling back to
+/sitemap.xml. Sitemap indexes are followed (up to SITEMAP_MAX_FILES files) and
+gzipped sitemaps are decompressed. Only URLs on the start URL's host that
+robots.txt allows are returned, with their <priority> and <lastmod>.
+"""
+import gzip
+import io
+import os
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+SITEMAP_MAX_URLS = int(os.getenv('SITEMAP_MAX_URLS', '50000'))
+SITEMAP_MAX_FILES = int(os.getenv('SITEMAP_MAX_FILES', '50'))
+FETCH_TIMEOUT_SECONDS = 15
+# The sitemap protocol caps an uncompressed sitemap at 50 MB.
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+USER_AGENT = "*"
+
+
+@dataclass
+class SitemapEntry:
+    url: str
+    priority: Optional[float] = None
+    lastmod: Optional[datetime] = None
+
+
+class SiteRules:
+    """robots.txt of a site; everything is allowed when it is missing or unreadable."""
+
+    def __init__(self, robots: Optional[RobotFileParser] = None):
+        self._robots = robots
+
+    def allowed(self, url: str) -> bool:
+        return self._robots is None or self._robots.can_fetch(USER_AGENT, url)
+
+    @property
+    def sitemaps(self) -> List[str]:
+        return list(self._robots.site_maps() or []) if self._robots is not None else []
+
+
+def _get(url: str) -> Optional[requests.Response]:
+    try:
+        response = requests.get(url, timeout=FETCH_TIMEOUT_SECONDS)
+    except requests.RequestException as e:
+        print(f"Could not fetch {url}: {e}")
+        return None
+    return response if response.status_code == 200 else None
+
+
+def fetch_site_rules(start_url: str) -> SiteRules:
+    robots_url = urljoin(start_url, "/robots.txt")
+    response = _get(robots_url)
+    if response is None:
+        return SiteRules()
+    robots = RobotFileParser(robots_url)
+    robots.parse(response.text.splitlines())
+    return SiteRules(robots)
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """W3C datetime ("2024-05-01", "2024-05-01T10:00:00Z", ...) as an aware UTC datetime."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_priority(value: Optional[str]) -> Optional[float]:
+    try:
+        return min(max(float(value), 0.0), 1.0) if value else None
+    except ValueError:
+        return None
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(element, name: str) -> Optional[str]:
+    for child in element:
+        if _local_name(child.tag) == name and child.text:
+            return child.text.strip()
+    return None
+
+
+def parse_sitemap(content: bytes) -> tuple:
+    """(entries, nested sitemap URLs) of a sitemap or sitemap index document."""
+    if content[:2] == b"\x1f\x8b":
+        with gzip.GzipFile(fileobj=io.BytesIO(content)) as f:
+            content = f.read(MAX_SITEMAP_BYTES + 1)
+    if len(content) > MAX_SITEMAP_BYTES:
+        raise ValueError("sitemap larger than 50 MB")
+    root = ET.fromstring(content)
+    entries, sitemaps = [], []
+    for element in root:
+        loc = _child_text(element, "loc")
+        if not loc:
+            continue
+        if _local_name(element.tag) == "sitemap":
+            sitemaps.append(loc)
+        elif _local_name(element.tag) == "url":
+            entries.append(SitemapEntry(
+                url=loc,
+                priority=parse_priority(_child_text(element, "priority")),
+                lastmod=parse_lastmod(_child_text(element, "lastmod")),
+            ))
+    return entries, sitemaps
+
+
+def discover_sitemap_entries(start_url: str, rules: SiteRules) -> List[SitemapEntry]:
+    """Pages listed in the site's sitemaps, following sitemap indexes."""
+    host = urlsplit(start_url).netloc
+    pending = [urljoin(start_url, url) for url in rules.sitemaps] or [urljoin(start_url, "/sitemap.xml")]
+    fetched, entries, seen = set(), [], set()
+    while pending and len(fetched) < SITEMAP_MAX_FILES and len(entries) < SITEMAP_MAX_URLS:
+        sitemap_url = pending.pop(0)
+        if sitemap_url in fetched:
+            continue
+        fetched.add(sitemap_url)
+        response = _get(sitemap_url)
+        if response is None:
+            continue
+        try:
+            page_entries, nested = parse_sitemap(response.content)
+        except (ET.ParseError, OSError, ValueError, EOFError) as e:
+            print(f"Skipping unreadable sitemap {sitemap_url}: {e}")
+            continue
+        pending.extend(nested)
+        for entry in page_entries:
+            if urlsplit(entry.url).netloc == host and entry.url not in seen and rules.allowed(entry.url):
+                seen.add(entry.url)
+                entries.append(entry)
+    if entries:
+        print(f"Found {len(entries)} pages in {len(fetched)} sitemap(s) of {host}")
+    return entries[:SITEMAP_MAX_URLS]
@@ -1,61 +1,145 @@
+import hashlib
 import os
+import shutil
 import tempfile
-from typing import List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple, Union
 import dotenv
+import numpy as np
 from langchain_core.documents import Document
-from langchain_text_splitters import MarkdownHeaderTextSplitter
+from langchain_core.embeddings import Embeddings
 
 dotenv.load_dotenv('.env')
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
-from langchain_experimental.text_splitter import SemanticChunker
+# Loaders, text splitters and Chroma are imported where they are first used, so
+# query-only replicas serving NumPy indexes never load them.
+from parallel_loader import load_documents_parallel
+from metrics import count_items, observe_stage, record_cache_lookup, track_stage
+from retrieval.bm25_index import BM25Index, BM25_DIR, build_bm25_index, load_bm25_index, reciprocal_rank_fusion
+from retrieval.chroma_store import CHROMA_STORAGE_MODE, create_shared_chroma, open_shared_chroma, shared_collection_name
+from retrieval.chunk_store import ChunkStore, write_chunk_store
+from retrieval.document_cache import document_cache, sha256_file
+from retrieval.embedding_cache import CachedEmbeddings, get_embedding_cache
+from retrieval.hashing_embeddings import HashingEmbeddings
+from retrieval.local_embeddings import get_local_embeddings, local_cache_namespace
+from retrieval.manifest import read_manifest, write_manifest
+from retrieval.numpy_index import QUANTIZATION_MODES, NumpyVectorIndex, build_numpy_index, read_vectors
+from retrieval.storage import bot_update_lock, index_directory, new_index_version, publish_index_version
 import logging
 
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Dense and lexical retrieval for hybrid queries run side by side on this pool.
+_retrieval_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="retrieval")
+HYBRID_CANDIDATES = 20
+
+# Adaptive k for answering: up to RETRIEVAL_MAX_RESULTS chunks, cut where the score drops by
+# more than RETRIEVAL_SCORE_GAP of the top score, never fewer than RETRIEVAL_MIN_RESULTS.
+RETRIEVAL_MAX_RESULTS = int(os.getenv('RETRIEVAL_MAX_RESULTS', '8'))
+RETRIEVAL_MIN_RESULTS = int(os.getenv('RETRIEVAL_MIN_RESULTS', '2'))
+RETRIEVAL_SCORE_GAP = float(os.getenv('RETRIEVAL_SCORE_GAP', '0.25'))
+
+# Bots up to this many chunks are served by the brute-force NumPy index instead of Chroma.
+NUMPY_INDEX_MAX_CHUNKS = int(os.getenv('NUMPY_INDEX_MAX_CHUNKS', '50000'))
+# Default storage precision for NumPy indexes: float32, float16 or int8.
+EMBEDDING_QUANTIZATION = os.getenv('EMBEDDING_QUANTIZATION', 'float32')
+if EMBEDDING_QUANTIZATION not in QUANTIZATION_MODES:
+    raise ValueError(f"EMBEDDING_QUANTIZATION must be one of {QUANTIZATION_MODES}, got {EMBEDDING_QUANTIZATION!r}")
+
+VectorIndex = Union["Chroma", NumpyVectorIndex]
+
+# Length of the file-hash prefix identifying a document within a bot.
+DOCUMENT_ID_LENGTH = 16
+
+def get_fake_embeddings(dimension: int = 384):
+    """Deterministic offline embeddings, selected with EMBEDDINGS_PROVIDER=fake for load tests."""
+    return HashingEmbeddings(dimension)
+
+def use_fake_embeddings() -> bool:
+    return os.getenv('EMBEDDINGS_PROVIDER') == 'fake'
+
 def get_embeddings_function():
     """Initialize embeddings function using Sentence Transformers only."""
+    if use_fake_embeddings():
+        return get_fake_embeddings()
     try:
-        from langchain_community.embeddings import HuggingFaceEmbeddings
-        return HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        return get_local_embeddings()
     except ImportError:
         logger.error("HuggingFace embeddings not available. Please install sentence-transformers")
         raise RuntimeError("No embedding function available. Please install sentence-transformers")
 
+def get_environment_openai_key() -> Optional[str]:
+    """Return OPENAI_API_KEY unless it is unset or still the .env placeholder."""
+    openai_api_key = os.getenv('OPENAI_API_KEY')
+    if openai_api_key and openai_api_key.strip() and not openai_api_key.startswith('your_'):
+        return openai_api_key
+    return None
+
 def get_embeddings_for_vector_db():
     """Get embeddings function for vector database - always uses environment OpenAI API key if available."""
+    if use_fake_embeddings():
+        logger.warning("Using deterministic fake embeddings for vector database (EMBEDDINGS_PROVIDER=fake)")
+        return get_fake_embeddings()
+
     # Try environment OpenAI API key first
-    openai_api_key = os.getenv('OPENAI_API_KEY')
-    if openai_api_key and openai_api_key.strip() and not openai_api_key.startswith('your_'):
+    openai_api_key = get_environment_openai_key()
+    if openai_api_key:
         try:
-            from langchain_openai import OpenAIEmbeddings
+            from provider_client import OpenAIEmbeddingClient
             logger.info("Using OpenAI embeddings from environment for vector database")
-            return OpenAIEmbeddings(api_key=openai_api_key)
+            return OpenAIEmbeddingClient(api_key=openai_api_key)
         except ImportError:
             logger.warning("OpenAI embeddings not available, falling back to local")
         except Exception as e:
             logger.warning(f"Error initializing OpenAI embeddings: {e}, falling back to local")
     
     # Fallback to local embeddings
-    logger.info("Using local HuggingFace embeddings for vector database")
+    logger.info("Using local all-MiniLM-L6-v2 embeddings for vector database")
     try:
-        from langchain_community.embeddings import HuggingFaceEmbeddings
-        return HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        return get_local_embeddings()
     except ImportError:
         logger.error("HuggingFace embeddings not available. Please install sentence-transformers")
         raise RuntimeError("No embedding function available. Please install sentence-transformers")
 
+def embedding_model_name(embeddings) -> str:
+    """Identify an embeddings object as '<provider>:<model>' for the index manifest."""
+    model_id = getattr(embeddings, 'model_id', None)
+    if model_id:
+        return model_id
+    if type(embeddings).__name__ == 'OpenAIEmbeddings':
+        return f"openai:{embeddings.model}"
+    return f"huggingface:{embeddings.model_name}"
+
+def get_embeddings_by_name(name: str):
+    """Recreate the embeddings recorded in an index manifest by embedding_model_name."""
+    provider, _, model = name.partition(':')
+    if provider == 'openai':
+        openai_api_key = get_environment_openai_key()
+        if not openai_api_key:
+            raise RuntimeError(f"Index was built with {name} but OPENAI_API_KEY is not set")
+        from provider_client import OpenAIEmbeddingClient
+        return OpenAIEmbeddingClient(api_key=openai_api_key, model=model)
+    if provider == 'huggingface':
+        return get_local_embeddings(model)
+    if provider == 'fake':
+        return get_fake_embeddings(int(model.rsplit('-', 1)[-1]))
+    raise ValueError(f"Unknown embedding model: {name}")
+
 def load_document(file_path: str) -> List[Document]:
     """Loads document based on file extension."""
     ext = os.path.splitext(file_path)[1].lower()
     try:
         if ext == '.pdf':
             print(f"Loading PDF: {file_path}")
+            from langchain_community.document_loaders import PyPDFLoader
             loader = PyPDFLoader(file_path)
         elif ext == '.txt':
             print(f"Loading TXT: {file_path}")
+            from langchain_community.document_loaders import TextLoader
             loader = TextLoader(file_path, encoding='utf-8')
         else:
             logger.warning(f"Unsupported file extension: {ext}")
@@ -68,13 +152,20 @@ def load_document(file_path: str) -> List[Document]:
         logger.error(f"Error loading {file_path}: {str(e)}")
         return []
 
-def chunk_documents(documents: List[Document], strategy: str = "semantic") -> List[Document]:
+def _semantic_chunker(embeddings):
+    from langchain_experimental.text_splitter import SemanticChunker
+    return SemanticChunker(embeddings)
+
+def chunk_documents(documents: List[Document], strategy: str = "semantic", embeddings=None) -> List[Document]:
     """Enhanced chunking with multiple strategies using only Sentence Transformers"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from langchain_text_splitters import MarkdownHeaderTextSplitter
     
-    # Always use HuggingFace embeddings for semantic chunking
+    # HuggingFace embeddings for semantic chunking unless embeddings are given;
+    # only loaded when the semantic strategy is actually used
     try:
         chunkers = {
-            "semantic": SemanticChunker(get_embeddings_function()),
+            "semantic": _semantic_chunker(embeddings or get_embeddings_function()) if strategy == "semantic" else None,
             "recursive": RecursiveCharacterTextSplitter(
                 chunk_size=1000,
                 chunk_overlap=200,
@@ -171,19 +262,41 @@ def deduplicate_chunks(chunks: List[Document], similarity_threshold: float = 0.9
     logger.info(f"Deduplicated {len(chunks)} chunks down to {len(unique_chunks)} unique chunks")
     return unique_chunks
 
-def load_vector_database(persist_directory) -> Optional[Chroma]:
+def load_vector_database(persist_directory) -> Optional[VectorIndex]:
     """Load an existing vector database from disk.
     
-    Tries environment OpenAI API key first, then falls back to local embeddings.
+    NumPy-backed bots and bots in the shared Chroma client record their embedding
+    model in the manifest and open directly. For per-directory Chroma stores, tries environment OpenAI API key first, then falls back to local embeddings.
     This handles databases created with different embedding types.
     """
+
+    manifest = read_manifest(persist_directory)
+    if manifest and manifest.get('backend') == 'numpy':
+        try:
+            vector_db = NumpyVectorIndex(index_directory(persist_directory), get_embeddings_by_name(manifest['embedding_model']))
+            logger.info(f"NumPy index loaded with {manifest['embedding_model']} embeddings from: {persist_directory}")
+            return vector_db
+        except Exception as e:
+            logger.error(f"Error loading NumPy index: {e}")
+            return None
+    if manifest and manifest.get('chroma_mode') == 'shared':
+        try:
+            vector_db = open_shared_chroma(manifest['collection'], get_embeddings_by_name(manifest['embedding_model']))
+            if vector_db is None:
+                logger.error(f"Shared Chroma collection {manifest['collection']} not found")
+            return vector_db
+        except Exception as e:
+            logger.error(f"Error loading shared Chroma collection: {e}")
+            return None
     
+    from langchain_chroma import Chroma
+
     # Strategy 1: Try environment OpenAI API key first
-    openai_api_key = os.getenv('OPENAI_API_KEY')
-    if openai_api_key and openai_api_key.strip() and not openai_api_key.startswith('your_'):
+    openai_api_key = get_environment_openai_key()
+    if openai_api_key:
         try:
-            from langchain_openai import OpenAIEmbeddings
-            embeddings = OpenAIEmbeddings(api_key=openai_api_key)
+            from provider_client import OpenAIEmbeddingClient
+            embeddings = OpenAIEmbeddingClient(api_key=openai_api_key)
             vector_db = Chroma(
                 persist_directory=persist_directory,
                 embedding_function=embeddings
@@ -199,8 +312,7 @@ def load_vector_database(persist_directory) -> Optional[Chroma]:
     
     # Strategy 2: Fallback to local embeddings
     try:
-        from langchain_community.embeddings import HuggingFaceEmbeddings
-        embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        embeddings = get_local_embeddings()
         vector_db = Chroma(
             persist_directory=persist_directory,
             embedding_function=embeddings
@@ -213,14 +325,73 @@ def load_vector_database(persist_directory) -> Optional[Chroma]:
         logger.error(f"Error loading vector database with any embeddings: {e}")
         return None
 
-def process_documents_and_create_db(files, persist_directory=None, model_provider=None, api_key=None, chunk_strategy: str = "semantic") -> Optional[Chroma]:
-    """Process documents and create a vector database.
-    
-    Note: model_provider and api_key are accepted for compatibility but ignored.
-    Always uses environment OpenAI API key for embeddings, or falls back to local embeddings.
+class _StageTimedEmbeddings(Embeddings):
+    """Times embed_documents as the 'embedding' stage when the vector store embeds internally."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.seconds = 0.0
+
+    def embed_documents(self, texts):
+        start = time.perf_counter()
+        with track_stage("embedding", items=len(texts)):
+            vectors = self.embeddings.embed_documents(texts)
+        self.seconds += time.perf_counter() - start
+        return vectors
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+def _create_chroma_store(chunks: List[Document], embeddings, persist_directory=None) -> "Chroma":
+    """Embed chunks into Chroma (shared client or per-directory) and record the manifest."""
+    from langchain_chroma import Chroma
+
+    timed_embeddings = _StageTimedEmbeddings(embeddings)
+    start = time.perf_counter()
+    manifest = {"backend": "chroma", "embedding_model": embedding_model_name(embeddings), "count": len(chunks)}
+    if persist_directory and CHROMA_STORAGE_MODE == 'shared':
+        collection_name = shared_collection_name(persist_directory)
+        vector_db = create_shared_chroma(chunks, timed_embeddings, collection_name)
+        manifest.update({"chroma_mode": "shared", "collection": collection_name})
+    else:
+        vector_db = Chroma.from_documents(
+            documents=chunks,
+            embedding=timed_embeddings,
+            persist_directory=persist_directory
+        )
+        manifest["chroma_mode"] = "per_directory"
+    observe_stage("persist", time.perf_counter() - start - timed_embeddings.seconds)
+    if persist_directory:
+        write_manifest(persist_directory, manifest)
+    return vector_db
+
+def _document_cache_key(file_hash: str, file_path: str, strategy: str) -> str:
+    """Cache key for a file's chunks: content, loader (by extension) and chunker. Semantic
+    split points depend on the embedding vectors, so int8 builds do not share them."""
+    chunker = strategy
+    if strategy == "semantic":
+        chunker += ":fake" if use_fake_embeddings() else f":{local_cache_namespace()}"
+    return f"{file_hash}:{os.path.splitext(file_path)[1].lower()}:{chunker}"
+
+def chunk_document_id(metadata: dict) -> str:
+    """Document a chunk belongs to. Chunks from before document ids are grouped by source file."""
+    if metadata.get('document_id'):
+        return metadata['document_id']
+    return "src-" + hashlib.sha256(str(metadata.get('source', '')).encode("utf-8")).hexdigest()[:DOCUMENT_ID_LENGTH]
+
+def prepare_chunks(files, chunk_strategy: str = "semantic", file_hashes: Optional[Dict[str, str]] = None,
+                   document_names: Optional[Dict[str, str]] = None) -> List[Document]:
+    """Load, chunk, filter and deduplicate files, in the order given.
+
+    file_hashes maps file paths to SHA-256 hashes already computed (e.g. while streaming an
+    upload); chunks of previously seen files come from the document cache. Every chunk
+    records its file as document_id (a prefix of the file's hash) and document_name
+    (document_names[path], else the file name).
     """
-    
-    all_documents = []
+    file_order = []
+    chunks_by_file = {}
+    files_to_load = {}
+    document_ids = {}
     
     for file in files:
         logger.info(f"Loading document: {file}, Type: {type(file)}")
@@ -238,50 +409,308 @@ def process_documents_and_create_db(files, persist_directory=None, model_provide
             else:
                 logger.error(f"Unsupported file type: {type(file)}")
                 continue
-                
-            documents = load_document(file_path_to_load)
-            all_documents.extend(documents)
+
+            # Each file's chunks are cached by content hash.
+            file_order.append(file_path_to_load)
+            file_hash = (file_hashes or {}).get(file_path_to_load) or sha256_file(file_path_to_load)
+            document_ids[file_path_to_load] = file_hash[:DOCUMENT_ID_LENGTH]
+            cache_key = _document_cache_key(file_hash, file_path_to_load, chunk_strategy)
+            chunks = document_cache.get(cache_key)
+            record_cache_lookup("document", hit=chunks is not None)
+            if chunks is not None:
+                logger.info(f"Reusing {len(chunks)} cached chunks for {file_path_to_load} ({file_hash[:12]})")
+                for chunk in chunks:
+                    if 'source' in chunk.metadata:
+                        chunk.metadata['source'] = file_path_to_load
+                chunks_by_file[file_path_to_load] = chunks
+            else:
+                files_to_load[file_path_to_load] = cache_key
             
         except Exception as e:
             logger.error(f"Error processing file {file}: {e}")
             continue
+
+    # Uncached files are loaded together on the loader process pool, PDFs split by page range.
+    if files_to_load:
+        with track_stage("load_document"):
+            documents_by_file = load_documents_parallel(list(files_to_load))
+        count_items("load_document", sum(len(documents) for documents in documents_by_file.values()))
+
+        for file_path_to_load, cache_key in files_to_load.items():
+            documents = documents_by_file.get(file_path_to_load)
+            if not documents:
+                continue
+            try:
+                with track_stage("chunk_documents"):
+                    chunks = chunk_documents(documents, strategy=chunk_strategy)
+                count_items("chunk_documents", len(chunks))
+            except Exception as e:
+                logger.error(f"Error processing file {file_path_to_load}: {e}")
+                continue
+            if chunks:
+                document_cache.put(cache_key, chunks)
+            chunks_by_file[file_path_to_load] = chunks
+
+    # Keep the order the files were given in.
+    all_chunks = []
+    for file_path in file_order:
+        for chunk in chunks_by_file.get(file_path, []):
+            chunk.metadata['document_id'] = document_ids[file_path]
+            chunk.metadata['document_name'] = (document_names or {}).get(file_path) or os.path.basename(file_path)
+            all_chunks.append(chunk)
     
-    if not all_documents:
+    if not all_chunks:
         logger.warning("No documents were successfully loaded")
-        return None
-    
-    # Process documents
-    chunks = chunk_documents(all_documents, strategy=chunk_strategy)
+        return []
+    chunks = all_chunks
     
     # Apply filtering and processing
-    chunks = filter_chunks(chunks)
-    chunks = deduplicate_chunks(chunks)
-    chunks = augment_chunk_metadata(chunks)
+    with track_stage("filter_chunks", items=len(chunks)):
+        chunks = filter_chunks(chunks)
+    with track_stage("deduplicate_chunks", items=len(chunks)):
+        chunks = deduplicate_chunks(chunks)
     
     # Add chunk strategy to metadata
     for chunk in chunks:
         chunk.metadata['chunk_strategy'] = chunk_strategy
+    return chunks
+
+def process_documents_and_create_db(files, persist_directory=None, model_provider=None, api_key=None, chunk_strategy: str = "semantic",
+                                    quantization: Optional[str] = None, rerank: bool = True,
+                                    file_hashes: Optional[Dict[str, str]] = None,
+                                    document_names: Optional[Dict[str, str]] = None) -> Optional[VectorIndex]:
+    """Process documents and create a vector database.
+    
+    Note: model_provider and api_key are accepted for compatibility but ignored.
+    Always uses environment OpenAI API key for embeddings, or falls back to local embeddings.
+    Persisted bots with at most NUMPY_INDEX_MAX_CHUNKS chunks get a NumPy index, larger ones Chroma.
+    quantization (float32/float16/int8, default EMBEDDING_QUANTIZATION) applies to NumPy indexes only;
+    with rerank, quantised indexes keep float32 vectors to rescore their top candidates.
+    file_hashes and document_names are passed to prepare_chunks.
+    """
+    chunks = prepare_chunks(files, chunk_strategy, file_hashes, document_names)
+    if not chunks:
+        return None
+    chunks = augment_chunk_metadata(chunks)
     
     logger.info(f"Total chunks created: {len(chunks)}")
     
     # Create vector database
     try:
-        vector_db = Chroma.from_documents(
-            documents=chunks,
-            embedding=get_embeddings_for_vector_db(),
-            persist_directory=persist_directory
-        )
+        embeddings = get_embeddings_for_vector_db()
+        embedding_cache = get_embedding_cache()
+        if embedding_cache is not None:
+            embeddings = CachedEmbeddings(embeddings, embedding_model_name(embeddings), embedding_cache,
+                                          getattr(embeddings, 'cache_namespace', None))
+        if persist_directory:
+            with track_stage("persist"):
+                write_chunk_store(chunks, persist_directory)
+
+        if persist_directory and len(chunks) <= NUMPY_INDEX_MAX_CHUNKS:
+            with track_stage("embedding", items=len(chunks)):
+                vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks])
+            with track_stage("persist"):
+                build_numpy_index(vectors, persist_directory, embedding_model_name(embeddings),
+                                  quantization=quantization or EMBEDDING_QUANTIZATION, rerank=rerank)
+            vector_db = NumpyVectorIndex(persist_directory, embeddings)
+        else:
+            if quantization and quantization != 'float32':
+                logger.warning(f"Quantization {quantization} is only supported by the NumPy index, Chroma stores float32")
+            vector_db = _create_chroma_store(chunks, embeddings, persist_directory)
         logger.info(f"Vector database created with {len(chunks)} chunks")
-        return vector_db
+        if isinstance(embeddings, CachedEmbeddings):
+            record_cache_lookup("embedding", hit=True, count=embeddings.hits)
+            record_cache_lookup("embedding", hit=False, count=embeddings.misses)
+            logger.info(f"Embedding cache: {embeddings.hits} of {embeddings.hits + embeddings.misses} chunks reused")
     except Exception as e:
         logger.error(f"Error creating vector database: {e}")
         return None
 
-def query_vector_database(vector_db, query, num_results=4) -> List[Document]:
-    """Query the vector database and return similar documents."""
+    # The lexical index is an optional extra; a bot without one still answers dense-only.
+    if persist_directory:
+        try:
+            with track_stage("bm25_index", items=len(chunks)):
+                build_bm25_index(chunks, os.path.join(persist_directory, BM25_DIR))
+        except Exception as e:
+            logger.warning(f"Error building BM25 index, bot will use dense retrieval only: {e}")
+
+    return vector_db
+
+class IndexUpdateError(Exception):
+    """An update that cannot be applied to a bot (Chroma index, or no document left)."""
+
+class DocumentNotFoundError(IndexUpdateError):
+    """A document id that is not part of the bot."""
+
+def list_bot_documents(persist_directory) -> List[dict]:
+    """Documents of a bot with their chunk counts, in index order."""
+    store = ChunkStore(index_directory(persist_directory))
+    documents = {}
+    for chunk in store.get_many(range(len(store))):
+        document_id = chunk_document_id(chunk.metadata)
+        if document_id not in documents:
+            name = chunk.metadata.get('document_name') or os.path.basename(str(chunk.metadata.get('source', '')))
+            documents[document_id] = {"document_id": document_id, "name": name, "chunks": 0}
+        documents[document_id]["chunks"] += 1
+    return list(documents.values())
+
+def update_bot_documents(persist_directory, files=(), remove_document_ids=(), chunk_strategy: str = "semantic",
+                         file_hashes: Optional[Dict[str, str]] = None,
+                         document_names: Optional[Dict[str, str]] = None) -> dict:
+    """Add files to and remove documents from an existing NumPy-indexed bot.
+
+    Only the chunks of the added files are embedded; the vectors of the kept chunks
+    are copied from the current index. The result is written as a new index version
+    and published atomically (see retrieval.storage), so readers never see a partly
+    written index. Files whose content is already in the bot are skipped.
+    Returns a summary of the update.
+    """
+    with bot_update_lock(persist_directory):
+        manifest = read_manifest(persist_directory)
+        if manifest is None:
+            raise FileNotFoundError(f"No bot index in {persist_directory}")
+        if manifest.get('backend') != 'numpy':
+            raise IndexUpdateError("Documents can only be added to or removed from NumPy-indexed bots; recreate the bot instead")
+        current_directory = index_directory(persist_directory)
+        store = ChunkStore(current_directory)
+        existing = store.get_many(range(len(store)))
+        existing_ids = [chunk_document_id(chunk.metadata) for chunk in existing]
+
+        remove = set(remove_document_ids)
+        unknown = remove - set(existing_ids)
+        if unknown:
+            raise DocumentNotFoundError(f"Unknown document ids: {', '.join(sorted(unknown))}")
+        keep = [i for i, document_id in enumerate(existing_ids) if document_id not in remove]
+        kept_ids = {existing_ids[i] for i in keep}
+
+        new_chunks = prepare_chunks(files, chunk_strategy, file_hashes, document_names) if files else []
+        skipped = sorted({chunk.metadata['document_name'] for chunk in new_chunks if chunk.metadata['document_id'] in kept_ids})
+        new_chunks = [chunk for chunk in new_chunks if chunk.metadata['document_id'] not in kept_ids]
+        summary = {
+            "version": manifest.get("current_version"),
+            "documents_added": sorted({chunk.metadata['document_name'] for chunk in new_chunks}),
+            "documents_removed": sorted(remove),
+            "documents_skipped": skipped,
+            "chunks_added": len(new_chunks),
+            "chunks_removed": len(existing) - len(keep),
+            "chunks": len(keep) + len(new_chunks),
+        }
+        if not new_chunks and not remove:
+            return summary
+        if not keep and not new_chunks:
+            raise IndexUpdateError("A bot needs at least one document; delete the bot instead")
+
+        embeddings = get_embeddings_by_name(manifest['embedding_model'])
+        embedding_cache = get_embedding_cache()
+        if embedding_cache is not None:
+            embeddings = CachedEmbeddings(embeddings, manifest['embedding_model'], embedding_cache,
+                                          getattr(embeddings, 'cache_namespace', None))
+        old_vectors = read_vectors(current_directory)
+        new_vectors = np.zeros((0, old_vectors.shape[1]), dtype=np.float32)
+        if new_chunks:
+            with track_stage("embedding", items=len(new_chunks)):
+                new_vectors = np.asarray(embeddings.embed_documents([chunk.page_content for chunk in new_chunks]), dtype=np.float32)
+            if new_vectors.shape[1] != old_vectors.shape[1]:
+                raise IndexUpdateError(f"{manifest['embedding_model']} now returns {new_vectors.shape[1]}-dimensional vectors, "
+                                       f"the bot has {old_vectors.shape[1]}")
+        if isinstance(embeddings, CachedEmbeddings):
+            record_cache_lookup("embedding", hit=True, count=embeddings.hits)
+            record_cache_lookup("embedding", hit=False, count=embeddings.misses)
+
+        chunks = augment_chunk_metadata([existing[i] for i in keep] + new_chunks)
+        vectors = np.concatenate([old_vectors[keep], new_vectors])
+        version, staging = new_index_version(persist_directory)
+        try:
+            with track_stage("persist"):
+                write_chunk_store(chunks, staging)
+                build_numpy_index(vectors, staging, manifest['embedding_model'],
+                                  quantization=manifest.get('quantization', 'float32'), rerank=manifest.get('rerank', True))
+            try:
+                with track_stage("bm25_index", items=len(chunks)):
+                    build_bm25_index(chunks, os.path.join(staging, BM25_DIR))
+            except Exception as e:
+                logger.warning(f"Error building BM25 index, bot will use dense retrieval only: {e}")
+            publish_index_version(persist_directory, version, staging)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        logger.info(f"Published index {version} of {persist_directory}: +{len(new_chunks)} -{summary['chunks_removed']} chunks")
+        summary["version"] = version
+        return summary
+
+def load_lexical_index(persist_directory) -> Optional[BM25Index]:
+    """Load the BM25 index built next to a vector database, or None for older bots."""
+    return load_bm25_index(index_directory(persist_directory))
+
+def _fusion_key(doc: Document):
+    chunk_id = doc.metadata.get('chunk_id')
+    return chunk_id if chunk_id is not None else doc.page_content
+
+def adaptive_cutoff(scores: List[float], max_gap: float, min_results: int = 1) -> int:
+    """Number of results to keep from best-first scores: everything before the first drop
+    between neighbours larger than max_gap times the top score, but at least min_results."""
+    if not scores or scores[0] <= 0:
+        return len(scores)
+    for i in range(max(1, min_results), len(scores)):
+        if (scores[i - 1] - scores[i]) / scores[0] > max_gap:
+            return i
+    return len(scores)
+
+def query_vector_database_with_scores(vector_db, query, num_results=4, lexical_index: Optional[BM25Index] = None,
+                                      score_gap: Optional[float] = None,
+                                      min_results: int = RETRIEVAL_MIN_RESULTS) -> List[Tuple[Document, float]]:
+    """Query the vector database and return (document, score) pairs, best first.
+
+    Dense-only scores are relevance scores (cosine similarity for NumPy indexes). With a
+    lexical index, dense and BM25 retrieval run in parallel and are merged with
+    reciprocal-rank fusion; scores are then the fused scores. With score_gap, up to
+    num_results are returned, cut at the first large score drop (see adaptive_cutoff).
+
+    Fused scores depend only on ranks (a chunk found by both retrievers scores about
+    twice one found by either), so the cut is never taken on them: with a lexical
+    index, the number of results is the cut of the dense relevance scores, and fusion
+    decides which chunks fill it.
+    """
     try:
-        results = vector_db.similarity_search(query, k=num_results)
+        if lexical_index is None:
+            results = vector_db.similarity_search_with_relevance_scores(query, k=num_results)
+            relevance_scores = [score for _, score in results]
+        else:
+            candidates = max(num_results, HYBRID_CANDIDATES)
+            dense_future = _retrieval_executor.submit(vector_db.similarity_search_with_relevance_scores, query, k=candidates)
+            try:
+                with track_stage("retrieval_lexical"):
+                    lexical_hits = lexical_index.search(query, k=candidates)
+            except Exception as e:
+                logger.warning(f"BM25 search failed, using dense results only: {e}")
+                lexical_hits = []
+            dense_scored = dense_future.result()
+            dense_results = [doc for doc, _ in dense_scored]
+            relevance_scores = [score for _, score in dense_scored[:num_results]]
+
+            documents = {}
+            for doc in dense_results:
+                documents.setdefault(_fusion_key(doc), doc)
+            lexical_keys = []
+            for chunk_index, _ in lexical_hits:
+                # Chunk store index == chunk_id, both assigned in the same order at build time.
+                lexical_keys.append(chunk_index)
+                if chunk_index not in documents:
+                    documents[chunk_index] = lexical_index.chunks.get(chunk_index)
+
+            fused = reciprocal_rank_fusion([[_fusion_key(doc) for doc in dense_results], lexical_keys])
+            results = [(documents[key], score) for key, score in fused[:num_results]]
+
+        if score_gap is not None:
+            keep = adaptive_cutoff(relevance_scores, score_gap, min_results)
+            # No drop among the dense scores: keep every result, lexical-only ones included.
+            if keep < len(relevance_scores):
+                results = results[:keep]
         return results
     except Exception as e:
         logger.error(f"Error querying vector database: {e}")
         return []
+
+def query_vector_database(vector_db, query, num_results=4, lexical_index: Optional[BM25Index] = None) -> List[Document]:
+    """Query the vector database and return the num_results most similar documents."""
+    return [doc for doc, _ in query_vector_database_with_scores(vector_db, query, num_results, lexical_index)]
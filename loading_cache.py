@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from cachetools import Cache
+
+from metrics import record_cache_lookup, record_coalesced_wait
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+        # Set when the key is dropped while loading, so a stale result is not cached.
+        self.invalidated = False
+
+
+class LoadingCache:
+    """Thread-safe wrapper around a cachetools cache that loads each missing key once.
+
+    cachetools caches are not thread-safe, so every access goes through one lock.
+    Loads run outside it: the first request for a missing key runs the loader, and
+    concurrent requests for the same key wait for that result instead of loading
+    the bot again (counted as coalesced waits). None results are not cached.
+    """
+
+    def __init__(self, name: str, cache: Cache):
+        self.name = name
+        self._cache = cache
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, _Flight] = {}
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._cache:
+                record_cache_lookup(self.name, hit=True)
+                return self._cache[key]
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+
+        if not leader:
+            start = time.perf_counter()
+            flight.done.wait()
+            record_coalesced_wait(self.name, time.perf_counter() - start)
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        record_cache_lookup(self.name, hit=False)
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.value is not None and not flight.invalidated:
+                    self._cache[key] = flight.value
+                del self._in_flight[key]
+            flight.done.set()
+        return flight.value
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._cache
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._in_flight:
+                self._in_flight[key].invalidated = True
+            return self._cache.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            for flight in self._in_flight.values():
+                flight.invalidated = True
+            self._cache.clear()
@@ -1,14 +1,11 @@
-import asyncio
 import json
 
 # import gradio as gr
-import psycopg2
-from langchain_openai import ChatOpenAI
 from document_loader import process_documents_and_create_db, query_vector_database # Import query_vector_database
+from prompt_builder import SESSION_SUMMARY_TOKENS, build_prompt, fit_history, truncate_tokens
 
-from crawler.main_crawler import call_crawler
-from text_postprocessing.tree_from_json import create_tree_from_json, extract_markdowns
-from text_postprocessing.remove_header import remove_header_footer
+# psycopg2, the LLM clients and the crawler stack are imported inside the functions
+# that use them: app.py imports formulate_answer from here on every replica.
 
 
 # --- Load Vector Database (Load when the app starts) ---
@@ -21,6 +18,7 @@ else:
 
 def test_sql_connection(host, database, username, password):
     """Tests SQL database connection."""
+    import psycopg2
     try:
         conn = psycopg2.connect(host=host, database=database, user=username, password=password)
         conn.close()
@@ -30,64 +28,100 @@ def test_sql_connection(host, database, username, password):
     except Exception as e:
         return f"Error testing SQL Connection: {e}"
 
+def answer_model_name(model_info=None):
+    """Model the answer will be generated with, as chosen in formulate_answer_with_usage."""
+    if model_info and model_info.get('provider') == 'openai':
+        return model_info.get('model_name', 'gpt-4o-mini')
+    if model_info and model_info.get('provider') == 'gemini':
+        return model_info.get('model_name', 'gemini-2.5-flash')
+    return 'gpt-4o-mini'
+
+def get_chat_model(model_info=None):
+    """Chat model for model_info ({provider, model_name, api_key}), default gpt-4o-mini."""
+    # Use the selected model if provided, otherwise fall back to default
+    if model_info and model_info.get('provider') == 'openai':
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(
+            model=model_info.get('model_name', 'gpt-4o-mini'),
+            api_key=model_info.get('api_key')
+        )
+    elif model_info and model_info.get('provider') == 'gemini':
+        try:
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            return ChatGoogleGenerativeAI(
+                model=model_info.get('model_name', 'gemini-2.5-flash'),
+                google_api_key=model_info.get('api_key')
+            )
+        except ImportError:
+            print("Google GenAI not installed. Install with: pip install langchain-google-genai")
+            # Fallback to OpenAI
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(model="gpt-4o-mini")
+    else:
+        # Fallback to default OpenAI model
+        from langchain_openai import ChatOpenAI
+        return ChatOpenAI(model="gpt-4o-mini")
+
+def condense_question(query, history, model_info=None, summary=""):
+    """Rewrite a follow-up question as a standalone question for retrieval, using the
+    session history (summary and recent turns). Falls back to the question itself."""
+    if not history and not summary:
+        return query
+    model_name = answer_model_name(model_info)
+    messages = [
+        ("system",
+         "Rewrite the user's follow-up question as a single standalone question that can be understood "
+         "without the conversation. Keep names and specifics from the conversation. Reply with the question only."),
+        ("human", f"Conversation:\n{fit_history(history, model_name, summary)}\n\n"
+                  f"Follow-up question: {query}"),
+    ]
+    try:
+        standalone = get_chat_model(model_info).invoke(messages).content.strip()
+        return standalone or query
+    except Exception as e:
+        print(f"Error condensing question, using it as asked: {e}")
+        return query
+
+def summarize_turns(summary, turns, model_info=None):
+    """Fold older conversation turns into the rolling session summary."""
+    model_name = answer_model_name(model_info)
+    transcript = "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in turns)
+    messages = [
+        ("system",
+         "Update the summary of a conversation between a user and a website assistant with the new turns. "
+         "Keep facts, names and open questions the user may refer back to. At most 150 words."),
+        ("human", f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"),
+    ]
+    new_summary = get_chat_model(model_info).invoke(messages).content.strip()
+    return truncate_tokens(new_summary, SESSION_SUMMARY_TOKENS, model_name)
+
 def formulate_answer(query, context_chunks, context, model_info=None):
-    print("for query: ", query, "\ncontext: ", context_chunks)
     """
     Formulates an answer using the specified LLM based on the query and retrieved context chunks.
     """
-    if not context_chunks:
-        return "I'm sorry, I couldn't find relevant information in the documents for your query."
+    answer, _ = formulate_answer_with_usage(query, context_chunks, context, model_info)
+    return answer
 
-    context_text = "\n\n".join([chunk.page_content for chunk in context_chunks]) # Join chunks into single context string
-    prompt = f"""
-    PREVIOUS QUESTION CONTEXT:
-    {context}
-    
-    Relevant DOCUMENT Chunks:
-    {context_text}
-    
-    QUESTION:
-    {query}
-    
-    ANSWER:
+def formulate_answer_with_usage(query, context_chunks, context, model_info=None, summary=""):
     """
+    formulate_answer that also returns prompt usage (prompt_tokens, chunks_used, ...).
+    Chunks are packed in rank order into the model's token budget and the conversation
+    context is trimmed to its most recent part, after the session summary if any
+    (budgeted separately), see prompt_builder.
+    """
+    if not context_chunks:
+        usage = {"model": answer_model_name(model_info), "prompt_tokens": 0, "chunks_retrieved": 0, "chunks_used": 0}
+        return "I'm sorry, I couldn't find relevant information in the documents for your query.", usage
+
+    messages, usage = build_prompt(query, context_chunks, context, answer_model_name(model_info), summary=summary)
 
     try:
-        messages = [
-            ("system",
-            "You're a Website Assistant. Answer the question below based on the provided context. Be concise and helpful."),
-            ("human", prompt),
-        ]
-        
-        # Use the selected model if provided, otherwise fall back to default
-        if model_info and model_info.get('provider') == 'openai':
-            from langchain_openai import ChatOpenAI
-            llm = ChatOpenAI(
-                model=model_info.get('model_name', 'gpt-4o-mini'),
-                api_key=model_info.get('api_key')
-            )
-        elif model_info and model_info.get('provider') == 'gemini':
-            try:
-                from langchain_google_genai import ChatGoogleGenerativeAI
-                llm = ChatGoogleGenerativeAI(
-                    model=model_info.get('model_name', 'gemini-2.5-flash'),
-                    google_api_key=model_info.get('api_key')
-                )
-            except ImportError:
-                print("Google GenAI not installed. Install with: pip install langchain-google-genai")
-                # Fallback to OpenAI
-                from langchain_openai import ChatOpenAI
-                llm = ChatOpenAI(model="gpt-4o-mini")
-        else:
-            # Fallback to default OpenAI model
-            from langchain_openai import ChatOpenAI
-            llm = ChatOpenAI(model="gpt-4o-mini")
-        
+        llm = get_chat_model(model_info)
         response = llm.invoke(messages)
-        return response.content.strip() # Return LLM answer, removing leading/trailing whitespace
+        return response.content.strip(), usage # Return LLM answer, removing leading/trailing whitespace
     except Exception as e:
         print(f"Error during answer formulation with LLM: {e}")
-        return "I encountered an error while trying to formulate an answer. Please try again later."
+        return "I encountered an error while trying to formulate an answer. Please try again later.", usage
 
 
 def chatbot_response(query):
@@ -113,11 +147,15 @@ def process_configuration(website_url, files):
     """
     status_messages = ""
     if website_url:
+        from crawler.main_crawler import run_crawler
+        from text_postprocessing.tree_from_json import create_tree_from_json, extract_markdowns
+        from text_postprocessing.remove_header import remove_header_footer
+
         status_messages += "Website URL is there!\n"
         print("Website URL is there!: ", website_url) # Print to console for backend log
 
         try:
-            asyncio.run(call_crawler(website_url))
+            run_crawler(website_url)
             new_file = remove_header_footer("crawl_results.json")
             create_tree_from_json(new_file, "tree_output.json")
 
@@ -0,0 +1,149 @@
+import functools
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Build stages take seconds to minutes, query stages milliseconds; one bucket set covers both.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds", "Time spent in each build/query pipeline stage", ["stage"], buckets=LATENCY_BUCKETS
+)
+STAGE_ITEMS = Counter(
+    "pipeline_stage_items_total", "Items (pages, documents, chunks, queries) processed by each stage", ["stage"]
+)
+STAGE_ERRORS = Counter("pipeline_stage_errors_total", "Exceptions raised inside each stage", ["stage"])
+STAGE_IN_PROGRESS = Gauge(
+    "pipeline_stage_in_progress", "Stage executions currently running", ["stage"], multiprocess_mode="livesum"
+)
+
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result (hit/miss)", ["cache", "result"])
+CACHE_COALESCED_WAITS = Counter(
+    "cache_coalesced_waits_total", "Cache misses that waited for a load already running for the same key", ["cache"]
+)
+CACHE_COALESCED_WAIT_SECONDS = Histogram(
+    "cache_coalesced_wait_seconds", "Time coalesced misses waited for the running load", ["cache"], buckets=LATENCY_BUCKETS
+)
+
+BROWSER_EVENTS = Counter(
+    "browser_pool_events_total", "Browser pool starts and closes by reason (recycle, failures, health_failure, idle_stop)", ["event"]
+)
+BROWSERS_RUNNING = Gauge("browser_pool_browsers_running", "Pooled browsers currently running", multiprocess_mode="livesum")
+BROWSER_LEASES = Gauge("browser_pool_leases", "Browser leases held by crawl jobs", multiprocess_mode="livesum")
+
+PROVIDER_REQUESTS = Counter(
+    "provider_requests_total", "Requests to the LLM/embedding provider by endpoint and outcome (ok, HTTP status, connection_error)",
+    ["endpoint", "outcome"],
+)
+PROVIDER_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "provider_rate_limit_wait_seconds", "Time provider requests waited for the client-side rate limiter", ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+PROMPT_TOKENS = Histogram(
+    "llm_prompt_tokens", "Prompt tokens sent to the LLM per answered query", ["model"],
+    buckets=(250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 16000, 32000),
+)
+REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "End-to-end latency of API endpoints", ["endpoint"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "API requests currently being handled", ["endpoint"], multiprocess_mode="livesum"
+)
+
+
+@contextmanager
+def track_stage(stage: str, items: Optional[int] = None):
+    """Time a pipeline stage and count it as in flight while it runs."""
+    STAGE_IN_PROGRESS.labels(stage).inc()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+        STAGE_IN_PROGRESS.labels(stage).dec()
+        if items is not None:
+            STAGE_ITEMS.labels(stage).inc(items)
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage duration measured by the caller (e.g. total minus a nested stage)."""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def count_items(stage: str, items: int):
+    """Add to a stage's throughput counter once its output size is known."""
+    STAGE_ITEMS.labels(stage).inc(items)
+
+
+def record_cache_lookup(cache: str, hit: bool, count: int = 1):
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc(count)
+
+
+def record_coalesced_wait(cache: str, seconds: float):
+    CACHE_COALESCED_WAITS.labels(cache).inc()
+    CACHE_COALESCED_WAIT_SECONDS.labels(cache).observe(seconds)
+
+
+def record_browser_event(event: str):
+    BROWSER_EVENTS.labels(event).inc()
+
+
+def set_browser_pool_state(running: int, leases: int):
+    BROWSERS_RUNNING.set(running)
+    BROWSER_LEASES.set(leases)
+
+
+def record_provider_request(endpoint: str, outcome: str):
+    PROVIDER_REQUESTS.labels(endpoint, outcome).inc()
+
+
+def observe_rate_limit_wait(model: str, seconds: float):
+    PROVIDER_RATE_LIMIT_WAIT_SECONDS.labels(model).observe(seconds)
+
+
+def observe_prompt_tokens(model: str, tokens: int):
+    PROMPT_TOKENS.labels(model).observe(tokens)
+
+
+@contextmanager
+def track_request(endpoint: str):
+    REQUESTS_IN_PROGRESS.labels(endpoint).inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+        REQUESTS_IN_PROGRESS.labels(endpoint).dec()
+
+
+def instrument_endpoint(endpoint: str):
+    """Decorator for async FastAPI endpoints: latency histogram and in-progress gauge."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with track_request(endpoint):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def render_metrics():
+    """Return (body, content type) for the /metrics endpoint.
+
+    With PROMETHEUS_MULTIPROC_DIR set (multi-worker uvicorn) the samples of all
+    workers are aggregated from that directory.
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    from prometheus_client import REGISTRY
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
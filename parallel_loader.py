@@ -0,0 +1,147 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# PDF text extraction: "pypdf" (what PyPDFLoader uses) or "pymupdf" (much faster, optional dependency).
+PDF_BACKEND = os.getenv('PDF_BACKEND', 'pypdf')
+# Worker processes for document loading; 1 loads in the calling process.
+LOADER_PROCESSES = int(os.getenv('LOADER_PROCESSES', str(min(4, os.cpu_count() or 1))))
+# Pages per loading task, so one large PDF is spread over all workers.
+PDF_PAGES_PER_TASK = int(os.getenv('PDF_PAGES_PER_TASK', '25'))
+
+PDF_BACKENDS = ("pypdf", "pymupdf")
+
+_loader_pool: Optional[ProcessPoolExecutor] = None
+_loader_pool_lock = threading.Lock()
+
+
+def resolve_pdf_backend(backend: Optional[str] = None) -> str:
+    backend = backend or PDF_BACKEND
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend {backend!r}, expected one of {PDF_BACKENDS}")
+    if backend == "pymupdf":
+        try:
+            import fitz  # noqa: F401
+        except ImportError:
+            logger.warning("PDF_BACKEND=pymupdf but PyMuPDF is not installed, using pypdf")
+            return "pypdf"
+    return backend
+
+
+def pdf_page_count(file_path: str, backend: str) -> int:
+    if backend == "pymupdf":
+        import fitz
+        with fitz.open(file_path) as pdf:
+            return pdf.page_count
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def load_pdf_pages(file_path: str, start: int, end: int, backend: str) -> List[Document]:
+    """Pages [start, end) of a PDF, one Document per page with PyPDFLoader-style metadata."""
+    documents = []
+    if backend == "pymupdf":
+        import fitz
+        with fitz.open(file_path) as pdf:
+            total = pdf.page_count
+            for page in range(start, min(end, total)):
+                text = pdf.load_page(page).get_text()
+                documents.append(Document(page_content=text, metadata={"source": file_path, "page": page, "total_pages": total}))
+    else:
+        from pypdf import PdfReader
+        reader = PdfReader(file_path)
+        if reader.is_encrypted:
+            reader.decrypt("")
+        total = len(reader.pages)
+        for page in range(start, min(end, total)):
+            text = reader.pages[page].extract_text()
+            documents.append(Document(page_content=text, metadata={"source": file_path, "page": page, "total_pages": total}))
+    return documents
+
+
+def load_text_file(file_path: str) -> List[Document]:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return [Document(page_content=f.read(), metadata={"source": file_path})]
+
+
+def get_loader_pool() -> Optional[ProcessPoolExecutor]:
+    """Process-wide loader pool, created on first use; None when LOADER_PROCESSES <= 1."""
+    global _loader_pool
+    if LOADER_PROCESSES <= 1:
+        return None
+    if _loader_pool is None:
+        with _loader_pool_lock:
+            if _loader_pool is None:
+                # spawn: the app forks from threads (uvicorn, run_in_executor), which fork does not handle safely
+                _loader_pool = ProcessPoolExecutor(max_workers=LOADER_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _loader_pool
+
+
+def _plan_tasks(file_paths: List[str], backend: str, pages_per_task: int) -> List[Tuple[str, tuple]]:
+    tasks = []
+    for file_path in file_paths:
+        ext = os.path.splitext(file_path)[1].lower()
+        try:
+            if ext == '.pdf':
+                pages = pdf_page_count(file_path, backend)
+                for start in range(0, pages, pages_per_task):
+                    tasks.append((file_path, (load_pdf_pages, file_path, start, start + pages_per_task, backend)))
+            elif ext == '.txt':
+                tasks.append((file_path, (load_text_file, file_path)))
+            else:
+                logger.warning(f"Unsupported file extension: {ext}")
+        except Exception as e:
+            logger.error(f"Error loading {file_path}: {e}")
+    return tasks
+
+
+def load_documents_parallel(file_paths: List[str], backend: Optional[str] = None, executor: Optional[Executor] = None,
+                            pages_per_task: int = PDF_PAGES_PER_TASK) -> Dict[str, List[Document]]:
+    """Load PDFs (per page range) and text files on a process pool.
+
+    Returns {file_path: documents} with pages in document order. A file with any
+    failing range maps to an empty list, like load_document on error.
+    """
+    backend = resolve_pdf_backend(backend)
+    tasks = _plan_tasks(file_paths, backend, pages_per_task)
+    executor = executor if executor is not None else get_loader_pool()
+
+    results: Dict[str, List[Document]] = {file_path: [] for file_path in file_paths}
+    failed = set()
+    if executor is None or len(tasks) <= 1:
+        outcomes = []
+        for file_path, (function, *args) in tasks:
+            try:
+                outcomes.append((file_path, function(*args), None))
+            except Exception as e:
+                outcomes.append((file_path, None, e))
+    else:
+        futures = [(file_path, executor.submit(function, *args)) for file_path, (function, *args) in tasks]
+        outcomes = []
+        for file_path, future in futures:
+            try:
+                outcomes.append((file_path, future.result(), None))
+            except Exception as e:
+                outcomes.append((file_path, None, e))
+
+    # Tasks were planned per file in page order, so appending in task order keeps page order.
+    for file_path, documents, error in outcomes:
+        if error is not None:
+            if file_path not in failed:
+                logger.error(f"Error loading {file_path}: {error}")
+            failed.add(file_path)
+        elif file_path not in failed:
+            results[file_path].extend(documents)
+    for file_path in failed:
+        results[file_path] = []
+    for file_path in file_paths:
+        logger.info(f"Loaded {len(results[file_path])} documents from {file_path}")
+    return results
@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
@@ -24,6 +24,8 @@ export default function ChatScreen({
   const [isLoading, setIsLoading] = useState(false);
   const [currentModel, setCurrentModel] = useState(selectedModel);
   const [showModelSelector, setShowModelSelector] = useState(false);
+  // The backend keeps the conversation history per session, so only the new question is sent.
+  const sessionId = useRef(crypto.randomUUID());
 
   useEffect(() => {
     setCurrentModel(selectedModel);
@@ -53,7 +55,6 @@ export default function ChatScreen({
 
   const sendMessage = async () => {
     if (!input.trim() || isLoading) return;
-    const context = messages.map((msg) => msg.text).join(" ");
     const newMessages = [...messages, { text: input, sender: "user" }];
     setMessages(newMessages);
     setInput("");
@@ -68,7 +69,7 @@ export default function ChatScreen({
       body: JSON.stringify({
         "bot_id": localStorage.getItem("bot_id"),
         "query": input,
-        "context": context,
+        "session_id": sessionId.current,
         "model": modelInfo ? {
           provider: modelInfo.provider,
           model_name: modelInfo.name,
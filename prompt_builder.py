@@ -0,0 +1,140 @@
+import functools
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You're a Website Assistant. Answer the question below based on the provided context. Be concise and helpful."
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Tokens of document chunks per prompt; the answer rarely improves past a few chunks,
+# while latency and cost grow with every token.
+PROMPT_CONTEXT_TOKENS = int(os.getenv('PROMPT_CONTEXT_TOKENS', '3000'))
+# Tokens kept from the client-supplied conversation context (its most recent part).
+PROMPT_HISTORY_TOKENS = int(os.getenv('PROMPT_HISTORY_TOKENS', '500'))
+# Upper bound for rolling session summaries (see session_store); budgeted on top of
+# PROMPT_HISTORY_TOKENS, so recent turns never push the summary out of the prompt.
+SESSION_SUMMARY_TOKENS = 300
+# A chunk that does not fit is truncated if at least this many tokens remain, else dropped.
+MIN_CHUNK_TOKENS = 64
+# Room left in the model's context window for the answer.
+ANSWER_TOKENS_RESERVE = 1024
+
+# Context windows of the models users can select; unknown models get the smallest.
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4.1-mini": 1047576,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "gemini-2.5-flash": 1048576,
+    "gemini-2.5-pro": 1048576,
+    "gemini-1.5-flash": 1048576,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+PROMPT_TEMPLATE = """
+    PREVIOUS QUESTION CONTEXT:
+    {context}
+
+    Relevant DOCUMENT Chunks:
+    {context_text}
+
+    QUESTION:
+    {query}
+
+    ANSWER:
+    """
+
+
+@functools.lru_cache(maxsize=16)
+def get_tokenizer(model_name: str):
+    """tiktoken encoding for a model (cl100k_base for non-OpenAI models), loaded once per
+    process; None without tiktoken, in which case token counts are estimated."""
+    try:
+        import tiktoken
+    except ImportError:
+        logger.warning("tiktoken not installed, estimating prompt tokens from text length")
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model_name: str = DEFAULT_MODEL) -> int:
+    tokenizer = get_tokenizer(model_name)
+    if tokenizer is None:
+        return (len(text) + 3) // 4
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int, model_name: str = DEFAULT_MODEL, keep_end: bool = False) -> str:
+    """At most max_tokens of text, from its start (or its end with keep_end)."""
+    if max_tokens <= 0:
+        return ""
+    tokenizer = get_tokenizer(model_name)
+    if tokenizer is None:
+        max_chars = max_tokens * 4
+        return text[-max_chars:] if keep_end else text[:max_chars]
+    tokens = tokenizer.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return tokenizer.decode(tokens[-max_tokens:] if keep_end else tokens[:max_tokens])
+
+
+def context_budget(model_name: str, budget: Optional[int] = None) -> int:
+    """Chunk tokens for a model: PROMPT_CONTEXT_TOKENS, capped by its context window."""
+    window = MODEL_CONTEXT_WINDOWS.get(model_name, DEFAULT_CONTEXT_WINDOW)
+    available = (window - ANSWER_TOKENS_RESERVE - PROMPT_HISTORY_TOKENS - SESSION_SUMMARY_TOKENS
+                 - count_tokens(SYSTEM_PROMPT, model_name) - 200)
+    return max(0, min(budget or PROMPT_CONTEXT_TOKENS, available))
+
+
+def pack_chunks(chunks: Sequence[Document], model_name: str, budget: int) -> List[str]:
+    """Chunk texts in rank order until the token budget is spent; the first chunk that does
+    not fit is truncated when enough room is left."""
+    packed = []
+    remaining = budget
+    for chunk in chunks:
+        tokens = count_tokens(chunk.page_content, model_name)
+        if tokens <= remaining:
+            packed.append(chunk.page_content)
+            remaining -= tokens
+            continue
+        if remaining >= MIN_CHUNK_TOKENS:
+            packed.append(truncate_tokens(chunk.page_content, remaining, model_name))
+        break
+    return packed
+
+
+def fit_history(context: str, model_name: str = DEFAULT_MODEL, summary: str = "") -> str:
+    """Conversation context of a prompt: the most recent PROMPT_HISTORY_TOKENS of the
+    turns, after the session summary cut to its own SESSION_SUMMARY_TOKENS."""
+    history = truncate_tokens(context or "", PROMPT_HISTORY_TOKENS, model_name, keep_end=True)
+    if summary:
+        summary = truncate_tokens(summary, SESSION_SUMMARY_TOKENS, model_name)
+        history = f"Summary of earlier conversation: {summary}\n{history}".rstrip()
+    return history
+
+
+def build_prompt(query: str, chunks: Sequence[Document], context: str, model_name: Optional[str] = None,
+                 budget: Optional[int] = None, summary: str = "") -> Tuple[List[Tuple[str, str]], dict]:
+    """Chat messages for formulate_answer and their usage: prompt_tokens, chunks used."""
+    model_name = model_name or DEFAULT_MODEL
+    packed = pack_chunks(chunks, model_name, context_budget(model_name, budget))
+    history = fit_history(context, model_name, summary)
+    prompt = PROMPT_TEMPLATE.format(context=history, context_text="\n\n".join(packed), query=query)
+    usage = {
+        "model": model_name,
+        "prompt_tokens": count_tokens(SYSTEM_PROMPT, model_name) + count_tokens(prompt, model_name),
+        "chunks_retrieved": len(chunks),
+        "chunks_used": len(packed),
+    }
+    return [("system", SYSTEM_PROMPT), ("human", prompt)], usage
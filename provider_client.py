@@ -0,0 +1,279 @@
+"""Shared outbound client for the OpenAI-compatible provider API.
+
+All calls to the provider (embeddings while building bots, chat completions in
+text_postprocessing) go through one ProviderClient per process:
+
+- one requests.Session with a connection pool of PROVIDER_MAX_CONNECTIONS, so
+  concurrent batches reuse TLS connections instead of opening one per call;
+- token buckets per model for requests and tokens per minute
+  (OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE), so a large build
+  paces itself below the account limits instead of running into them;
+- retries of 429, 5xx, timeouts and connection errors, up to
+  PROVIDER_MAX_RETRIES times, waiting for Retry-After when the provider sends
+  it and with full-jitter exponential backoff otherwise.
+
+OpenAIEmbeddingClient splits embed_documents into batches of at most
+EMBEDDING_BATCH_TOKENS tokens (and 2048 inputs) and sends up to
+EMBEDDING_CONCURRENCY of them at a time. Point OPENAI_BASE_URL at
+benchmarks/fake_llm_server.py to exercise all of it locally.
+"""
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from langchain_core.embeddings import Embeddings
+from requests.adapters import HTTPAdapter
+
+from metrics import observe_rate_limit_wait, record_provider_request
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+PROVIDER_TIMEOUT_SECONDS = float(os.getenv('PROVIDER_TIMEOUT_SECONDS', '60'))
+PROVIDER_MAX_RETRIES = int(os.getenv('PROVIDER_MAX_RETRIES', '6'))
+PROVIDER_MAX_CONNECTIONS = int(os.getenv('PROVIDER_MAX_CONNECTIONS', '16'))
+# Per model; set them to the account's limits. 0 disables a limit.
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', '3000'))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv('OPENAI_TOKENS_PER_MINUTE', '1000000'))
+OPENAI_EMBEDDING_MODEL = os.getenv('OPENAI_EMBEDDING_MODEL', 'text-embedding-ada-002')
+EMBEDDING_BATCH_TOKENS = int(os.getenv('EMBEDDING_BATCH_TOKENS', '50000'))
+EMBEDDING_CONCURRENCY = int(os.getenv('EMBEDDING_CONCURRENCY', '4'))
+
+# Limits of the embeddings endpoint itself.
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_INPUT_TOKENS = 8191
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class ProviderError(Exception):
+    """A provider request that failed for good (client error, or retries exhausted)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at rate_per_minute.
+
+    acquire blocks until the amount is available; an amount larger than the
+    bucket is let through once the bucket is full, leaving it in debt.
+    """
+
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float) -> float:
+        """Take amount from the bucket, waiting as needed; returns the seconds waited."""
+        if self.capacity <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.available >= min(amount, self.capacity):
+                    self.available -= amount
+                    return waited
+                delay = (min(amount, self.capacity) - self.available) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Tokens of a text for the cl100k models, estimated as chars/4 without tiktoken."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # tiktoken missing, or its encoding cannot be downloaded.
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def retry_delay(attempt: int, response: Optional[requests.Response] = None) -> float:
+    """Seconds to wait before retry number attempt (from 0): Retry-After if the
+    provider sent it, else full-jitter exponential backoff."""
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        try:
+            if retry_after is not None:
+                # A little jitter so batches limited together do not all retry at once.
+                return min(float(retry_after), BACKOFF_MAX_SECONDS) * random.uniform(1.0, 1.2)
+        except ValueError:
+            pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class ProviderClient:
+    """Pooled, rate-limited and retrying JSON client for one provider base URL."""
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 requests_per_minute: int = OPENAI_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = OPENAI_TOKENS_PER_MINUTE,
+                 max_retries: int = PROVIDER_MAX_RETRIES, timeout: float = PROVIDER_TIMEOUT_SECONDS,
+                 max_connections: int = PROVIDER_MAX_CONNECTIONS):
+        # Read when the client is created, after callers have loaded their .env.
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL", DEFAULT_BASE_URL)).rstrip("/")
+        self.api_key = api_key
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._limiters: Dict[str, Tuple[TokenBucket, TokenBucket]] = {}
+        self._limiters_lock = threading.Lock()
+        self.retries = 0
+
+    def _limiter(self, model: str) -> Tuple[TokenBucket, TokenBucket]:
+        with self._limiters_lock:
+            if model not in self._limiters:
+                self._limiters[model] = (TokenBucket(self.requests_per_minute), TokenBucket(self.tokens_per_minute))
+            return self._limiters[model]
+
+    def post(self, path: str, payload: dict, tokens: int = 0, api_key: Optional[str] = None) -> dict:
+        """POST payload to base_url + path and return the JSON response.
+
+        tokens is the request's estimated token usage, taken from the model's token
+        bucket before sending. Raises ProviderError once the request cannot succeed.
+        """
+        endpoint = path.strip("/").replace("/", "_")
+        model = payload.get("model", "")
+        request_bucket, token_bucket = self._limiter(model)
+        headers = {"Authorization": f"Bearer {api_key or self.api_key}"}
+        for attempt in range(self.max_retries + 1):
+            waited = request_bucket.acquire(1) + token_bucket.acquire(tokens)
+            if waited:
+                observe_rate_limit_wait(model, waited)
+            response = None
+            try:
+                response = self.session.post(f"{self.base_url}{path}", json=payload, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                outcome, error = "connection_error", e
+            else:
+                if response.status_code == 200:
+                    record_provider_request(endpoint, "ok")
+                    return response.json()
+                outcome, error = str(response.status_code), response.text[:500]
+                if response.status_code not in RETRY_STATUS_CODES:
+                    record_provider_request(endpoint, outcome)
+                    raise ProviderError(f"{path} failed with {response.status_code}: {error}", response.status_code)
+            record_provider_request(endpoint, outcome)
+            if attempt == self.max_retries:
+                break
+            delay = retry_delay(attempt, response)
+            logger.warning(f"{path} failed ({outcome}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            self.retries += 1
+            time.sleep(delay)
+        raise ProviderError(f"{path} failed after {self.max_retries + 1} attempts: {error}",
+                            response.status_code if response is not None else None)
+
+    def chat_completion(self, messages: List[dict], model: str, max_tokens: int, api_key: Optional[str] = None,
+                        **params) -> str:
+        """Content of the first choice of a chat completion."""
+        payload = {"model": model, "messages": messages, "max_tokens": max_tokens, **params}
+        tokens = sum(count_tokens(str(message.get("content", ""))) for message in messages) + max_tokens
+        response = self.post("/chat/completions", payload, tokens=tokens, api_key=api_key)
+        return response["choices"][0]["message"]["content"]
+
+
+def batch_by_tokens(token_counts: List[int], max_tokens: int = EMBEDDING_BATCH_TOKENS,
+                    max_inputs: int = MAX_INPUTS_PER_REQUEST) -> List[Tuple[int, int]]:
+    """[start, end) index ranges of consecutive inputs within both limits."""
+    batches, start, total = [], 0, 0
+    for i, tokens in enumerate(token_counts):
+        if i > start and (total + tokens > max_tokens or i - start >= max_inputs):
+            batches.append((start, i))
+            start, total = i, 0
+        total += tokens
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+class OpenAIEmbeddingClient(Embeddings):
+    """OpenAI embeddings through the shared ProviderClient: token-sized batches sent
+    concurrently under the rate limiter, each retried on its own, so one 429 delays a
+    batch instead of failing the build."""
+
+    def __init__(self, api_key: Optional[str] = None, model: str = OPENAI_EMBEDDING_MODEL,
+                 client: Optional["ProviderClient"] = None, concurrency: int = EMBEDDING_CONCURRENCY,
+                 batch_tokens: int = EMBEDDING_BATCH_TOKENS):
+        self.api_key = api_key
+        self.model = model
+        # Read by document_loader.embedding_model_name for index manifests.
+        self.model_id = f"openai:{model}"
+        self.client = client or get_provider_client()
+        self.concurrency = concurrency
+        self.batch_tokens = batch_tokens
+
+    def _prepare(self, text: str) -> Tuple[str, int]:
+        # Newlines degrade OpenAI embedding quality (as replaced by the OpenAI clients).
+        text = text.replace("\n", " ")
+        tokens = count_tokens(text)
+        if tokens > MAX_INPUT_TOKENS:
+            logger.warning(f"Truncating a {tokens}-token input to the model limit of {MAX_INPUT_TOKENS} tokens")
+            text = text[:int(len(text) * MAX_INPUT_TOKENS / tokens)]
+            tokens = count_tokens(text)
+        return text, tokens
+
+    def _embed_batch(self, texts: List[str], tokens: int) -> List[List[float]]:
+        response = self.client.post("/embeddings", {"model": self.model, "input": texts}, tokens=tokens, api_key=self.api_key)
+        return [item["embedding"] for item in sorted(response["data"], key=lambda item: item["index"])]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        prepared = [self._prepare(text) for text in texts]
+        token_counts = [tokens for _, tokens in prepared]
+        batches = batch_by_tokens(token_counts, self.batch_tokens)
+        inputs = [([text for text, _ in prepared[start:end]], sum(token_counts[start:end])) for start, end in batches]
+        if len(inputs) == 1 or self.concurrency <= 1:
+            results = [self._embed_batch(*batch) for batch in inputs]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(inputs)), thread_name_prefix="embedding") as pool:
+                results = list(pool.map(lambda batch: self._embed_batch(*batch), inputs))
+        return [vector for batch in results for vector in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        text, tokens = self._prepare(text)
+        return self._embed_batch([text], tokens)[0]
+
+
+_provider_client: Optional[ProviderClient] = None
+_provider_client_lock = threading.Lock()
+
+
+def get_provider_client() -> ProviderClient:
+    """The process-wide client for OPENAI_BASE_URL; callers pass their own API key."""
+    global _provider_client
+    if _provider_client is None:
+        with _provider_client_lock:
+            if _provider_client is None:
+                _provider_client = ProviderClient()
+    return _provider_client
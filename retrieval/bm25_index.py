@@ -0,0 +1,171 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from retrieval.chunk_store import ChunkStore, chunk_store_exists
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+BM25_DIR = "bm25"
+META_FILE = "meta.json"
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+# Codes such as "CS-101", "051-111-2222" or "SKU.4410" are also indexed as one
+# joined token so that "cs101" matches "CS-101".
+COMPOUND_PATTERN = re.compile(r"\w+(?:[-./]\w+)+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens plus joined forms of hyphen/dot/slash separated codes."""
+    text = text.lower()
+    tokens = TOKEN_PATTERN.findall(text)
+    for compound in COMPOUND_PATTERN.findall(text):
+        tokens.append(re.sub(r"[-./]", "", compound))
+    return tokens
+
+
+def build_bm25_index(chunks: List[Document], directory: str, k1: float = 1.5, b: float = 0.75) -> None:
+    """Build an on-disk BM25 inverted index over the chunks, in chunk order.
+
+    Layout (all arrays are plain .npy files so they can be memory-mapped):
+      terms.bin / term_offsets.npy   sorted vocabulary as one utf-8 blob
+      postings_ptr.npy               start of each term's postings
+      postings_doc.npy               chunk indices, grouped by term
+      postings_tf.npy                term frequencies, parallel to postings_doc
+      doc_norm.npy                   k1 * (1 - b + b * len / avgdl) per chunk
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    doc_lengths = np.zeros(len(chunks), dtype=np.float32)
+    for doc_index, chunk in enumerate(chunks):
+        counts = Counter(tokenize(chunk.page_content))
+        doc_lengths[doc_index] = sum(counts.values())
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc_index, tf))
+
+    vocabulary = sorted(postings, key=lambda term: term.encode("utf-8"))
+    encoded_terms = [term.encode("utf-8") for term in vocabulary]
+
+    term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    postings_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    for i, term in enumerate(vocabulary):
+        term_offsets[i + 1] = term_offsets[i] + len(encoded_terms[i])
+        postings_ptr[i + 1] = postings_ptr[i] + len(postings[term])
+
+    postings_doc = np.empty(int(postings_ptr[-1]), dtype=np.int32)
+    postings_tf = np.empty(int(postings_ptr[-1]), dtype=np.uint16)
+    for i, term in enumerate(vocabulary):
+        entries = postings[term]
+        start = int(postings_ptr[i])
+        postings_doc[start:start + len(entries)] = [doc for doc, _ in entries]
+        postings_tf[start:start + len(entries)] = [min(tf, 65535) for _, tf in entries]
+
+    avgdl = float(doc_lengths.mean()) if len(chunks) else 0.0
+    doc_norm = (k1 * (1 - b + b * doc_lengths / avgdl)).astype(np.float32) if avgdl else np.full(len(chunks), k1, dtype=np.float32)
+
+    with open(os.path.join(directory, "terms.bin"), "wb") as f:
+        f.write(b"".join(encoded_terms))
+    np.save(os.path.join(directory, "term_offsets.npy"), term_offsets)
+    np.save(os.path.join(directory, "postings_ptr.npy"), postings_ptr)
+    np.save(os.path.join(directory, "postings_doc.npy"), postings_doc)
+    np.save(os.path.join(directory, "postings_tf.npy"), postings_tf)
+    np.save(os.path.join(directory, "doc_norm.npy"), doc_norm)
+    with open(os.path.join(directory, META_FILE), "w") as f:
+        json.dump({"num_docs": len(chunks), "num_terms": len(vocabulary), "avgdl": avgdl, "k1": k1, "b": b}, f)
+
+    logger.info(f"BM25 index built with {len(vocabulary)} terms over {len(chunks)} chunks at: {directory}")
+
+
+class BM25Index:
+    """Memory-mapped BM25 index. Chunk texts are read from the chunk store next to it."""
+
+    def __init__(self, directory: str, chunks: ChunkStore):
+        with open(os.path.join(directory, META_FILE), "r") as f:
+            meta = json.load(f)
+        self.num_docs = meta["num_docs"]
+        self.num_terms = meta["num_terms"]
+        self.k1 = meta["k1"]
+        self.chunks = chunks
+
+        terms_path = os.path.join(directory, "terms.bin")
+        self.terms = np.memmap(terms_path, dtype=np.uint8, mode="r") if os.path.getsize(terms_path) else np.zeros(0, dtype=np.uint8)
+        self.term_offsets = np.load(os.path.join(directory, "term_offsets.npy"), mmap_mode="r")
+        self.postings_ptr = np.load(os.path.join(directory, "postings_ptr.npy"), mmap_mode="r")
+        self.postings_doc = np.load(os.path.join(directory, "postings_doc.npy"), mmap_mode="r")
+        self.postings_tf = np.load(os.path.join(directory, "postings_tf.npy"), mmap_mode="r")
+        self.doc_norm = np.load(os.path.join(directory, "doc_norm.npy"), mmap_mode="r")
+
+    def _term_at(self, i: int) -> bytes:
+        return self.terms[int(self.term_offsets[i]):int(self.term_offsets[i + 1])].tobytes()
+
+    def _lookup(self, term: str) -> int:
+        """Binary search the sorted vocabulary blob; returns -1 for unknown terms."""
+        key = term.encode("utf-8")
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.num_terms and self._term_at(lo) == key:
+            return lo
+        return -1
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Return up to k (chunk index, score) pairs, best first."""
+        scores = None
+        for term in set(tokenize(query)):
+            term_id = self._lookup(term)
+            if term_id < 0:
+                continue
+            start, end = int(self.postings_ptr[term_id]), int(self.postings_ptr[term_id + 1])
+            docs = self.postings_doc[start:end]
+            tf = self.postings_tf[start:end].astype(np.float32)
+            df = end - start
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+            if scores is None:
+                scores = np.zeros(self.num_docs, dtype=np.float32)
+            # Each chunk appears at most once per term, so fancy-index add is safe.
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self.doc_norm[docs])
+
+        if scores is None:
+            return []
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), float(scores[i])) for i in ranked]
+
+    def search_documents(self, query: str, k: int = 10) -> List[Document]:
+        return self.chunks.get_many(i for i, _ in self.search(query, k))
+
+
+def load_bm25_index(persist_directory: str) -> Optional[BM25Index]:
+    """Open the BM25 index stored alongside a vector database, if it has one."""
+    index_directory = os.path.join(persist_directory, BM25_DIR)
+    if not os.path.exists(os.path.join(index_directory, META_FILE)) or not chunk_store_exists(persist_directory):
+        return None
+    try:
+        return BM25Index(index_directory, ChunkStore(persist_directory))
+    except Exception as e:
+        logger.warning(f"Failed to open BM25 index at {index_directory}: {e}")
+        return None
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[Hashable]], k: int = 60) -> List[Tuple[Hashable, float]]:
+    """Merge several best-first rankings with reciprocal-rank fusion."""
+    fused: Dict[Hashable, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
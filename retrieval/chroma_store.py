@@ -0,0 +1,79 @@
+import os
+import threading
+from typing import TYPE_CHECKING, Optional
+
+import logging
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+logger = logging.getLogger(__name__)
+
+# "per_directory": one Chroma store per bot directory (original layout).
+# "shared": one long-lived persistent client, one collection per bot.
+CHROMA_STORAGE_MODE = os.getenv('CHROMA_STORAGE_MODE', 'per_directory')
+SHARED_CHROMA_PATH = os.getenv('SHARED_CHROMA_PATH', os.path.join("vector_db_storage", "_shared_chroma"))
+# Upper bound for segments (HNSW indexes and their file handles) the shared client
+# keeps open; least recently used collections are unloaded beyond it.
+SHARED_CHROMA_MEMORY_LIMIT_MB = int(os.getenv('SHARED_CHROMA_MEMORY_LIMIT_MB', '512'))
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def shared_chroma_client(path: str):
+    """Open a persistent Chroma client with the shared store's settings at path."""
+    # chromadb is only imported once a shared collection is used
+    import chromadb
+    from chromadb.config import Settings
+
+    os.makedirs(path, exist_ok=True)
+    client = chromadb.PersistentClient(
+        path=path,
+        settings=Settings(
+            anonymized_telemetry=False,
+            is_persistent=True,
+            chroma_segment_cache_policy="LRU",
+            chroma_memory_limit_bytes=SHARED_CHROMA_MEMORY_LIMIT_MB * 1024 * 1024,
+        ),
+    )
+    logger.info(f"Shared Chroma client opened at: {path}")
+    return client
+
+
+def get_shared_chroma_client():
+    """Return the process-wide persistent Chroma client, creating it on first use."""
+    global _shared_client
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = shared_chroma_client(SHARED_CHROMA_PATH)
+    return _shared_client
+
+
+def shared_collection_name(persist_directory: str) -> str:
+    """Collection name for a bot, derived from its storage directory (the bot_id)."""
+    return f"bot-{os.path.basename(os.path.normpath(persist_directory))}"
+
+
+def open_shared_chroma(collection_name: str, embedding_function) -> Optional["Chroma"]:
+    """Open a bot's collection on the shared client, or None if it does not exist."""
+    from langchain_chroma import Chroma
+
+    client = get_shared_chroma_client()
+    try:
+        client.get_collection(collection_name)
+    except Exception:
+        return None
+    return Chroma(client=client, collection_name=collection_name, embedding_function=embedding_function)
+
+
+def create_shared_chroma(documents, embedding, collection_name: str) -> "Chroma":
+    from langchain_chroma import Chroma
+
+    return Chroma.from_documents(
+        documents=documents,
+        embedding=embedding,
+        client=get_shared_chroma_client(),
+        collection_name=collection_name,
+    )
@@ -0,0 +1,53 @@
+import json
+import os
+from typing import List
+
+import numpy as np
+from langchain_core.documents import Document
+
+CHUNKS_FILE = "chunks.bin"
+CHUNK_OFFSETS_FILE = "chunk_offsets.npy"
+
+
+def write_chunk_store(chunks: List[Document], directory: str) -> None:
+    """Write chunk texts and metadata as one blob of JSON records plus an offsets array."""
+    os.makedirs(directory, exist_ok=True)
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    with open(os.path.join(directory, CHUNKS_FILE), "wb") as f:
+        for i, chunk in enumerate(chunks):
+            record = json.dumps(
+                {"page_content": chunk.page_content, "metadata": chunk.metadata},
+                ensure_ascii=False,
+                default=str,
+            ).encode("utf-8")
+            f.write(record)
+            offsets[i + 1] = offsets[i] + len(record)
+    np.save(os.path.join(directory, CHUNK_OFFSETS_FILE), offsets)
+
+
+def chunk_store_exists(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, CHUNK_OFFSETS_FILE))
+
+
+class ChunkStore:
+    """Read-only, memory-mapped view over a chunk store written by write_chunk_store."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.offsets = np.load(os.path.join(directory, CHUNK_OFFSETS_FILE), mmap_mode="r")
+        blob_path = os.path.join(directory, CHUNKS_FILE)
+        if os.path.getsize(blob_path) > 0:
+            self.blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            self.blob = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, index: int) -> Document:
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        record = json.loads(self.blob[start:end].tobytes().decode("utf-8"))
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+    def get_many(self, indices) -> List[Document]:
+        return [self.get(int(i)) for i in indices]
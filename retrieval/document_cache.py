@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+import threading
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Parsed and chunked files, keyed by content hash and chunker, so an identical upload
+# (the same brochure for several bots, an unchanged crawl) is only processed once.
+DOCUMENT_CACHE_DIR = os.getenv('DOCUMENT_CACHE_DIR', os.path.join("vector_db_storage", "_document_cache"))
+DOCUMENT_CACHE_MAX_MB = int(os.getenv('DOCUMENT_CACHE_MAX_MB', '1024'))
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def sha256_file(path: str) -> str:
+    """Content hash of a file, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class DocumentCache:
+    """Chunks per (file hash, chunker) as JSON files, evicted least recently used first
+    once the directory exceeds max_bytes. Reads touch the file's mtime."""
+
+    def __init__(self, directory: str = DOCUMENT_CACHE_DIR, max_bytes: int = DOCUMENT_CACHE_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, name[:2], name + ".json")
+
+    def get(self, key: str) -> Optional[List[Document]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable document cache entry {path}: {e}")
+            return None
+        return [Document(page_content=r["page_content"], metadata=r["metadata"]) for r in records]
+
+    def put(self, key: str, documents: List[Document]) -> None:
+        """Store documents under key; failures are logged, the cache is only an optimisation."""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump([{"page_content": d.page_content, "metadata": d.metadata} for d in documents],
+                          f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+            self.evict()
+        except OSError as e:
+            logger.warning(f"Could not write document cache entry {path}: {e}")
+
+    def evict(self) -> None:
+        with self._lock:
+            entries = []
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(".json"):
+                        stat = os.stat(os.path.join(root, name))
+                        entries.append((stat.st_mtime, stat.st_size, os.path.join(root, name)))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+
+document_cache = DocumentCache()
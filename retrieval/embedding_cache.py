@@ -0,0 +1,205 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Vectors by (embedding model, chunk text hash), shared by every build on this host so
+# content seen before (re-crawled sites, re-uploaded documents) is never embedded twice.
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', os.path.join("vector_db_storage", "_embedding_cache.sqlite3"))
+# 0 disables the cache.
+EMBEDDING_CACHE_MAX_MB = int(os.getenv('EMBEDDING_CACHE_MAX_MB', '2048'))
+
+# Bound on SQL variables per statement (SQLite's default limit is 999).
+_LOOKUP_BATCH = 500
+# Eviction removes entries down to this share of the limit, so it does not run on every insert.
+_EVICT_TO = 0.9
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """SQLite store of float32 vectors keyed by (model, sha256(text)), bounded by max_bytes
+    of vector data with least-recently-used eviction."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._approx_bytes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, text_hash BLOB NOT NULL, vector BLOB NOT NULL, last_access REAL NOT NULL,"
+                " PRIMARY KEY (model, text_hash)) WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+            conn.commit()
+            self._approx_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, hashes: Sequence[bytes]) -> Dict[bytes, List[float]]:
+        """Cached vectors for the given text hashes; marks them as recently used."""
+        found: Dict[bytes, List[float]] = {}
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(hashes), _LOOKUP_BATCH):
+                batch = list(hashes[start:start + _LOOKUP_BATCH])
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for key, vector in rows:
+                    found[bytes(key)] = np.frombuffer(vector, dtype="<f4").tolist()
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, key) for key in found],
+                )
+                conn.commit()
+        return found
+
+    def put_many(self, model: str, items: Dict[bytes, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        rows = [(model, key, np.asarray(vector, dtype="<f4").tobytes(), now) for key, vector in items.items()]
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_access) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+            self._approx_bytes += sum(len(row[2]) for row in rows)
+            if self._approx_bytes > self.max_bytes:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # Other processes write to the same file, so the running total is re-read before deleting.
+        total = conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+        target = int(self.max_bytes * _EVICT_TO)
+        removed = 0
+        while total > target:
+            rows = conn.execute(
+                "SELECT model, text_hash, LENGTH(vector) FROM embeddings ORDER BY last_access LIMIT 1000"
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for model, key, size in rows:
+                if total <= target:
+                    break
+                victims.append((model, key))
+                total -= size
+            conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", victims)
+            removed += len(victims)
+        conn.commit()
+        self._approx_bytes = total
+        logger.info(f"Embedding cache evicted {removed} entries, {total / 1024 / 1024:.1f}MB remain")
+
+    def record(self, hits: int, misses: int) -> None:
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def stats(self) -> dict:
+        with self._lock:
+            conn = self._connection()
+            entries, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves embed_documents from an EmbeddingCache and only sends
+    texts it has not seen for this model to the wrapped embedder. Queries are not cached."""
+
+    def __init__(self, embeddings: Embeddings, model_id: str, cache: "EmbeddingCache", namespace: Optional[str] = None):
+        self.embeddings = embeddings
+        # Read by document_loader.embedding_model_name, so manifests name the wrapped model.
+        self.model_id = model_id
+        # Cache key of the vectors; differs from model_id for backends with approximate
+        # vectors of the same model (int8 ONNX), so they are not mixed with exact ones.
+        self.namespace = namespace or model_id
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(text) for text in texts]
+        try:
+            cached = self.cache.get_many(self.namespace, hashes)
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding cache unavailable, embedding all texts: {e}")
+            return self.embeddings.embed_documents(texts)
+
+        # Each distinct missing text is embedded once, even if it repeats within the batch.
+        missing: Dict[bytes, str] = {}
+        for key, text in zip(hashes, texts):
+            if key not in cached:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            try:
+                self.cache.put_many(self.namespace, computed)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not store embeddings in cache: {e}")
+            cached.update(computed)
+
+        hits = len(texts) - sum(1 for key in hashes if key in missing)
+        self.hits += hits
+        self.misses += len(texts) - hits
+        self.cache.record(hits, len(texts) - hits)
+        return [cached[key] for key in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """The process-wide embedding cache, or None when EMBEDDING_CACHE_MAX_MB is 0."""
+    global _embedding_cache
+    if EMBEDDING_CACHE_MAX_MB <= 0:
+        return None
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = EmbeddingCache()
+    return _embedding_cache
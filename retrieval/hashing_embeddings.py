@@ -0,0 +1,46 @@
+"""Deterministic hashing embeddings, selected with EMBEDDINGS_PROVIDER=fake.
+
+Used by load tests against a running app and by the offline benchmarks, so
+they need neither a model download nor an API key.
+"""
+import hashlib
+import re
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=200000)
+def _token_vector(token: str, dimension: int) -> np.ndarray:
+    seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic, offline embedding model for load tests and benchmarks.
+
+    Each token maps to a fixed pseudo-random vector and a text embeds to the
+    normalised sum, so texts sharing words get similar vectors (semantic chunking
+    and retrieval behave plausibly) while results are identical across runs.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self.model_id = f"fake:hashing-{dimension}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            vector += _token_vector(token, self.dimension)
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
@@ -0,0 +1,267 @@
+"""Local sentence embeddings (all-MiniLM-L6-v2) without an OpenAI key.
+
+LOCAL_EMBEDDING_BACKEND selects the runtime:
+
+- "torch" (default): HuggingFaceEmbeddings, sentence-transformers on PyTorch;
+- "onnx": the model's ONNX export on onnxruntime with all graph optimisations
+  (operator fusion, constant folding) applied when the session is created;
+- "onnx-int8": the dynamically int8-quantised export matching the CPU's
+  instruction set (AVX512-VNNI, AVX2 or ARM64), about 4x smaller and faster
+  with vectors within ~0.01 cosine of the float model.
+
+The ONNX backends produce the same vectors as sentence-transformers (mean
+pooling of the last hidden state, truncation at the model's max_seq_length,
+L2 normalisation), so they keep the "huggingface:<model>" manifest name and
+indexes built with one backend are queried with another.
+benchmarks/bench_local_embeddings.py compares their throughput and similarity.
+
+Model files come from the sentence-transformers/<model> Hugging Face repository
+(cached by huggingface_hub), or from LOCAL_EMBEDDING_MODEL_DIR on nodes without
+network access. ONNX inference uses LOCAL_EMBEDDING_THREADS intra-op threads
+(default: the CPUs this process may run on, not the host's, which onnxruntime
+would otherwise use inside containers). Documents are embedded in batches of
+similar length so little compute goes to padding; concurrent queries are
+batched into one inference call while the previous one runs.
+"""
+import json
+import os
+import platform
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+LOCAL_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+LOCAL_EMBEDDING_BACKEND = os.getenv('LOCAL_EMBEDDING_BACKEND', 'torch')
+LOCAL_EMBEDDING_MODEL_DIR = os.getenv('LOCAL_EMBEDDING_MODEL_DIR')
+# 0: one thread per CPU available to this process.
+LOCAL_EMBEDDING_THREADS = int(os.getenv('LOCAL_EMBEDDING_THREADS', '0'))
+# Bounds of one ONNX inference call, in texts and in padded tokens.
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv('LOCAL_EMBEDDING_BATCH_SIZE', '32'))
+LOCAL_EMBEDDING_BATCH_TOKENS = int(os.getenv('LOCAL_EMBEDDING_BATCH_TOKENS', '8192'))
+
+LOCAL_EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+HUB_ORGANISATION = "sentence-transformers"
+ONNX_MODEL_FILE = "onnx/model.onnx"
+# Quantised exports published with the model, by instruction set.
+INT8_MODEL_FILES = {
+    "avx512_vnni": "onnx/model_qint8_avx512_vnni.onnx",
+    "avx2": "onnx/model_quint8_avx2.onnx",
+    "arm64": "onnx/model_qint8_arm64.onnx",
+}
+# sentence-transformers' max_seq_length when the model does not configure one.
+DEFAULT_MAX_SEQ_LENGTH = 256
+
+
+def available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def local_cache_namespace(model_name: str = LOCAL_EMBEDDING_MODEL, backend: Optional[str] = None) -> str:
+    """Cache namespace of a backend's vectors: torch and onnx produce the same ones, int8 differs."""
+    model_id = f"huggingface:{model_name}"
+    return f"{model_id}:int8" if (backend or LOCAL_EMBEDDING_BACKEND) == "onnx-int8" else model_id
+
+
+def int8_model_file() -> str:
+    """Quantised export for this CPU: VNNI int8 dot products if available, else AVX2, or ARM64."""
+    if platform.machine().lower() in ("arm64", "aarch64"):
+        return INT8_MODEL_FILES["arm64"]
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        flags = ""
+    return INT8_MODEL_FILES["avx512_vnni" if "avx512_vnni" in flags else "avx2"]
+
+
+def model_file_path(model_name: str, filename: str, required: bool = True) -> Optional[str]:
+    """Local path of a file of the model's repository, downloaded on first use."""
+    if LOCAL_EMBEDDING_MODEL_DIR:
+        path = os.path.join(LOCAL_EMBEDDING_MODEL_DIR, filename)
+        if os.path.exists(path) or required:
+            return path
+        return None
+    from huggingface_hub import hf_hub_download
+    try:
+        return hf_hub_download(f"{HUB_ORGANISATION}/{model_name}", filename)
+    except Exception:
+        if required:
+            raise
+        return None
+
+
+def mean_pool(hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Mean of the token vectors under the mask, L2-normalised (sentence-transformers' Pooling + Normalize)."""
+    mask = attention_mask[:, :, None].astype(np.float32)
+    pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+    return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+
+def length_batches(lengths: List[int], max_batch: int, max_tokens: int) -> List[List[int]]:
+    """Indices grouped by similar length, each group within max_batch texts and
+    max_tokens padded tokens (texts x longest text)."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, batch = [], []
+    for i in order:
+        # Sorted ascending, so the new text is the longest of the batch.
+        if batch and (len(batch) >= max_batch or (len(batch) + 1) * lengths[i] > max_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class QueryBatcher:
+    """Runs embed calls of concurrent callers as one batch.
+
+    A lone query is embedded at once; queries arriving while an inference runs
+    wait for it and are then embedded together, so throughput rises with load
+    without adding latency when idle. The caller running batches hands over to a
+    waiting one as soon as its own query is done, so no request keeps serving
+    others' queries under sustained load.
+    """
+
+    def __init__(self, embed_batch, max_batch: int):
+        self._embed_batch = embed_batch
+        self._max_batch = max_batch
+        self._pending: List[Tuple[str, Future]] = []
+        self._running = False
+        self._cond = threading.Condition()
+
+    def embed(self, text: str) -> List[float]:
+        future = Future()
+        with self._cond:
+            self._pending.append((text, future))
+            while self._running and not future.done():
+                self._cond.wait()
+            if future.done():
+                return future.result()
+            self._running = True
+        # Run batches, oldest queries first, until this caller's own query is done.
+        while True:
+            with self._cond:
+                batch, self._pending = self._pending[:self._max_batch], self._pending[self._max_batch:]
+            try:
+                vectors = self._embed_batch([text for text, _ in batch])
+            except Exception as e:
+                for _, waiting in batch:
+                    waiting.set_exception(e)
+            else:
+                for (_, waiting), vector in zip(batch, vectors):
+                    waiting.set_result(vector)
+            with self._cond:
+                if future.done():
+                    # Wake the waiters: finished ones return, the first unfinished one leads.
+                    self._running = False
+                    self._cond.notify_all()
+                    break
+                self._cond.notify_all()
+        return future.result()
+
+
+class OnnxSentenceEmbeddings(Embeddings):
+    """A sentence-transformers model exported to ONNX, run on onnxruntime."""
+
+    def __init__(self, model_name: str = LOCAL_EMBEDDING_MODEL, quantized: bool = False,
+                 threads: int = LOCAL_EMBEDDING_THREADS, batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+                 batch_tokens: int = LOCAL_EMBEDDING_BATCH_TOKENS, model_file: Optional[str] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        # Same vectors as HuggingFaceEmbeddings, so indexes stay interchangeable across backends.
+        self.model_id = f"huggingface:{model_name}"
+        # int8 vectors differ slightly; keep them apart from float ones in the embedding cache.
+        self.cache_namespace = local_cache_namespace(model_name, "onnx-int8" if quantized else "onnx")
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.threads = threads or available_cpus()
+        self.model_file = model_file or (int8_model_file() if quantized else ONNX_MODEL_FILE)
+
+        self.max_seq_length = DEFAULT_MAX_SEQ_LENGTH
+        config_path = model_file_path(model_name, "sentence_bert_config.json", required=False)
+        if config_path:
+            with open(config_path) as f:
+                self.max_seq_length = json.load(f).get("max_seq_length", DEFAULT_MAX_SEQ_LENGTH)
+        self.tokenizer = Tokenizer.from_file(model_file_path(model_name, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.no_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = self.threads
+        # One inference at a time per call; parallelism comes from intra-op threads.
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        self.session = ort.InferenceSession(
+            model_file_path(model_name, self.model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+        self._query_batcher = QueryBatcher(self._embed_batch, batch_size)
+        logger.info(f"Loaded {model_name} ({self.model_file}) on onnxruntime with {self.threads} threads")
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        encodings = self.tokenizer.encode_batch(texts)
+        width = max(len(encoding.ids) for encoding in encodings)
+        input_ids = np.zeros((len(texts), width), dtype=np.int64)
+        attention_mask = np.zeros((len(texts), width), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            input_ids[row, :len(encoding.ids)] = encoding.ids
+            attention_mask[row, :len(encoding.ids)] = 1
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, inputs)[0]
+        return mean_pool(hidden, attention_mask).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        lengths = [len(encoding.ids) for encoding in self.tokenizer.encode_batch(texts)]
+        vectors: List[Optional[List[float]]] = [None] * len(texts)
+        for batch in length_batches(lengths, self.batch_size, self.batch_tokens):
+            for i, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[i] = vector
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._query_batcher.embed(text)
+
+
+_onnx_models: Dict[Tuple[str, bool], OnnxSentenceEmbeddings] = {}
+_onnx_models_lock = threading.Lock()
+
+
+def get_local_embeddings(model_name: str = LOCAL_EMBEDDING_MODEL, backend: Optional[str] = None) -> Embeddings:
+    """Local embeddings on the configured backend. ONNX sessions are loaded once per
+    process and shared; without onnxruntime, falls back to PyTorch."""
+    backend = backend or LOCAL_EMBEDDING_BACKEND
+    if backend not in LOCAL_EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown LOCAL_EMBEDDING_BACKEND {backend!r}, expected one of {LOCAL_EMBEDDING_BACKENDS}")
+    if backend != "torch":
+        key = (model_name, backend == "onnx-int8")
+        try:
+            with _onnx_models_lock:
+                if key not in _onnx_models:
+                    _onnx_models[key] = OnnxSentenceEmbeddings(model_name, quantized=key[1])
+                return _onnx_models[key]
+        except ImportError as e:
+            logger.warning(f"{backend} embeddings not available ({e}), falling back to PyTorch")
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    if LOCAL_EMBEDDING_THREADS:
+        import torch
+        torch.set_num_threads(LOCAL_EMBEDDING_THREADS)
+    return HuggingFaceEmbeddings(model_name=model_name)
@@ -0,0 +1,24 @@
+import json
+import os
+from typing import Optional
+
+MANIFEST_FILE = "index.json"
+
+
+def read_manifest(directory: str) -> Optional[dict]:
+    """Return the index manifest stored in a bot directory, or None for older bots."""
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(directory: str, manifest: dict) -> None:
+    """Write the manifest via a temporary file so readers never see a partial one."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
@@ -0,0 +1,158 @@
+"""Move per-directory Chroma bots into the shared Chroma client.
+
+Usage:
+    python -m retrieval.migrate_to_shared_chroma [--storage vector_db_storage] [--shared-chroma-path PATH]
+                                                 [--dry-run] [--delete-source]
+
+Each migrated bot keeps its directory (manifest, chunk store, BM25 index); only the
+vectors move into a "bot-<bot_id>" collection, and the manifest is rewritten so
+load_vector_database opens the shared collection. Set CHROMA_STORAGE_MODE=shared
+on the server so new bots are created the same way. Collections are written to
+--shared-chroma-path, by default $SHARED_CHROMA_PATH if set, else _shared_chroma
+inside --storage; the server's SHARED_CHROMA_PATH must name the same directory.
+"""
+import argparse
+import os
+import shutil
+import uuid
+
+import chromadb
+from chromadb.api.shared_system_client import SharedSystemClient
+from chromadb.config import Settings
+
+from retrieval.chroma_store import shared_chroma_client, shared_collection_name
+from retrieval.manifest import read_manifest, write_manifest
+from retrieval.storage import iter_bot_directories
+
+import logging
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+CHROMA_SQLITE_FILE = "chroma.sqlite3"
+LANGCHAIN_COLLECTION = "langchain"
+BATCH_SIZE = 1000
+
+# Bots created before manifests existed: infer the model from the vector size.
+MODELS_BY_DIMENSION = {
+    1536: "openai:text-embedding-ada-002",
+    384: "huggingface:all-MiniLM-L6-v2",
+}
+
+
+def _is_uuid(name: str) -> bool:
+    try:
+        uuid.UUID(name)
+        return True
+    except ValueError:
+        return False
+
+
+def _close_client(client) -> None:
+    """Stop a client's system, closing its SQLite connections and segment files.
+
+    chromadb caches one system per path for the life of the process, so dropping
+    the client object leaves the files open; clear_system_cache() is no help, as
+    it would also detach the shared client.
+    """
+    client._system.stop()
+    SharedSystemClient._identifier_to_system.pop(client._identifier, None)
+
+
+def migrate_bot(bot_directory: str, shared_client, dry_run: bool = False, delete_source: bool = False) -> bool:
+    """Copy one per-directory store into shared_client. Returns True if migrated."""
+    manifest = read_manifest(bot_directory) or {}
+    if manifest.get("backend") == "numpy" or manifest.get("chroma_mode") == "shared":
+        return False
+    if not os.path.exists(os.path.join(bot_directory, CHROMA_SQLITE_FILE)):
+        return False
+
+    source_client = chromadb.PersistentClient(path=bot_directory, settings=Settings(anonymized_telemetry=False))
+    try:
+        migrated = _copy_collection(source_client, bot_directory, manifest, shared_client, dry_run)
+    finally:
+        _close_client(source_client)
+
+    if migrated and delete_source:
+        os.remove(os.path.join(bot_directory, CHROMA_SQLITE_FILE))
+        for name in os.listdir(bot_directory):
+            if _is_uuid(name) and os.path.isdir(os.path.join(bot_directory, name)):
+                shutil.rmtree(os.path.join(bot_directory, name))
+    return migrated
+
+
+def _copy_collection(source_client, bot_directory: str, manifest: dict, shared_client, dry_run: bool) -> bool:
+    source = source_client.get_collection(LANGCHAIN_COLLECTION)
+    count = source.count()
+    collection_name = shared_collection_name(bot_directory)
+    logger.info(f"{bot_directory}: {count} vectors -> {collection_name}")
+    if dry_run:
+        return False
+
+    try:
+        # Leftover from an interrupted run.
+        shared_client.delete_collection(collection_name)
+    except Exception:
+        pass
+    target = shared_client.create_collection(collection_name, metadata=source.metadata)
+
+    dimension = None
+    for offset in range(0, count, BATCH_SIZE):
+        batch = source.get(offset=offset, limit=BATCH_SIZE, include=["embeddings", "documents", "metadatas"])
+        if len(batch["ids"]) == 0:
+            break
+        dimension = dimension or len(batch["embeddings"][0])
+        target.add(
+            ids=batch["ids"],
+            embeddings=batch["embeddings"],
+            documents=batch["documents"],
+            metadatas=batch["metadatas"],
+        )
+
+    if target.count() != count:
+        shared_client.delete_collection(collection_name)
+        raise RuntimeError(f"Copied {target.count()} of {count} vectors for {bot_directory}")
+
+    embedding_model = manifest.get("embedding_model") or MODELS_BY_DIMENSION.get(dimension)
+    if embedding_model is None:
+        shared_client.delete_collection(collection_name)
+        raise RuntimeError(f"Cannot infer embedding model for {bot_directory} (dimension {dimension})")
+
+    write_manifest(bot_directory, {
+        **manifest,
+        "backend": "chroma",
+        "chroma_mode": "shared",
+        "collection": collection_name,
+        "embedding_model": embedding_model,
+        "count": count,
+    })
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate per-directory Chroma bots into the shared Chroma client.")
+    parser.add_argument("--storage", default="vector_db_storage")
+    parser.add_argument("--shared-chroma-path",
+                        help="Shared Chroma directory (default: $SHARED_CHROMA_PATH, else <storage>/_shared_chroma)")
+    parser.add_argument("--dry-run", action="store_true", help="Only list what would be migrated")
+    parser.add_argument("--delete-source", action="store_true", help="Remove the per-directory Chroma files afterwards")
+    args = parser.parse_args()
+
+    shared_path = (args.shared_chroma_path or os.getenv('SHARED_CHROMA_PATH')
+                   or os.path.join(args.storage, "_shared_chroma"))
+    shared_client = None if args.dry_run else shared_chroma_client(shared_path)
+
+    migrated, failed = 0, 0
+    for _, bot_directory in sorted(iter_bot_directories(args.storage)):
+        try:
+            if migrate_bot(bot_directory, shared_client, dry_run=args.dry_run, delete_source=args.delete_source):
+                migrated += 1
+        except Exception as e:
+            failed += 1
+            logger.error(f"Failed to migrate {bot_directory}: {e}")
+
+    logger.info(f"Migrated {migrated} bots, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
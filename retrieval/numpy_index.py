@@ -0,0 +1,165 @@
+import os
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from retrieval.chunk_store import ChunkStore
+from retrieval.manifest import read_manifest, write_manifest
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+EMBEDDINGS_FILE = "embeddings.npy"
+QUANTIZED_FILE = "embeddings_q.npy"
+SCALES_FILE = "embeddings_scale.npy"
+
+QUANTIZATION_MODES = ("float32", "float16", "int8")
+# Quantised matrices are upcast block by block so a query never materialises a
+# full float32 copy of the bot.
+SCORE_BLOCK_ROWS = 4096
+# With re-ranking, this many candidates per requested result are rescored in float32.
+RERANK_FACTOR = 4
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize(matrix: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Scalar-quantise normalised rows. int8 uses a symmetric per-row scale."""
+    if quantization == "float16":
+        return matrix.astype(np.float16), None
+    if quantization == "int8":
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return quantized, scales.astype(np.float32)
+    raise ValueError(f"Unsupported quantization: {quantization}")
+
+
+def build_numpy_index(vectors: Sequence[Sequence[float]], directory: str, embedding_model: str,
+                      quantization: str = "float32", rerank: bool = True) -> None:
+    """Store L2-normalised embeddings as one contiguous matrix plus a manifest.
+
+    With float16/int8 quantization the quantised matrix is the one searched; if
+    rerank is set the float32 matrix is kept on disk to rescore the top candidates.
+    The chunk store for the same chunks must be written to the same directory.
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unsupported quantization: {quantization}")
+
+    matrix = normalize_rows(np.asarray(vectors, dtype=np.float32))
+    os.makedirs(directory, exist_ok=True)
+    rerank = rerank and quantization != "float32"
+    if quantization == "float32" or rerank:
+        np.save(os.path.join(directory, EMBEDDINGS_FILE), np.ascontiguousarray(matrix))
+    if quantization != "float32":
+        quantized, scales = quantize(matrix, quantization)
+        np.save(os.path.join(directory, QUANTIZED_FILE), quantized)
+        if scales is not None:
+            np.save(os.path.join(directory, SCALES_FILE), scales)
+
+    write_manifest(directory, {
+        "backend": "numpy",
+        "embedding_model": embedding_model,
+        "dimension": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "count": int(matrix.shape[0]),
+        "quantization": quantization,
+        "rerank": rerank,
+    })
+    logger.info(f"NumPy index built with {matrix.shape[0]} {quantization} vectors at: {directory}")
+
+
+def read_vectors(directory: str) -> np.ndarray:
+    """float32 rows of an index: the stored float32 matrix (memory-mapped), or the
+    quantised one upcast if the index was built without it."""
+    path = os.path.join(directory, EMBEDDINGS_FILE)
+    if os.path.exists(path):
+        return np.load(path, mmap_mode="r")
+    matrix = np.load(os.path.join(directory, QUANTIZED_FILE)).astype(np.float32)
+    scales_path = os.path.join(directory, SCALES_FILE)
+    if os.path.exists(scales_path):
+        matrix *= np.load(scales_path)[:, None]
+    return matrix
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class NumpyVectorIndex:
+    """Exact cosine-similarity search over a memory-mapped embedding matrix.
+
+    Exposes the subset of the Chroma interface used by query_vector_database, so
+    either can sit in vector_db_cache. Quantised indexes score against the
+    float16/int8 matrix and, when built with rerank, rescore the top candidates
+    against the float32 rows (only those pages of the float32 file are touched).
+    """
+
+    def __init__(self, directory: str, embedding_function: Embeddings):
+        self.directory = directory
+        self.embedding_function = embedding_function
+        manifest = read_manifest(directory) or {}
+        self.quantization = manifest.get("quantization", "float32")
+        self.scales = None
+        self.full = None
+        if self.quantization == "float32":
+            self.matrix = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+        else:
+            self.matrix = np.load(os.path.join(directory, QUANTIZED_FILE), mmap_mode="r")
+            if self.quantization == "int8":
+                self.scales = np.load(os.path.join(directory, SCALES_FILE))
+            if manifest.get("rerank"):
+                self.full = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+        self.chunks = ChunkStore(directory)
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        if self.quantization == "float32":
+            return self.matrix @ query
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), SCORE_BLOCK_ROWS):
+            block = self.matrix[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def search_by_vector(self, embedding: Sequence[float], k: int = 4, rerank: bool = True) -> List[Tuple[int, float]]:
+        """Return up to k (chunk index, cosine similarity) pairs, best first."""
+        if len(self) == 0:
+            return []
+        query = np.array(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = self._scores(query)
+
+        if self.full is None or not rerank:
+            return [(int(i), float(scores[i])) for i in top_k(scores, k)]
+
+        candidates = np.sort(top_k(scores, k * RERANK_FACTOR))
+        exact = self.full[candidates] @ query
+        return [(int(candidates[i]), float(exact[i])) for i in top_k(exact, k)]
+
+    def similarity_search_by_vector_with_score(self, embedding: Sequence[float], k: int = 4) -> List[Tuple[Document, float]]:
+        return [(self.chunks.get(i), score) for i, score in self.search_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embedding_function.embed_query(query), k)
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """Same as similarity_search_with_score: cosine similarity is already a relevance score."""
+        return self.similarity_search_with_score(query, k)
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
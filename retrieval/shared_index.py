@@ -0,0 +1,283 @@
+"""Index coordinator for multi-worker serving.
+
+One coordinator process per node copies the files of NumPy-backed bots (embedding
+matrix, chunk store, BM25 index) into shared memory (/dev/shm) and owns their
+eviction under a node-wide memory budget. Workers ask it for a bot and memory-map
+the shared copy, so every worker reads the same physical pages: a hot bot costs
+its size once per node instead of once per worker, and is loaded from storage once.
+
+Chroma-backed bots are not shared; workers keep loading those themselves.
+
+The coordinator is started by serve_workers.py, which passes its address and
+authentication key to the workers in INDEX_COORDINATOR_ADDRESS and
+INDEX_COORDINATOR_AUTHKEY.
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional, Tuple
+
+from retrieval.manifest import MANIFEST_FILE, read_manifest
+from retrieval.storage import STORAGE_ROOT, bot_storage_path, index_directory
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+SHARED_INDEX_DIR = os.getenv(
+    'SHARED_INDEX_DIR',
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "website-assistant-indexes"),
+)
+SHARED_INDEX_MEMORY_MB = int(os.getenv('SHARED_INDEX_MEMORY_MB', '2048'))
+INDEX_COORDINATOR_ADDRESS = os.getenv('INDEX_COORDINATOR_ADDRESS')
+INDEX_COORDINATOR_AUTHKEY = os.getenv('INDEX_COORDINATOR_AUTHKEY', '')
+
+# How long a worker uses a bot it has mapped before confirming it with the coordinator.
+SHARED_INDEX_REFRESH_SECONDS = float(os.getenv('SHARED_INDEX_REFRESH_SECONDS', '1'))
+
+# Evictions remembered for workers that have not asked in a while; older workers reset.
+EVICTION_LOG_SIZE = 10000
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+class _SharedBot:
+    def __init__(self, path: str, size: int, source_mtime: float):
+        self.path = path
+        self.size = size
+        self.source_mtime = source_mtime
+
+
+class IndexCoordinator:
+    """Loads bots into shared memory on first request and evicts the least recently
+    requested ones beyond max_bytes. Workers learn about evictions through a sequence
+    number sent with every request, and drop their mappings of evicted bots."""
+
+    def __init__(self, storage_dir: str = STORAGE_ROOT, shared_dir: str = SHARED_INDEX_DIR,
+                 max_bytes: int = SHARED_INDEX_MEMORY_MB * 1024 * 1024):
+        self.storage_dir = storage_dir
+        self.shared_dir = shared_dir
+        self.max_bytes = max_bytes
+        self.bots: "OrderedDict[str, _SharedBot]" = OrderedDict()
+        self.used_bytes = 0
+        self.sequence = 0
+        self.evictions = deque(maxlen=EVICTION_LOG_SIZE)
+        self.loads = 0
+        self._lock = threading.Lock()
+        self._loading: Dict[str, threading.Event] = {}
+        shutil.rmtree(shared_dir, ignore_errors=True)
+        os.makedirs(shared_dir, exist_ok=True)
+
+    def _evict_locked(self, bot_id: str) -> None:
+        bot = self.bots.pop(bot_id)
+        self.used_bytes -= bot.size
+        self.sequence += 1
+        self.evictions.append((self.sequence, bot_id))
+        # Workers still mapping the files keep their pages until they unmap; the
+        # memory is returned once the last one drops the bot.
+        shutil.rmtree(bot.path, ignore_errors=True)
+
+    def _source(self, bot_id: str) -> Tuple[Optional[str], Optional[float]]:
+        try:
+            source = bot_storage_path(bot_id, self.storage_dir)
+            return source, os.stat(os.path.join(source, MANIFEST_FILE)).st_mtime
+        except (ValueError, OSError):
+            return None, None
+
+    def acquire(self, bot_id: str) -> Optional[str]:
+        """Shared-memory directory of a NumPy bot, loading it if needed; None if the bot
+        cannot be shared (missing, Chroma-backed or larger than the budget)."""
+        source, mtime = self._source(bot_id)
+        if mtime is None:
+            return None
+        while True:
+            with self._lock:
+                bot = self.bots.get(bot_id)
+                if bot is not None and bot.source_mtime == mtime:
+                    self.bots.move_to_end(bot_id)
+                    return bot.path
+                if bot is not None:
+                    # The bot was rebuilt since it was loaded.
+                    self._evict_locked(bot_id)
+                loading = self._loading.get(bot_id)
+                if loading is None:
+                    loading = self._loading[bot_id] = threading.Event()
+                    break
+            # Another worker's request is loading this bot; wait for it instead of loading twice.
+            loading.wait()
+        try:
+            return self._load(bot_id, source, mtime)
+        finally:
+            with self._lock:
+                self._loading.pop(bot_id).set()
+
+    def _load(self, bot_id: str, source: str, mtime: float) -> Optional[str]:
+        manifest = read_manifest(source) or {}
+        if manifest.get('backend') != 'numpy':
+            return None
+        # Bots updated in place share their current index version only.
+        source = index_directory(source)
+        size = directory_size(source)
+        if size > self.max_bytes:
+            logger.warning(f"Bot {bot_id} ({size / 1024 / 1024:.0f}MB) exceeds the shared index budget, not sharing it")
+            return None
+
+        with self._lock:
+            while self.bots and self.used_bytes + size > self.max_bytes:
+                self._evict_locked(next(iter(self.bots)))
+            # Reserve the space now so concurrent loads of other bots respect the budget.
+            self.used_bytes += size
+
+        start = time.perf_counter()
+        target = os.path.join(self.shared_dir, f"{bot_id}.{time.time_ns()}")
+        try:
+            shutil.copytree(source, target + ".tmp")
+            os.rename(target + ".tmp", target)
+        except Exception as e:
+            logger.error(f"Error copying bot {bot_id} into shared memory: {e}")
+            shutil.rmtree(target + ".tmp", ignore_errors=True)
+            with self._lock:
+                self.used_bytes -= size
+            return None
+
+        with self._lock:
+            self.bots[bot_id] = _SharedBot(target, size, mtime)
+            self.loads += 1
+        logger.info(f"Bot {bot_id} loaded into shared memory ({size / 1024 / 1024:.1f}MB, {time.perf_counter() - start:.2f}s)")
+        return target
+
+    def evictions_since(self, sequence: int) -> Tuple[int, List[str], bool]:
+        """(current sequence, bots evicted after sequence, whether the worker must drop everything)."""
+        with self._lock:
+            if sequence > self.sequence:
+                # The worker talked to an earlier coordinator.
+                return self.sequence, [], True
+            if self.evictions and sequence < self.evictions[0][0] - 1:
+                return self.sequence, [], True
+            return self.sequence, [bot_id for seq, bot_id in self.evictions if seq > sequence], False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "bots": len(self.bots),
+                "used_bytes": self.used_bytes,
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "evictions": self.sequence,
+            }
+
+    def handle(self, connection) -> None:
+        """Serve one worker connection until it closes."""
+        try:
+            while True:
+                request = connection.recv()
+                if request[0] == "acquire":
+                    _, bot_id, sequence = request
+                    path = self.acquire(bot_id)
+                    current, evicted, reset = self.evictions_since(sequence)
+                    connection.send({"path": path, "sequence": current, "evicted": evicted, "reset": reset})
+                elif request[0] == "stats":
+                    connection.send(self.stats())
+                else:
+                    connection.send({"error": f"unknown request {request[0]!r}"})
+        except (EOFError, ConnectionError):
+            pass
+        finally:
+            connection.close()
+
+    def serve_forever(self, address: str, authkey: bytes) -> None:
+        if os.path.exists(address):
+            os.remove(address)
+        with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+            logger.info(f"Index coordinator listening on {address}, budget {self.max_bytes / 1024 / 1024:.0f}MB in {self.shared_dir}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    # Failed handshakes (wrong key, client gone) must not stop the coordinator.
+                    logger.warning(f"Rejected index coordinator connection: {e}")
+                    continue
+                threading.Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+
+def run_coordinator(address: str, authkey: bytes, storage_dir: str = STORAGE_ROOT) -> None:
+    """Process entry point used by serve_workers.py."""
+    logging.basicConfig(level=logging.INFO)
+    coordinator = IndexCoordinator(storage_dir)
+    try:
+        coordinator.serve_forever(address, authkey)
+    finally:
+        shutil.rmtree(coordinator.shared_dir, ignore_errors=True)
+
+
+class SharedIndexClient:
+    """Worker side: one connection to the coordinator per request thread, so a slow
+    load of one bot does not hold up queries for others.
+
+    Bots already mapped are served without asking the coordinator for
+    SHARED_INDEX_REFRESH_SECONDS; the next request after that asks again, which keeps
+    the coordinator's recency order current and brings news of evictions and
+    rebuilds. Any coordinator failure makes acquire return None, so the worker falls
+    back to loading bots from storage itself instead of failing queries.
+    """
+
+    def __init__(self, address: str, authkey: bytes, refresh_seconds: float = SHARED_INDEX_REFRESH_SECONDS):
+        self.address = address
+        self.authkey = authkey
+        self.refresh_seconds = refresh_seconds
+        self.sequence = 0
+        # bot_id -> (shared directory, when the coordinator last confirmed it)
+        self._mapped: Dict[str, Tuple[str, float]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def acquire(self, bot_id: str) -> Tuple[Optional[str], List[str], bool]:
+        """(shared directory or None, bots to drop from local caches, drop everything)."""
+        mapped = self._mapped.get(bot_id)
+        # The directory check catches evictions not heard of yet when a bot must be reloaded.
+        if mapped is not None and time.monotonic() - mapped[1] < self.refresh_seconds and os.path.isdir(mapped[0]):
+            return mapped[0], [], False
+
+        connection = getattr(self._local, "connection", None)
+        try:
+            if connection is None:
+                connection = self._local.connection = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            connection.send(("acquire", bot_id, self.sequence))
+            reply = connection.recv()
+        except Exception as e:
+            logger.warning(f"Index coordinator unavailable, loading {bot_id} locally: {e}")
+            if connection is not None:
+                connection.close()
+            self._local.connection = None
+            return None, [], False
+
+        with self._lock:
+            if reply["reset"]:
+                self._mapped.clear()
+            for evicted_id in reply["evicted"]:
+                self._mapped.pop(evicted_id, None)
+            if reply["path"] is None:
+                self._mapped.pop(bot_id, None)
+            else:
+                self._mapped[bot_id] = (reply["path"], time.monotonic())
+            # Replies of concurrent requests may arrive out of order; each lists the
+            # evictions after the sequence it was sent with, so keep the highest.
+            self.sequence = max(self.sequence, reply["sequence"])
+        return reply["path"], reply["evicted"], reply["reset"]
+
+
+def get_shared_index_client() -> Optional[SharedIndexClient]:
+    """A client when running under serve_workers.py, else None (single-process serving)."""
+    if not INDEX_COORDINATOR_ADDRESS:
+        return None
+    return SharedIndexClient(INDEX_COORDINATOR_ADDRESS, bytes.fromhex(INDEX_COORDINATOR_AUTHKEY))
@@ -0,0 +1,356 @@
+"""Single-file bot snapshots for moving bots between nodes and restoring them.
+
+Usage:
+    python -m retrieval.snapshot export <bot_id> <snapshot file> [--storage vector_db_storage]
+    python -m retrieval.snapshot import <snapshot file> [--bot-id <bot_id>] [--storage vector_db_storage]
+    python -m retrieval.snapshot info <snapshot file>
+
+A snapshot holds the files of a NumPy-layout bot directory (manifest, embedding
+matrix, chunk store, BM25 index) as sections of one file:
+
+    MAGIC | section | section | ... | header (JSON) | header length (uint64) | MAGIC
+
+Arrays (.npy) are stored uncompressed at 64-byte aligned offsets, so they can be
+memory-mapped straight out of the snapshot (SnapshotReader.array); texts, metadata
+and the BM25 vocabulary are zlib-compressed. Every section carries its sha256.
+
+Chroma bots are exported by reading their vectors and chunks out of Chroma, so
+every snapshot imports as a NumPy bot: importing unpacks the sections into a bot
+directory, which load_vector_database then opens by memory-mapping, without the
+embedding probe search per-directory Chroma bots need.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
+import uuid
+import zlib
+from typing import BinaryIO, Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from retrieval.bm25_index import BM25_DIR, build_bm25_index
+from retrieval.chunk_store import CHUNK_OFFSETS_FILE, CHUNKS_FILE, write_chunk_store
+from retrieval.manifest import MANIFEST_FILE, read_manifest
+from retrieval.numpy_index import EMBEDDINGS_FILE, QUANTIZED_FILE, SCALES_FILE, build_numpy_index
+from retrieval.storage import (
+    STORAGE_ROOT, bot_storage_path, index_directory, mark_build_finished, mark_build_started,
+)
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WABOTSNP"
+FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = ".wabot"
+ALIGNMENT = 64
+COPY_BLOCK_BYTES = 1024 * 1024
+# Compressed with zlib; everything else (the .npy arrays) is stored raw and aligned.
+COMPRESSED_SUFFIXES = (".bin", ".json")
+CHROMA_BATCH_SIZE = 1000
+
+# Files of a NumPy bot directory; imports reject snapshots with any other section.
+SNAPSHOT_FILES = {MANIFEST_FILE, EMBEDDINGS_FILE, QUANTIZED_FILE, SCALES_FILE, CHUNKS_FILE, CHUNK_OFFSETS_FILE}
+# Manifest keys pointing outside the bot directory (shared Chroma collections, index
+# versions); an imported manifest carrying them could expose or delete other bots' data.
+FOREIGN_MANIFEST_KEYS = ("chroma_mode", "collection", "current_version")
+
+# Chroma bots created before manifests existed: infer the model from the vector size.
+MODELS_BY_DIMENSION = {
+    1536: "openai:text-embedding-ada-002",
+    384: "huggingface:all-MiniLM-L6-v2",
+}
+
+
+class SnapshotError(Exception):
+    """A snapshot file that is truncated, corrupt or of an unknown format version."""
+
+
+def _bot_files(directory: str) -> List[str]:
+    """Files of a bot directory relative to it, manifest first, build marker excluded."""
+    names = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            relative = os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/")
+            if not name.startswith(".") and not name.endswith(".tmp"):
+                names.append(relative)
+    return sorted(names, key=lambda name: (name != MANIFEST_FILE, name))
+
+
+def _write_section(out: BinaryIO, directory: str, name: str) -> dict:
+    compression = "zlib" if name.endswith(COMPRESSED_SUFFIXES) else "none"
+    if compression == "none":
+        out.write(b"\0" * (-out.tell() % ALIGNMENT))
+    offset = out.tell()
+    size = 0
+    digest = hashlib.sha256()
+    compressor = zlib.compressobj(6) if compression == "zlib" else None
+    with open(os.path.join(directory, name), "rb") as f:
+        while True:
+            block = f.read(COPY_BLOCK_BYTES)
+            if not block:
+                break
+            size += len(block)
+            digest.update(block)
+            out.write(compressor.compress(block) if compressor else block)
+    if compressor:
+        out.write(compressor.flush())
+    return {"name": name, "offset": offset, "length": out.tell() - offset, "size": size,
+            "compression": compression, "sha256": digest.hexdigest()}
+
+
+def write_snapshot(directory: str, snapshot_path: str, bot_id: Optional[str] = None) -> dict:
+    """Pack a NumPy-layout bot directory into snapshot_path; returns the header."""
+    manifest = read_manifest(directory)
+    if not manifest or manifest.get("backend") != "numpy":
+        raise ValueError(f"{directory} is not a NumPy bot directory")
+    tmp_path = snapshot_path + ".tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(MAGIC)
+        sections = [_write_section(out, directory, name) for name in _bot_files(directory)]
+        header = json.dumps({
+            "format_version": FORMAT_VERSION,
+            "bot_id": bot_id,
+            "created_at": time.time(),
+            "manifest": manifest,
+            "sections": sections,
+        }).encode("utf-8")
+        out.write(header)
+        out.write(struct.pack("<Q", len(header)))
+        out.write(MAGIC)
+    os.replace(tmp_path, snapshot_path)
+    return json.loads(header)
+
+
+def _materialize_chroma_bot(directory: str, manifest: dict, target: str) -> None:
+    """Write a Chroma bot's vectors and chunks, in collection order, as a NumPy bot in target."""
+    import chromadb
+    from chromadb.config import Settings
+
+    if manifest.get("chroma_mode") == "shared":
+        from retrieval.chroma_store import get_shared_chroma_client
+        collection = get_shared_chroma_client().get_collection(manifest["collection"])
+    else:
+        client = chromadb.PersistentClient(path=directory, settings=Settings(anonymized_telemetry=False))
+        collection = client.get_collection("langchain")
+
+    vectors, chunks = [], []
+    count = collection.count()
+    for offset in range(0, count, CHROMA_BATCH_SIZE):
+        batch = collection.get(offset=offset, limit=CHROMA_BATCH_SIZE, include=["embeddings", "documents", "metadatas"])
+        if len(batch["ids"]) == 0:
+            break
+        vectors.extend(batch["embeddings"])
+        for text, metadata in zip(batch["documents"], batch["metadatas"]):
+            chunks.append(Document(page_content=text, metadata=metadata or {}))
+
+    embedding_model = manifest.get("embedding_model") or MODELS_BY_DIMENSION.get(len(vectors[0]) if vectors else 0)
+    if embedding_model is None:
+        raise ValueError(f"Cannot infer the embedding model of {directory}")
+    write_chunk_store(chunks, target)
+    build_numpy_index(vectors, target, embedding_model)
+    build_bm25_index(chunks, os.path.join(target, BM25_DIR))
+
+
+def export_bot(bot_id: str, snapshot_path: str, root: str = STORAGE_ROOT) -> dict:
+    """Write the snapshot of a stored bot; returns the snapshot header."""
+    directory = bot_storage_path(bot_id, root)
+    manifest = read_manifest(directory)
+    if manifest is None and not os.path.exists(os.path.join(directory, "chroma.sqlite3")):
+        raise FileNotFoundError(f"Bot {bot_id} not found in {root}")
+    if manifest and manifest.get("backend") == "numpy":
+        # Only the current index version goes into the snapshot.
+        return write_snapshot(index_directory(directory), snapshot_path, bot_id)
+    staging = tempfile.mkdtemp(prefix="snapshot-")
+    try:
+        _materialize_chroma_bot(directory, manifest or {}, staging)
+        return write_snapshot(staging, snapshot_path, bot_id)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _is_snapshot_file(name: str) -> bool:
+    if name in SNAPSHOT_FILES:
+        return True
+    directory, _, filename = name.partition("/")
+    return directory == BM25_DIR and bool(filename) and "/" not in filename and not filename.startswith(".")
+
+
+def validate_manifest(manifest) -> None:
+    """Reject manifests of anything but a self-contained NumPy bot."""
+    if not isinstance(manifest, dict) or manifest.get("backend") != "numpy":
+        raise SnapshotError("Snapshot is not of a NumPy bot")
+    for key in FOREIGN_MANIFEST_KEYS:
+        if key in manifest:
+            raise SnapshotError(f"Snapshot manifest may not set {key!r}")
+
+
+class SnapshotReader:
+    """Random access to the sections of a snapshot file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        file_size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            if file_size < 2 * len(MAGIC) + 8 or f.read(len(MAGIC)) != MAGIC:
+                raise SnapshotError(f"{path} is not a bot snapshot")
+            f.seek(file_size - len(MAGIC) - 8)
+            (header_length,) = struct.unpack("<Q", f.read(8))
+            if f.read(len(MAGIC)) != MAGIC or header_length > file_size:
+                raise SnapshotError(f"{path} is truncated")
+            f.seek(file_size - len(MAGIC) - 8 - header_length)
+            try:
+                self.header = json.loads(f.read(header_length))
+            except ValueError:
+                raise SnapshotError(f"{path} has a corrupt header")
+        if self.header.get("format_version") != FORMAT_VERSION:
+            raise SnapshotError(f"Unsupported snapshot format version {self.header.get('format_version')}")
+        self.sections: Dict[str, dict] = {section["name"]: section for section in self.header["sections"]}
+
+    @property
+    def manifest(self) -> dict:
+        return self.header["manifest"]
+
+    def array(self, name: str) -> np.ndarray:
+        """Memory-map an uncompressed .npy section in place."""
+        section = self.sections[name]
+        if section["compression"] != "none":
+            raise ValueError(f"Section {name} is compressed and cannot be memory-mapped")
+        with open(self.path, "rb") as f:
+            f.seek(section["offset"])
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            data_offset = f.tell()
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=data_offset, shape=shape,
+                         order="F" if fortran_order else "C")
+
+    def validate(self) -> None:
+        """Check that the snapshot holds only the files of a NumPy bot, with sane sizes."""
+        validate_manifest(self.manifest)
+        for name, section in self.sections.items():
+            if not _is_snapshot_file(name):
+                raise SnapshotError(f"Unexpected section {name!r}")
+            if section.get("compression") not in ("none", "zlib"):
+                raise SnapshotError(f"Unknown compression of section {name}")
+            for key in ("offset", "length", "size"):
+                if not isinstance(section.get(key), int) or section[key] < 0:
+                    raise SnapshotError(f"Invalid {key} of section {name}")
+            if section["compression"] == "none" and section["length"] != section["size"]:
+                raise SnapshotError(f"Size mismatch in section {name}")
+        if MANIFEST_FILE not in self.sections:
+            raise SnapshotError("Snapshot has no manifest")
+
+    def extract(self, directory: str) -> None:
+        """Write every section as a file under directory, verifying sizes and checksums."""
+        self.validate()
+        with open(self.path, "rb") as f:
+            for name, section in self.sections.items():
+                target = os.path.normpath(os.path.join(directory, name))
+                if not target.startswith(os.path.normpath(directory) + os.sep):
+                    raise SnapshotError(f"Section name {name!r} escapes the bot directory")
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                f.seek(section["offset"])
+                remaining = section["length"]
+                written = 0
+                digest = hashlib.sha256()
+                decompressor = zlib.decompressobj() if section["compression"] == "zlib" else None
+                with open(target, "wb") as out:
+                    while remaining or (decompressor and decompressor.unconsumed_tail):
+                        if decompressor and decompressor.unconsumed_tail:
+                            block = decompressor.unconsumed_tail
+                        else:
+                            block = f.read(min(COPY_BLOCK_BYTES, remaining))
+                            if not block:
+                                raise SnapshotError(f"{self.path} is truncated in section {name}")
+                            remaining -= len(block)
+                        if decompressor:
+                            try:
+                                # Never inflate past the declared size (zip bombs).
+                                block = decompressor.decompress(block, section["size"] - written + 1)
+                            except zlib.error as e:
+                                raise SnapshotError(f"Corrupt section {name}: {e}")
+                        written += len(block)
+                        if written > section["size"]:
+                            raise SnapshotError(f"Section {name} is larger than its declared size")
+                        digest.update(block)
+                        out.write(block)
+                    if decompressor:
+                        tail = decompressor.flush(COPY_BLOCK_BYTES)
+                        written += len(tail)
+                        if written > section["size"]:
+                            raise SnapshotError(f"Section {name} is larger than its declared size")
+                        digest.update(tail)
+                        out.write(tail)
+                if written != section["size"]:
+                    raise SnapshotError(f"Size mismatch in section {name}")
+                if digest.hexdigest() != section["sha256"]:
+                    raise SnapshotError(f"Checksum mismatch in section {name}")
+
+
+def import_snapshot(snapshot_path: str, bot_id: Optional[str] = None, root: str = STORAGE_ROOT,
+                    user_id: Optional[str] = None) -> str:
+    """Unpack a snapshot into a new bot (a fresh id unless bot_id is given); returns the bot id."""
+    reader = SnapshotReader(snapshot_path)
+    reader.validate()
+    bot_id = bot_id or str(uuid.uuid4())
+    directory = bot_storage_path(bot_id, root)
+    if os.path.exists(directory):
+        raise FileExistsError(f"Bot {bot_id} already exists")
+    mark_build_started(directory)
+    try:
+        reader.extract(directory)
+        # The extracted manifest is what load_vector_database reads; it must pass the same check.
+        validate_manifest(read_manifest(directory))
+        mark_build_finished(directory, user_id)
+    except BaseException:
+        # Not delete_bot_storage: a rejected manifest may name another bot's shared collection.
+        shutil.rmtree(directory, ignore_errors=True)
+        try:
+            os.rmdir(os.path.dirname(directory))
+        except OSError:
+            pass
+        raise
+    return bot_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and import single-file bot snapshots.")
+    parser.add_argument("--storage", default=STORAGE_ROOT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("bot_id")
+    export_parser.add_argument("snapshot")
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("snapshot")
+    import_parser.add_argument("--bot-id", help="Keep this id (e.g. when restoring) instead of a new one")
+    info_parser = commands.add_parser("info")
+    info_parser.add_argument("snapshot")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    start = time.perf_counter()
+    if args.command == "export":
+        header = export_bot(args.bot_id, args.snapshot, args.storage)
+        logger.info(f"Exported {args.bot_id} ({header['manifest'].get('count')} chunks) to {args.snapshot} "
+                    f"({os.path.getsize(args.snapshot) / 1024 / 1024:.1f}MB, {time.perf_counter() - start:.2f}s)")
+    elif args.command == "import":
+        bot_id = import_snapshot(args.snapshot, args.bot_id, args.storage)
+        logger.info(f"Imported {args.snapshot} as bot {bot_id} ({time.perf_counter() - start:.2f}s)")
+    else:
+        reader = SnapshotReader(args.snapshot)
+        print(json.dumps({key: value for key, value in reader.header.items() if key != "sections"}, indent=2))
+        for section in reader.header["sections"]:
+            print(f"{section['name']:32} {section['compression']:5} {section['size']:>12} -> {section['length']:>12}")
+
+
+if __name__ == "__main__":
+    main()
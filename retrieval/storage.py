@@ -0,0 +1,231 @@
+"""Layout of bot directories in vector_db_storage.
+
+Bots live in shard directories named after the first characters of their id
+(vector_db_storage/3f/3f2a...), so no directory holds more than a few thousand
+entries. Bots from before sharding stay readable at vector_db_storage/<bot_id>
+until `python -m retrieval.storage_maintenance --migrate-layout` moves them.
+Names starting with "_" (shared Chroma, caches) are not bots.
+
+Bots updated in place (documents added or removed) keep each index version in
+versions/v<N>/, a complete NumPy bot directory that is never modified once
+written. The manifest at the top of the bot directory names the current version
+in "current_version"; replacing it (atomically, see write_manifest) publishes a
+new version, so readers see either the old index or the new one. Bots never
+updated keep their files at the top of the directory.
+"""
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from retrieval.manifest import read_manifest, write_manifest
+
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: single worker, threads locked per bot instead
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+STORAGE_ROOT = "vector_db_storage"
+SHARD_PREFIX_LENGTH = 2
+# Present in a bot directory while it is being built; removed once the build succeeds.
+BUILD_MARKER = ".building"
+
+VERSIONS_DIR = "versions"
+# Superseded versions kept for readers that opened them just before a publish.
+KEEP_PREVIOUS_VERSIONS = 1
+UPDATE_LOCK_FILE = ".update.lock"
+# Top-level entries of a bot built before versioning, other than its manifest.
+UNVERSIONED_INDEX_FILES = ("embeddings.npy", "embeddings_q.npy", "embeddings_scale.npy",
+                           "chunks.bin", "chunk_offsets.npy", "bm25")
+
+_BOT_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{2,127}")
+
+
+def is_valid_bot_id(bot_id: str) -> bool:
+    """Bot ids are uuids in practice; anything that could escape the storage root is rejected."""
+    return bool(_BOT_ID_PATTERN.fullmatch(bot_id or ""))
+
+
+def bot_storage_path(bot_id: str, root: str = STORAGE_ROOT) -> str:
+    """Directory of a bot: its shard directory, or the flat pre-sharding one if that exists."""
+    if not is_valid_bot_id(bot_id):
+        raise ValueError(f"Invalid bot id: {bot_id!r}")
+    legacy_path = os.path.join(root, bot_id)
+    if os.path.isdir(legacy_path):
+        return legacy_path
+    return os.path.join(root, bot_id[:SHARD_PREFIX_LENGTH], bot_id)
+
+
+def _is_shard_directory(name: str) -> bool:
+    return len(name) == SHARD_PREFIX_LENGTH and not name.startswith("_")
+
+
+def iter_bot_directories(root: str = STORAGE_ROOT) -> Iterator[Tuple[str, str]]:
+    """(bot_id, directory) of every bot, sharded or flat."""
+    if not os.path.isdir(root):
+        return
+    for entry in os.scandir(root):
+        if not entry.is_dir() or entry.name.startswith("_"):
+            continue
+        if _is_shard_directory(entry.name):
+            for bot in os.scandir(entry.path):
+                if bot.is_dir() and is_valid_bot_id(bot.name):
+                    yield bot.name, bot.path
+        elif is_valid_bot_id(entry.name):
+            yield entry.name, entry.path
+
+
+def mark_build_started(path: str) -> None:
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, BUILD_MARKER), "w") as f:
+        f.write(str(time.time()))
+
+
+def mark_build_finished(path: str, user_id: Optional[str] = None) -> None:
+    """Record the owner and creation time in the manifest and clear the build marker."""
+    manifest = read_manifest(path)
+    if manifest is not None:
+        write_manifest(path, {**manifest, "user_id": user_id, "created_at": time.time()})
+    try:
+        os.remove(os.path.join(path, BUILD_MARKER))
+    except FileNotFoundError:
+        pass
+
+
+def build_started_at(path: str) -> Optional[float]:
+    """When the build of a bot started, or None if it is not (or no longer) being built."""
+    try:
+        return os.stat(os.path.join(path, BUILD_MARKER)).st_mtime
+    except OSError:
+        return None
+
+
+def delete_bot_storage(path: str) -> None:
+    """Remove a bot directory and its shared Chroma collection, if it has one."""
+    manifest = None
+    try:
+        manifest = read_manifest(path)
+    except Exception:
+        pass
+    if manifest and manifest.get("chroma_mode") == "shared":
+        try:
+            from retrieval.chroma_store import get_shared_chroma_client
+            get_shared_chroma_client().delete_collection(manifest["collection"])
+        except Exception as e:
+            logger.warning(f"Could not delete shared Chroma collection {manifest.get('collection')}: {e}")
+    shutil.rmtree(path, ignore_errors=True)
+    # Drop the shard directory once its last bot is gone.
+    parent = os.path.dirname(path)
+    if _is_shard_directory(os.path.basename(parent)):
+        try:
+            os.rmdir(parent)
+        except OSError:
+            pass
+
+
+def index_directory(path: str) -> str:
+    """Directory holding the current index files of a bot: its current version, if any."""
+    manifest = read_manifest(path)
+    version = (manifest or {}).get("current_version")
+    return os.path.join(path, VERSIONS_DIR, version) if version else path
+
+
+def _version_number(name: str) -> Optional[int]:
+    return int(name[1:]) if name.startswith("v") and name[1:].isdigit() else None
+
+
+def list_index_versions(path: str) -> List[str]:
+    """Published version directories of a bot, oldest first."""
+    try:
+        names = os.listdir(os.path.join(path, VERSIONS_DIR))
+    except FileNotFoundError:
+        return []
+    return sorted((name for name in names if _version_number(name) is not None), key=_version_number)
+
+
+def new_index_version(path: str) -> Tuple[str, str]:
+    """(name, staging directory) of the next version; write it, then publish_index_version."""
+    versions = list_index_versions(path)
+    number = _version_number(versions[-1]) + 1 if versions else 1
+    name = f"v{number:06d}"
+    staging = os.path.join(path, VERSIONS_DIR, name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    return name, staging
+
+
+def publish_index_version(path: str, name: str, staging: str) -> dict:
+    """Make a fully written staging directory the bot's current version.
+
+    The top-level manifest becomes the version's manifest plus "current_version",
+    keeping the owner and creation time. Returns the new top-level manifest.
+    """
+    version_path = os.path.join(path, VERSIONS_DIR, name)
+    os.rename(staging, version_path)
+    previous = read_manifest(path) or {}
+    manifest = {
+        **(read_manifest(version_path) or {}),
+        "user_id": previous.get("user_id"),
+        "created_at": previous.get("created_at"),
+        "updated_at": time.time(),
+        "current_version": name,
+    }
+    write_manifest(path, manifest)
+    prune_index_versions(path)
+    return manifest
+
+
+def prune_index_versions(path: str, keep_previous: int = KEEP_PREVIOUS_VERSIONS) -> None:
+    """Remove versions older than the current one and keep_previous before it, and
+    staging directories of updates that died midway (call with the update lock held).
+
+    The unversioned files of a bot's original build count as the oldest version.
+    Memory-mapped files stay readable by processes that still map them.
+    """
+    current = (read_manifest(path) or {}).get("current_version")
+    if current is None:
+        return
+    versions = list_index_versions(path)
+    older = versions[:versions.index(current)] if current in versions else []
+    for name in older[:max(len(older) - keep_previous, 0)]:
+        shutil.rmtree(os.path.join(path, VERSIONS_DIR, name), ignore_errors=True)
+    if len(older) >= keep_previous:
+        for name in UNVERSIONED_INDEX_FILES:
+            target = os.path.join(path, name)
+            if os.path.isdir(target):
+                shutil.rmtree(target, ignore_errors=True)
+            elif os.path.exists(target):
+                os.remove(target)
+    for name in os.listdir(os.path.join(path, VERSIONS_DIR)):
+        if name.endswith(".tmp"):
+            shutil.rmtree(os.path.join(path, VERSIONS_DIR, name), ignore_errors=True)
+
+
+# Per-bot locks used when fcntl is unavailable.
+_thread_update_locks: Dict[str, threading.Lock] = {}
+_thread_update_locks_lock = threading.Lock()
+
+
+@contextmanager
+def bot_update_lock(path: str):
+    """Serialise updates of one bot across threads and processes of the host
+    (across threads of this process only without fcntl)."""
+    if fcntl is None:
+        with _thread_update_locks_lock:
+            lock = _thread_update_locks.setdefault(os.path.abspath(path), threading.Lock())
+        with lock:
+            yield
+        return
+    with open(os.path.join(path, UPDATE_LOCK_FILE), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
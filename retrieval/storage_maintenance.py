@@ -0,0 +1,241 @@
+"""Garbage collection, quotas and compaction for vector_db_storage.
+
+Usage:
+    python -m retrieval.storage_maintenance [--storage vector_db_storage] [--dry-run] [--migrate-layout]
+
+One pass:
+  * removes partial builds (build marker older than STORAGE_BUILD_TIMEOUT_SECONDS)
+    and orphans (directories with neither a manifest nor a Chroma store),
+  * expires bots not queried for STORAGE_BOT_TTL_DAYS,
+  * deletes each user's least recently used bots beyond STORAGE_USER_QUOTA_MB, then
+    everyone's beyond STORAGE_MAX_MB,
+  * VACUUMs Chroma and cache SQLite files whose free pages exceed STORAGE_VACUUM_MIN_FREE.
+
+Quotas and the TTL are off (0) unless configured. The app runs a pass every
+STORAGE_MAINTENANCE_INTERVAL_SECONDS; a lock file makes one worker per host do it.
+"""
+import argparse
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from bot_access_stats import bot_access_stats
+from retrieval.chroma_store import SHARED_CHROMA_PATH
+from retrieval.embedding_cache import EMBEDDING_CACHE_PATH
+from retrieval.manifest import read_manifest
+from retrieval.shared_index import directory_size
+from retrieval.storage import (
+    SHARD_PREFIX_LENGTH, STORAGE_ROOT, build_started_at, delete_bot_storage, iter_bot_directories,
+)
+
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines: single worker, no cross-process lock needed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+STORAGE_MAINTENANCE_INTERVAL_SECONDS = int(os.getenv('STORAGE_MAINTENANCE_INTERVAL_SECONDS', '3600'))
+# A build running longer than this is assumed to have died with its worker.
+STORAGE_BUILD_TIMEOUT_SECONDS = int(os.getenv('STORAGE_BUILD_TIMEOUT_SECONDS', str(6 * 3600)))
+STORAGE_BOT_TTL_DAYS = float(os.getenv('STORAGE_BOT_TTL_DAYS', '0'))
+STORAGE_USER_QUOTA_MB = int(os.getenv('STORAGE_USER_QUOTA_MB', '0'))
+STORAGE_MAX_MB = int(os.getenv('STORAGE_MAX_MB', '0'))
+# Share of free pages in a SQLite file above which it is vacuumed.
+STORAGE_VACUUM_MIN_FREE = float(os.getenv('STORAGE_VACUUM_MIN_FREE', '0.2'))
+
+CHROMA_SQLITE_FILE = "chroma.sqlite3"
+MAINTENANCE_LOCK_FILE = "_maintenance.lock"
+
+
+class BotUsage:
+    def __init__(self, bot_id: str, path: str, size: int, user_id: Optional[str], last_used: float):
+        self.bot_id = bot_id
+        self.path = path
+        self.size = size
+        self.user_id = user_id
+        self.last_used = last_used
+
+
+def vacuum_if_fragmented(path: str, min_free: float = STORAGE_VACUUM_MIN_FREE) -> int:
+    """VACUUM a SQLite file when enough of it is free pages; returns the bytes reclaimed.
+
+    A database busy in another process is skipped until the next pass.
+    """
+    if not os.path.exists(path):
+        return 0
+    before = os.path.getsize(path)
+    try:
+        conn = sqlite3.connect(path, timeout=5)
+        try:
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not page_count or free_pages / page_count < min_free:
+                return 0
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.info(f"Skipping compaction of {path}: {e}")
+        return 0
+    reclaimed = max(0, before - os.path.getsize(path))
+    logger.info(f"Compacted {path}: {reclaimed / 1024 / 1024:.1f}MB reclaimed")
+    return reclaimed
+
+
+def _compact(path: str, report: Dict) -> int:
+    reclaimed = vacuum_if_fragmented(path)
+    if reclaimed:
+        report["compacted"] += 1
+        report["compacted_bytes"] += reclaimed
+    return reclaimed
+
+
+def _delete(usage: BotUsage, reason: str, report: Dict, dry_run: bool) -> None:
+    logger.info(f"Deleting bot {usage.bot_id} ({reason}, {usage.size / 1024 / 1024:.1f}MB)")
+    report[reason] += 1
+    report["freed_bytes"] += usage.size
+    if not dry_run:
+        delete_bot_storage(usage.path)
+        bot_access_stats.remove(usage.bot_id)
+
+
+def _enforce_quota(bots: List[BotUsage], quota_bytes: int, reason: str, report: Dict, dry_run: bool) -> List[BotUsage]:
+    """Delete least recently used bots until the rest fit in quota_bytes; returns the rest."""
+    bots = sorted(bots, key=lambda usage: usage.last_used)
+    total = sum(usage.size for usage in bots)
+    kept = []
+    for usage in bots:
+        if total > quota_bytes:
+            _delete(usage, reason, report, dry_run)
+            total -= usage.size
+        else:
+            kept.append(usage)
+    return kept
+
+
+def run_maintenance(root: str = STORAGE_ROOT, dry_run: bool = False) -> Dict:
+    """One maintenance pass over root; returns counts of what was removed and reclaimed."""
+    start = time.perf_counter()
+    now = time.time()
+    report = {"partial": 0, "orphaned": 0, "expired": 0, "user_quota": 0, "global_quota": 0,
+              "freed_bytes": 0, "compacted": 0, "compacted_bytes": 0}
+    access = bot_access_stats.get_all()
+
+    bots: List[BotUsage] = []
+    for bot_id, path in iter_bot_directories(root):
+        try:
+            started = build_started_at(path)
+            if started is not None:
+                if now - started > STORAGE_BUILD_TIMEOUT_SECONDS:
+                    _delete(BotUsage(bot_id, path, directory_size(path), None, started), "partial", report, dry_run)
+                # Builds in progress are never expired or counted against quotas.
+                continue
+            manifest = read_manifest(path)
+            modified = os.stat(path).st_mtime
+            if manifest is None and not os.path.exists(os.path.join(path, CHROMA_SQLITE_FILE)):
+                if now - modified > STORAGE_BUILD_TIMEOUT_SECONDS:
+                    _delete(BotUsage(bot_id, path, directory_size(path), None, modified), "orphaned", report, dry_run)
+                continue
+            manifest = manifest or {}
+            last_used = max(access.get(bot_id, {}).get("last_access", 0), manifest.get("created_at") or modified)
+            bots.append(BotUsage(bot_id, path, directory_size(path), manifest.get("user_id"), last_used))
+        except OSError as e:
+            # Deleted or moved while scanning.
+            logger.warning(f"Skipping {path}: {e}")
+
+    if STORAGE_BOT_TTL_DAYS > 0:
+        cutoff = now - STORAGE_BOT_TTL_DAYS * 86400
+        for usage in [usage for usage in bots if usage.last_used < cutoff]:
+            _delete(usage, "expired", report, dry_run)
+        bots = [usage for usage in bots if usage.last_used >= cutoff]
+
+    # Compacting before the quotas means only live data counts against them.
+    if not dry_run:
+        for usage in bots:
+            reclaimed = _compact(os.path.join(usage.path, CHROMA_SQLITE_FILE), report)
+            usage.size -= reclaimed
+
+    if STORAGE_USER_QUOTA_MB > 0:
+        by_user: Dict[str, List[BotUsage]] = {}
+        unowned = []
+        for usage in bots:
+            if usage.user_id:
+                by_user.setdefault(usage.user_id, []).append(usage)
+            else:
+                unowned.append(usage)
+        bots = unowned
+        for user_bots in by_user.values():
+            bots.extend(_enforce_quota(user_bots, STORAGE_USER_QUOTA_MB * 1024 * 1024, "user_quota", report, dry_run))
+
+    if STORAGE_MAX_MB > 0:
+        bots = _enforce_quota(bots, STORAGE_MAX_MB * 1024 * 1024, "global_quota", report, dry_run)
+
+    if not dry_run:
+        _compact(os.path.join(SHARED_CHROMA_PATH, CHROMA_SQLITE_FILE), report)
+        _compact(EMBEDDING_CACHE_PATH, report)
+
+    logger.info(f"Storage maintenance finished in {time.perf_counter() - start:.1f}s: {report}")
+    return report
+
+
+def migrate_layout(root: str = STORAGE_ROOT, dry_run: bool = False) -> int:
+    """Move flat vector_db_storage/<bot_id> directories into their shard directories."""
+    moved = 0
+    for bot_id, path in list(iter_bot_directories(root)):
+        if os.path.dirname(path) != root.rstrip(os.sep):
+            continue
+        target = os.path.join(root, bot_id[:SHARD_PREFIX_LENGTH], bot_id)
+        logger.info(f"{path} -> {target}")
+        if not dry_run:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.rename(path, target)
+        moved += 1
+    logger.info(f"Moved {moved} bots into shard directories")
+    return moved
+
+
+def run_maintenance_if_due(root: str = STORAGE_ROOT, interval: int = STORAGE_MAINTENANCE_INTERVAL_SECONDS) -> Optional[Dict]:
+    """Run a pass unless another worker is running one or ran one within interval seconds.
+
+    The lock file holds the time of the last pass, so workers share one schedule.
+    """
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, MAINTENANCE_LOCK_FILE), "a+") as lock_file:
+        if fcntl:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+        lock_file.seek(0)
+        try:
+            last_run = float(lock_file.read() or 0)
+        except ValueError:
+            last_run = 0
+        if time.time() - last_run < interval:
+            return None
+        report = run_maintenance(root)
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(str(time.time()))
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Garbage-collect, enforce quotas on and compact vector_db_storage.")
+    parser.add_argument("--storage", default=STORAGE_ROOT)
+    parser.add_argument("--dry-run", action="store_true", help="Only log what would be deleted or moved")
+    parser.add_argument("--migrate-layout", action="store_true", help="Move flat bot directories into shard directories")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.migrate_layout:
+        migrate_layout(args.storage, dry_run=args.dry_run)
+    run_maintenance(args.storage, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Run the API with several uvicorn workers sharing one copy of each hot bot index.
+
+    python serve_workers.py --workers 4 --host 0.0.0.0 --port 8000
+
+Starts the index coordinator (retrieval/shared_index.py) in its own process, then
+uvicorn with --workers; the workers find the coordinator through the environment.
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+import shutil
+import tempfile
+
+import uvicorn
+
+from retrieval.shared_index import SHARED_INDEX_DIR, run_coordinator
+from retrieval.storage import STORAGE_ROOT
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv('WEB_CONCURRENCY', '4')))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    os.makedirs(STORAGE_ROOT, exist_ok=True)
+    address = os.path.join(tempfile.mkdtemp(prefix="index-coordinator-"), "socket")
+    authkey = secrets.token_bytes(32)
+    coordinator = multiprocessing.get_context("spawn").Process(
+        target=run_coordinator, args=(address, authkey), name="index-coordinator", daemon=True
+    )
+    coordinator.start()
+
+    os.environ['INDEX_COORDINATOR_ADDRESS'] = address
+    os.environ['INDEX_COORDINATOR_AUTHKEY'] = authkey.hex()
+    try:
+        uvicorn.run("app:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        coordinator.terminate()
+        coordinator.join(timeout=10)
+        # SIGTERM skips the coordinator's own cleanup; shared memory is only freed by deleting the files.
+        shutil.rmtree(SHARED_INDEX_DIR, ignore_errors=True)
+        shutil.rmtree(os.path.dirname(address), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
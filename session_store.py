@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Turns kept verbatim; older ones are folded into the rolling summary.
+SESSION_RECENT_TURNS = int(os.getenv('SESSION_RECENT_TURNS', '4'))
+# Summarise once this many turns beyond the recent ones have piled up, so the
+# summariser runs every few turns rather than on each one.
+SESSION_SUMMARY_BATCH = int(os.getenv('SESSION_SUMMARY_BATCH', '4'))
+SESSION_TTL_SECONDS = int(os.getenv('SESSION_TTL_SECONDS', str(6 * 3600)))
+SESSION_MAX_SESSIONS = int(os.getenv('SESSION_MAX_SESSIONS', '10000'))
+# Shared by the workers of a node (serve_workers.py), so any of them can continue a session.
+SESSION_STORE_PATH = os.getenv('SESSION_STORE_PATH', os.path.join("vector_db_storage", "_sessions.sqlite3"))
+
+# A summary still running after this long belongs to a worker that died; summarise again.
+SUMMARY_STALE_SECONDS = 300
+# Expired and excess sessions are removed every this many writes.
+_CLEANUP_EVERY = 100
+
+Turn = Tuple[str, str]
+
+
+class ChatSession:
+    """A session as read from the store: its summary and recent turns."""
+
+    def __init__(self, session_id: str, bot_id: str, summary: str = "", turns: Optional[List[Turn]] = None):
+        self.session_id = session_id
+        self.bot_id = bot_id
+        self.summary = summary
+        self.turns: List[Turn] = turns or []
+
+    def history(self) -> Tuple[str, str]:
+        """(summary, recent turns as text); prompts budget the two separately (prompt_builder.fit_history)."""
+        return self.summary, "\n".join(f"User: {question}\nAssistant: {answer}" for question, answer in self.turns)
+
+
+class SessionStore:
+    """Chat sessions in SQLite with a TTL, bounded in number.
+
+    Each session keeps its last SESSION_RECENT_TURNS turns verbatim plus a rolling
+    summary of everything older, so what a turn sends to retrieval and to the LLM
+    stays the same size however long the conversation gets. Summaries are written
+    on a background thread, off the request path. The database is shared by all
+    workers of a node, so consecutive turns may land on different workers;
+    replicas on different nodes still need routing by session.
+    """
+
+    def __init__(self, path: str = SESSION_STORE_PATH, ttl_seconds: int = SESSION_TTL_SECONDS,
+                 max_sessions: int = SESSION_MAX_SESSIONS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        self._summarizer_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="session-summary")
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " session_id TEXT PRIMARY KEY, bot_id TEXT NOT NULL, summary TEXT NOT NULL, turns TEXT NOT NULL,"
+                " summarizing_since REAL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at)")
+            self._conn = conn
+        return self._conn
+
+    def _read(self, conn: sqlite3.Connection, session_id: str, bot_id: str) -> Tuple[ChatSession, Optional[float]]:
+        """The live session and when its running summary started; empty if unknown,
+        expired or belonging to another bot."""
+        row = conn.execute(
+            "SELECT bot_id, summary, turns, summarizing_since, updated_at FROM sessions WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None or row[0] != bot_id or row[4] < time.time() - self.ttl_seconds:
+            return ChatSession(session_id, bot_id), None
+        turns = [tuple(turn) for turn in json.loads(row[2])]
+        return ChatSession(session_id, bot_id, row[1], turns), row[3]
+
+    def _write(self, conn: sqlite3.Connection, session: ChatSession, summarizing_since: Optional[float]) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, bot_id, summary, turns, summarizing_since, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (session.session_id, session.bot_id, session.summary, json.dumps(session.turns), summarizing_since, time.time()),
+        )
+
+    def get(self, session_id: str, bot_id: str) -> ChatSession:
+        """The session, empty if unknown, expired or belonging to another bot."""
+        with self._lock:
+            session, _ = self._read(self._connection(), session_id, bot_id)
+            return session
+
+    def add_turn(self, session: ChatSession, question: str, answer: str,
+                 summarize: Optional[Callable[[str, List[Turn]], str]] = None) -> None:
+        """Record a turn; with summarize(summary, old_turns) -> new summary, fold old turns
+        into the summary once SESSION_SUMMARY_BATCH of them have accumulated."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Re-read: another worker may have added turns since this request read the session.
+                current, summarizing_since = self._read(conn, session.session_id, session.bot_id)
+                current.turns.append((question, answer))
+                overflow = len(current.turns) - SESSION_RECENT_TURNS
+                summarizing = summarizing_since is not None and summarizing_since > now - SUMMARY_STALE_SECONDS
+                start_summary = summarize is not None and not summarizing and overflow >= SESSION_SUMMARY_BATCH
+                if summarize is None and overflow > 0:
+                    del current.turns[:overflow]
+                self._write(conn, current, now if start_summary else summarizing_since)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._writes += 1
+            if self._writes % _CLEANUP_EVERY == 0:
+                self._cleanup(conn)
+        if start_summary:
+            self._summarizer_pool.submit(self._summarize, current.session_id, current.bot_id, current.summary,
+                                         current.turns[:overflow], summarize)
+
+    def _summarize(self, session_id: str, bot_id: str, summary: str, old_turns: List[Turn], summarize) -> None:
+        try:
+            new_summary = summarize(summary, old_turns)
+        except Exception as e:
+            # Dropping the turns unsummarised keeps the session bounded if the LLM is down.
+            logger.warning(f"Summarising session {session_id} failed, dropping {len(old_turns)} old turns: {e}")
+            new_summary = summary
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                session, _ = self._read(conn, session_id, bot_id)
+                session.summary = new_summary
+                # Turns added meanwhile are after old_turns, so dropping the prefix is safe.
+                del session.turns[:len(old_turns)]
+                self._write(conn, session, None)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _cleanup(self, conn: sqlite3.Connection) -> None:
+        conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl_seconds,))
+        conn.execute(
+            "DELETE FROM sessions WHERE session_id IN ("
+            " SELECT session_id FROM sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._connection().execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+
+session_store = SessionStore()